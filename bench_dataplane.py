@@ -0,0 +1,136 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Push data packets through a network of routers, once their tables have converged, and measure
+# how fast they get through. Every router runs in this one process, either with a UDP socket
+# each or passing datagrams between each other in memory. Packets go between random pairs of
+# routers, with at most a window of them in flight at once, so that the socket buffers don't
+# overflow.
+#
+# Reported for each network are the packets delivered per second, the latency of each hop and
+# of each whole trip, and how many packets were dropped, either by a router or by the sockets.
+#
+# To run:
+#     python3 bench_dataplane.py [--config FILE ...] [--random NODES ...] [--packets N]
+#         [--window N] [--payload BYTES] [--local] [--mode dv|ls] [--base-port PORT]
+
+import argparse, os, random, tempfile
+from time import perf_counter
+import router, transport, topogen
+
+# How long to wait for a datagram before deciding that the rest have been lost
+IDLE_TIMEOUT = .5
+
+# The value `q` of the way through `values`, from 0 to 1
+def percentile(values, q):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+# Converge the routers of `config`, then send `packets` packets between random pairs of them
+def bench(config, args, rng, name=None):
+    router.CONFIG_FILE = config
+    router.BASE_PORT = args.base_port
+    router.load_topology()
+
+    routers = [router.Router(node, router.get_port(node), mode=args.mode) for node in router.NODES]
+    for r in routers:
+        r.verbose = False
+    network = transport.LocalNetwork() if args.local else None
+    host = router.RouterHost(routers, network)
+    host.open()
+    try:
+        start = perf_counter()
+        host.run()
+        converge_time = perf_counter() - start
+        if not host.converged():
+            print(f'{name or config}: the tables never converged, so some packets will have nowhere to go')
+
+        by_id = {r.id: r for r in routers}
+        ids = list(router.NODES)
+        pairs = [rng.sample(ids, 2) for _ in range(args.packets)]
+        payload = bytes(args.payload)
+        ready = network.ready if network is not None else {}
+
+        # Don't count anything that happened while the tables were converging
+        for r in routers:
+            r.data = router.DataStats()
+
+        sent = 0
+        start = perf_counter()
+        while True:
+            done = sum(r.data.delivered + r.data.dropped() for r in routers)
+            in_flight = sent - done
+
+            # Keep the window full
+            sources = set()
+            while sent < args.packets and in_flight < args.window:
+                source, destination = pairs[sent]
+                by_id[source].send_data(destination, payload, sent)
+                sources.add(source)
+                sent += 1
+                in_flight += 1
+            for source in sources:
+                by_id[source].flush()
+
+            if sent == args.packets and in_flight == 0:
+                break
+
+            events = host.selector.select(0 if ready else IDLE_TIMEOUT)
+            if not events and not ready:
+                break
+            for key, _mask in events:
+                key.data.drain()
+            while ready:
+                for waiting in list(ready):
+                    host.by_transport[waiting].drain()
+        elapsed = perf_counter() - start - (IDLE_TIMEOUT if in_flight else 0)
+    finally:
+        host.close()
+
+    stats = [r.data for r in routers]
+    delivered = sum(s.delivered for s in stats)
+    expired = sum(s.expired for s in stats)
+    no_route = sum(s.no_route for s in stats)
+    malformed = sum(s.malformed for s in stats)
+    forwarded = sum(s.forwarded for s in stats)
+    hop_latencies = [t for s in stats for t in s.hop_latencies]
+    latencies = [t for s in stats for t in s.latencies]
+
+    print(f'{name or config}: {len(routers)} routers, converged in {converge_time:.3f}s')
+    print(f'    {delivered} of {sent} packets delivered in {elapsed:.3f}s: {delivered / elapsed:,.0f} packets/s, '
+          f'{forwarded / elapsed:,.0f} hops/s, {forwarded / max(delivered, 1):.2f} hops per packet')
+    print(f'    hop latency (us):  p50 {percentile(hop_latencies, .5)*1e6:.1f}  p90 {percentile(hop_latencies, .9)*1e6:.1f}  '
+          f'p99 {percentile(hop_latencies, .99)*1e6:.1f}')
+    print(f'    trip latency (us): p50 {percentile(latencies, .5)*1e6:.1f}  p90 {percentile(latencies, .9)*1e6:.1f}  '
+          f'p99 {percentile(latencies, .99)*1e6:.1f}')
+    print(f'    dropped: {expired} out of hops, {no_route} with no route, {malformed} malformed, '
+          f'{sent - delivered - expired - no_route - malformed} lost')
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how fast routers forward data packets')
+    parser.add_argument('--config', nargs='*', default=[], help='config files to run')
+    parser.add_argument('--random', nargs='*', type=int, default=[], help='sizes of random networks to run')
+    parser.add_argument('--packets', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=256, help='most packets in flight at once')
+    parser.add_argument('--payload', type=int, default=64, help='bytes of payload in each packet')
+    parser.add_argument('--local', action='store_true', help='pass datagrams in memory instead of over UDP')
+    parser.add_argument('--mode', choices=router.MODES, default=router.MODE)
+    parser.add_argument('--base-port', type=int, default=21000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    configs = args.config or ([] if args.random else [router.CONFIG_FILE])
+    for config in configs:
+        bench(config, args, rng)
+
+    for n in args.random:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'random{n}.config')
+            topogen.random_network(n, 4, rng).write(path)
+            bench(path, args, rng, f'random network of {n} nodes')
+
+if __name__ == '__main__':
+    main()
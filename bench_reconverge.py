@@ -0,0 +1,156 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Measure how long the network takes to get its routes right again after links fail. Every
+# router runs in the simulator, on a random network, until the tables have converged. Then
+# links are made to stop working one at a time, without telling anyone, so that the routers at
+# either end have to notice for themselves when their neighbor stops saying hello.
+#
+# After each failure, the simulator is run until every router's costs match the true shortest
+# paths of the network that is left, as worked out by the routing engine. Only links that
+# don't split the network are failed, so there is always a right answer to reach.
+#
+# Reported for each failure are how long the link took to be noticed, how long until every
+# route was right again, in virtual and real seconds, and how many messages and bytes were
+# sent in that time. Distance vector mode is run with and without poisoned reverse.
+#
+# To run:
+#     python3 bench_reconverge.py [--config FILE ...] [--random NODES ...] [--failures N]
+#         [--mode dv|ls ...] [--latency SECONDS] [--until SECONDS] [--seed SEED]
+
+import argparse, os, random, tempfile
+from time import perf_counter
+import router, routing, simulator, topogen
+
+# How often to check whether the routes are right yet, in virtual seconds
+CHECK_INTERVAL = .01
+
+# Every link between two routers, as (id, id, cost), with each link only once
+def all_links(routers):
+    return [(r.id, n, cost) for r in routers for n, cost in r.edges.items() if r.id < n]
+
+# Whether every node can still reach every other without any of the links in `failed`
+def connected(routers, failed):
+    seen = {routers[0].id}
+    stack = [routers[0]]
+    by_id = {r.id: r for r in routers}
+    while stack:
+        r = stack.pop()
+        for n in r.edges:
+            if n not in seen and (r.id, n) not in failed and (n, r.id) not in failed:
+                seen.add(n)
+                stack.append(by_id[n])
+    return len(seen) == len(routers)
+
+# The true cost from every node index to every other, without the links in `failed`
+def true_costs(routers, failed):
+    graph = routing.AdjacencyGraph(len(routers))
+    for u, v, cost in all_links(routers):
+        if (u, v) not in failed and (v, u) not in failed:
+            graph.set_edge(router.get_index(u), router.get_index(v), cost)
+            graph.set_edge(router.get_index(v), router.get_index(u), cost)
+    engine = routing.Dijkstra(router.INFINITY)
+    return [engine.shortest_paths(graph, u)[0] for u in range(len(routers))]
+
+# Whether every router's own costs are the true ones
+def routes_right(routers, truth):
+    for r in routers:
+        u = router.get_index(r.id)
+        if r.table.row(u).tolist() != truth[u]:
+            return False
+    return True
+
+def bench(config, args, mode, poison, rng, name):
+    router.CONFIG_FILE = config
+    router.load_topology()
+    router.POISON_REVERSE = poison
+
+    routers = [router.Router(node, router.get_port(node), mode=mode) for node in router.NODES]
+    for r in routers:
+        r.verbose = False
+    sim = simulator.Simulator(routers, args.seed, args.latency)
+    label = f'{name}, {mode}' + (f', poisoned reverse {"on" if poison else "off"}' if mode == 'dv' else '')
+
+    real_start = perf_counter()
+    sim.start()
+    sim.run(args.until)
+    if not sim.converged():
+        print(f'{label}: the tables never converged')
+        return
+    print(f'{label}: {len(routers)} routers converged at {sim.now:.3f} virtual seconds '
+          f'({perf_counter() - real_start:.3f} real seconds)')
+
+    by_id = {r.id: r for r in routers}
+    failed = set()
+    links = all_links(routers)
+    rng.shuffle(links)
+    results = []
+    for u, v, _cost in links:
+        if len(results) == args.failures:
+            break
+        if not connected(routers, failed | {(u, v)}):
+            continue
+        failed.add((u, v))
+        truth = true_costs(routers, failed)
+
+        messages = sum(r.messages_sent for r in routers)
+        sent = sum(r.bytes_sent for r in routers)
+        start = sim.now
+        real_start = perf_counter()
+        sim.fail_link(u, v)
+
+        # Step through virtual time until both ends of the link have noticed it went down, and
+        # every route is right. A link that no shortest path used can leave every cost right
+        # before anyone notices, so both are waited for
+        noticed = None
+        right = False
+        while sim.now - start < args.until:
+            sim.run(sim.now + CHECK_INTERVAL, True)
+            if noticed is None and v in by_id[u].down and u in by_id[v].down:
+                noticed = sim.now - start
+            if noticed is not None and routes_right(routers, truth):
+                right = True
+                break
+        elapsed = sim.now - start
+        real = perf_counter() - real_start
+        messages = sum(r.messages_sent for r in routers) - messages
+        sent = sum(r.bytes_sent for r in routers) - sent
+        results.append((elapsed, real, messages, right))
+
+        state = 'routes right' if right else 'routes still wrong'
+        noticed = 'never' if noticed is None else f'{noticed:.3f}'
+        print(f'    failed {u}-{v}: noticed at {noticed}, {state} at '
+              f'{elapsed:.3f} virtual seconds ({real:.3f} real seconds), {messages} messages, {sent} bytes')
+
+    if results:
+        print(f'    average: {sum(r[0] for r in results) / len(results):.3f} virtual seconds, '
+              f'{sum(r[1] for r in results) / len(results):.3f} real seconds, '
+              f'{sum(r[2] for r in results) / len(results):.0f} messages, '
+              f'{sum(r[3] for r in results)} of {len(results)} right')
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how fast routers recover from links failing')
+    parser.add_argument('--config', nargs='*', default=[], help='config files to run')
+    parser.add_argument('--random', nargs='*', type=int, default=[], help='sizes of random networks to run')
+    parser.add_argument('--failures', type=int, default=3, help='how many links to fail, one after another')
+    parser.add_argument('--mode', nargs='*', choices=router.MODES, default=list(router.MODES))
+    parser.add_argument('--latency', type=float, default=.01, help='seconds for a datagram to cross a link')
+    parser.add_argument('--until', type=float, default=60, help='give up on a failure after this many virtual seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    networks = [(config, config) for config in args.config or ([] if args.random else [router.CONFIG_FILE])]
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.random:
+            path = os.path.join(directory, f'random{n}.config')
+            topogen.random_network(n, 4, rng).write(path)
+            networks.append((path, f'random network of {n} nodes'))
+
+        for config, name in networks:
+            for mode in args.mode:
+                for poison in ((True, False) if mode == 'dv' else (True,)):
+                    bench(config, args, mode, poison, random.Random(args.seed), name)
+
+if __name__ == '__main__':
+    main()
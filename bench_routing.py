@@ -0,0 +1,98 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Compare the routing engines on random graphs. For each size, every engine computes the
+# shortest paths from scratch, and then the graph has a few edges changed at a time and each
+# engine recomputes its paths. Every engine must agree on every distance.
+#
+# To run:
+#     python3 bench_routing.py [NODES ...]
+
+import random, sys, time
+import routing
+
+INFINITY = 1 << 30
+
+# How many times we change some edges and recompute
+ROUNDS = 20
+
+# How many edges are changed each round
+CHANGES_PER_ROUND = 3
+
+# Plain Bellman-Ford takes far too long past this many nodes
+BELLMAN_FORD_LIMIT = 1000
+
+# Build a random connected graph with `n` nodes, where each node has about `degree` edges
+def random_graph(n, degree, rng):
+    graph = routing.AdjacencyGraph(n)
+    edges = []
+
+    def add(u, v):
+        cost = rng.randint(1, 20)
+        graph.set_edge(u, v, cost)
+        graph.set_edge(v, u, cost)
+        edges.append((u, v))
+
+    # Start with a random spanning tree, so that every node can reach every other
+    order = list(range(n))
+    rng.shuffle(order)
+    for i in range(1, n):
+        add(order[i], order[rng.randrange(i)])
+
+    for _ in range(n * (degree - 2) // 2):
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            add(u, v)
+    return graph, edges
+
+# Change the cost of a few edges in both directions, and return the (u, v) pairs that changed
+def change_edges(graph, edges, rng):
+    changed = []
+    for _ in range(CHANGES_PER_ROUND):
+        u, v = rng.choice(edges)
+        cost = rng.randint(1, 40)
+        graph.set_edge(u, v, cost)
+        graph.set_edge(v, u, cost)
+        changed += [(u, v), (v, u)]
+    return changed
+
+def bench(n, names):
+    rng = random.Random(n)
+    graph, edges = random_graph(n, 4, rng)
+    source = 0
+
+    engines = {name: routing.make_engine(name, INFINITY) for name in names}
+    full = {}
+    expected = None
+    for name, engine in engines.items():
+        start = time.perf_counter()
+        distance, _ = engine.shortest_paths(graph, source)
+        full[name] = time.perf_counter() - start
+        if expected is None:
+            expected = distance
+        assert distance == expected, f'{name} disagrees on a graph of {n} nodes'
+
+    incremental = {name: 0 for name in names}
+    for _ in range(ROUNDS):
+        changed = change_edges(graph, edges, rng)
+        expected = None
+        for name, engine in engines.items():
+            start = time.perf_counter()
+            distance, _ = engine.update(graph, source, changed)
+            incremental[name] += time.perf_counter() - start
+            if expected is None:
+                expected = distance
+            assert distance == expected, f'{name} disagrees after an update on a graph of {n} nodes'
+
+    for name in names:
+        print(f'{n:>6} {name:<24} {full[name]*1e3:>12.2f} {incremental[name]/ROUNDS*1e3:>14.3f}')
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [10, 100, 1000, 10000]
+    print(f'{"nodes":>6} {"engine":<24} {"full (ms)":>12} {"update (ms)":>14}')
+    for n in sizes:
+        names = [name for name in routing.ENGINES if name != 'bellman_ford' or n <= BELLMAN_FORD_LIMIT]
+        bench(n, names)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Compare the binary wire format against the old pickle format, both for how many bytes
+# each message takes and how long it takes to encode and decode.
+#
+# To run:
+#     python3 bench_wire.py [NODES ...]
+
+import pickle, sys, timeit, datetime, random
+import wire
+from topology import NodeRegistry
+
+# Build a full table for `n` nodes, as a router would have after converging. Tables used to be
+# pickled as a dict for every node, and are now sent as rows of costs
+def make_table(n):
+    rng = random.Random(n)
+    costs = [[0 if a == b else rng.randint(1, 50) for b in range(n)] for a in range(n)]
+    ids = [chr(ord('A') + i) for i in range(n)]
+    pickled = {ids[a]: dict(zip(ids, row)) for a, row in enumerate(costs)}
+    return pickled, [(a, None, row) for a, row in enumerate(costs)]
+
+# Node names used in the messages
+NODES = NodeRegistry('ABCDEF')
+
+# Each message is (type, sender, what pickle used to send, what the wire format sends)
+def make_messages(n):
+    pickled, rows = make_table(n)
+    broadcast = ['message', 'A, 127.0.0.1, 12000', ('1001783662', '1002015854'), datetime.datetime.now(), 12, 120]
+    return [
+        ('update', 'A', (n*n, 0, pickled), (n*n, 0, rows, [1] * n, [])),
+        # The router sends each row that changed whole, so a delta is a couple of full rows
+        ('update', 'A', (n*n, n*n - 3, {'A': pickled['A'], 'B': pickled['B']}),
+                        (n*n, n*n - 3, rows[:2], [4, 2], [2])),
+        ('broadcast', 'A', broadcast, ('A', 7, broadcast)),
+        ('broadcast', 'A', ('link_broken', 'A', 'B'), ('A', 8, ('link_broken', 'A', 'B'))),
+        ('ack', 'B', ('link_broken', 'A', 'B'), ('A', 8)),
+        ('link_broken', 'A', ('A', 'B'), ('A', 'B')),
+        ('update_ack', 'B', n*n, n*n),
+        ('hello', 'B', False, False),
+        ('sync', 'B', (False, list(range(n))), (False, tuple(range(n)))),
+    ]
+
+# Turn every sequence in a decoded update into a list, so that it can be compared to what was sent
+def normalize(msg_type, data):
+    if msg_type != 'update':
+        return data
+    seq, base, rows, versions, poisoned = data
+    return (seq, base, [(u, None if columns is None else list(columns), list(costs)) for u, columns, costs in rows],
+            list(versions), list(poisoned))
+
+# Time `func` and return the average number of microseconds per call
+def time_call(func, number):
+    return timeit.timeit(func, number=number) / number * 1e6
+
+def bench(n, number):
+    for msg_type, id, old_data, data in make_messages(n):
+        pickled = pickle.dumps((msg_type, id, old_data))
+        packed = wire.pack(msg_type, id, data, NODES.get_index)
+        _, _, decoded = wire.unpack(packed, NODES.get_id)
+        assert normalize(msg_type, decoded) == normalize(msg_type, data)
+
+        if msg_type == 'broadcast':
+            label = f'broadcast/{data[2][0]}'
+        elif msg_type == 'update':
+            label = 'update/full' if data[1] == 0 else 'update/delta'
+        else:
+            label = msg_type
+        print(f'{n:>5} {label:<22} '
+              f'{len(pickled):>8} {len(packed):>8} '
+              f'{time_call(lambda: pickle.dumps((msg_type, id, old_data)), number):>10.2f} '
+              f'{time_call(lambda: wire.pack(msg_type, id, data, NODES.get_index), number):>10.2f} '
+              f'{time_call(lambda: pickle.loads(pickled), number):>10.2f} '
+              f'{time_call(lambda: wire.unpack(packed, NODES.get_id), number):>10.2f}')
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [6, 16, 32]
+    print(f'{"nodes":>5} {"message":<22} {"pickle B":>8} {"wire B":>8} '
+          f'{"pickle enc":>10} {"wire enc":>10} {"pickle dec":>10} {"wire dec":>10}')
+    print('(times are microseconds per message)')
+    for n in sizes:
+        bench(n, max(100, 20000 // (n*n)))
+
+if __name__ == '__main__':
+    main()
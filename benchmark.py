@@ -0,0 +1,179 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Runs the routers on networks of different shapes and sizes from topogen.py, and records how
+# each run went, so that one version of the code can be compared against another. Every run is
+# a RouterHost with every router of the network in it, passing datagrams in memory, and goes
+# until the tables converge.
+#
+# Each run happens in a fresh process, so that the memory and processor time of one run don't
+# count towards the next. For every run the results are:
+#
+#     converged, seconds     whether the tables converged, and how long it took
+#     updates, messages,     totals over every router
+#     bytes
+#     cpu_seconds            processor time of the whole process while the routers ran
+#     peak_mb                the most memory the process ever used
+#     router_mb              how much the peak grew once the routers were made, per router
+#     routers                for each router: messages and bytes sent and processor time
+#
+# The results are saved as JSON, along with the git commit they came from. Given the results of
+# an earlier version with --compare, the change in each number is printed for every run that is
+# in both.
+#
+# To run:
+#     python3 benchmark.py [--topology SHAPE:SIZE ...] [--mode dv|ls ...] [--repeat N]
+#         [--out FILE] [--compare FILE] [--timeout SECONDS] [--base-port PORT] [--seed SEED]
+
+import argparse, datetime, json, multiprocessing, os, platform, queue, resource, subprocess, tempfile
+from time import perf_counter, process_time
+import router, topogen, transport
+
+# The networks that are run if none are given
+DEFAULT_TOPOLOGIES = ['ring:32', 'grid:36', 'er:48', 'scale-free:48', 'fat-tree:4', 'fat-tree:6']
+
+# Where results are saved if no file is given
+RESULTS_DIR = 'bench_results'
+
+# The numbers that are compared between two sets of results, and whether lower is better
+COMPARED = {'seconds': True, 'messages': True, 'bytes': True, 'cpu_seconds': True, 'peak_mb': True}
+
+# The most memory this process has used so far, in megabytes
+def peak_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, while macOS gives bytes
+    return peak / (1 << 20 if platform.system() == 'Darwin' else 1 << 10)
+
+# Run every router in the config file at `path` until the tables converge, or `timeout` seconds
+# go by. Runs in its own process, and puts the results on `results`
+def run(path, mode, base_port, timeout, results):
+    router.CONFIG_FILE = path
+    router.BASE_PORT = base_port
+    router.VERBOSE = False
+    router.load_topology()
+
+    before = peak_mb()
+    routers = [router.Router(node, router.get_port(node), mode=mode) for node in router.NODES]
+    host = router.RouterHost(routers, transport.LocalNetwork())
+    host.open()
+    try:
+        start = perf_counter()
+        cpu = process_time()
+        host.run(lambda: host.finished() or perf_counter() - start > timeout)
+        seconds = perf_counter() - start
+        cpu = process_time() - cpu
+    finally:
+        host.close()
+
+    peak = peak_mb()
+    results.put({
+        'converged': host.converged(),
+        'seconds': seconds,
+        'updates': sum(r.update_count for r in routers),
+        'messages': sum(r.messages_sent for r in routers),
+        'bytes': sum(r.bytes_sent for r in routers),
+        'cpu_seconds': cpu,
+        'peak_mb': peak,
+        'router_mb': (peak - before) / len(routers),
+        'routers': {r.id: {'messages': r.messages_sent, 'bytes': r.bytes_sent,
+                           'cpu_seconds': r.metrics.get('cpu_seconds')} for r in routers},
+    })
+
+# Run one network in a fresh process, and return its results, or None if the process failed
+def run_in_process(path, mode, args):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(path, mode, args.base_port, args.timeout, results))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                break
+    process.join()
+    return result
+
+# The commit the code came from, with a + on the end if there are changes on top of it
+def code_version():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], capture_output=True).returncode != 0
+        return commit + ('+' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# Print how every run in `runs` changed from the same run in the results file at `path`
+def compare(runs, path):
+    with open(path) as file:
+        old = json.load(file)
+    before = {(run['topology'], run['mode']): run for run in old['runs']}
+    print(f'\nCompared with {path} ({old["version"]}, {old["time"]}):')
+    for run in runs:
+        previous = before.get((run['topology'], run['mode']))
+        if previous is None:
+            continue
+        changes = []
+        for name, lower_is_better in COMPARED.items():
+            if previous[name]:
+                change = (run[name] - previous[name]) / previous[name] * 100
+                better = (change < 0) == lower_is_better
+                changes.append(f'{name} {change:+.1f}%{"" if abs(change) < 5 else " (better)" if better else " (worse)"}')
+        print(f'    {run["topology"]} {run["mode"]}: {", ".join(changes)}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the routers on made up networks, and save the results')
+    parser.add_argument('--topology', nargs='*', default=DEFAULT_TOPOLOGIES,
+                        help=f'networks to run, as SHAPE:SIZE, where SHAPE is one of {", ".join(topogen.SHAPES)}')
+    parser.add_argument('--mode', nargs='*', choices=router.MODES, default=list(router.MODES))
+    parser.add_argument('--repeat', type=int, default=1, help='run each network this many times, keeping the fastest')
+    parser.add_argument('--degree', type=int, default=4, help='about how many links each node has, where the shape allows')
+    parser.add_argument('--out', help=f'file to save the results to, instead of a new one in {RESULTS_DIR}')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--timeout', type=float, default=120, help='give up on a run after this many seconds')
+    parser.add_argument('--base-port', type=int, default=25000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    runs = []
+    print(f'{"network":<16} {"mode":<4} {"nodes":>5} {"links":>5} {"seconds":>8} {"messages":>9} {"bytes":>11} '
+          f'{"cpu s":>7} {"peak MB":>8} {"KB/router":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        for spec in args.topology:
+            shape, _, size = spec.partition(':')
+            if shape not in topogen.SHAPES or not size.isdigit():
+                print(f'{spec} should be SHAPE:SIZE, where SHAPE is one of {", ".join(topogen.SHAPES)}')
+                return
+            network = topogen.generate(shape, int(size), args.degree, args.seed)
+            path = os.path.join(directory, f'{shape}{size}.config')
+            network.write(path)
+
+            for mode in args.mode:
+                results = [run_in_process(path, mode, args) for _ in range(args.repeat)]
+                results = [result for result in results if result is not None]
+                if not results:
+                    print(f'{spec:<16} {mode:<4} failed')
+                    continue
+                result = min(results, key=lambda result: result['seconds'])
+                result.update(topology=spec, mode=mode, nodes=len(network.nodes), links=network.link_count())
+                runs.append(result)
+                print(f'{spec:<16} {mode:<4} {result["nodes"]:>5} {result["links"]:>5} '
+                      f'{result["seconds"]:>8.3f} {result["messages"]:>9} {result["bytes"]:>11} '
+                      f'{result["cpu_seconds"]:>7.2f} {result["peak_mb"]:>8.1f} {result["router_mb"] * 1024:>9.1f}'
+                      f'{"" if result["converged"] else "  did not converge"}')
+
+    now = datetime.datetime.now()
+    path = args.out
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f'{now:%Y%m%d-%H%M%S}.json')
+    with open(path, 'w') as file:
+        json.dump({'version': code_version(), 'time': now.isoformat(timespec='seconds'),
+                   'python': platform.python_version(), 'seed': args.seed, 'runs': runs}, file, indent=1)
+    print(f'Saved results to {path}')
+
+    if args.compare:
+        compare(runs, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# pytest puts the directory of this file on the path, so that the tests in tests/ can import
+# the modules at the top of the repository.
+#
+# To run the tests:
+#     python3 -m pytest tests
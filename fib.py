@@ -0,0 +1,126 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# The forwarding table of a router. The routing table only says how much it costs to reach each
+# node, while the forwarding table says which neighbor to hand a packet to for each destination,
+# along with what it will cost from here. Both are stored by node index in flat arrays, so a
+# lookup is a single index, and many destinations can be looked up at once.
+#
+# In distance vector mode, the next hop to a destination is the neighbor with the lowest cost of
+# the edge to it plus its own cost to the destination. When some of the costs in a neighbor's
+# row change, only those destinations are worked out again. In link state mode the next hops come
+# from the paths the routing engine found.
+
+from array import array
+
+# The next hop of a destination we have no path to
+NO_ROUTE = -1
+
+class ForwardingTable:
+    def __init__(self, n, infinity):
+        self.n = n
+        self.infinity = infinity
+
+        # Destination index -> index of the neighbor to send to, or NO_ROUTE. A router's own
+        # index maps to itself
+        self.next_hops = array('i', [NO_ROUTE]) * n
+
+        # Destination index -> cost through that neighbor
+        self.costs = array('I', [infinity]) * n
+
+        # How many times a next hop has changed
+        self.changes = 0
+
+    def __len__(self):
+        return self.n
+
+    # Make room for `n` destinations. The new ones have no route until they are worked out
+    def resize(self, n):
+        self.next_hops.extend(array('i', [NO_ROUTE]) * (n - self.n))
+        self.costs.extend(array('I', [self.infinity]) * (n - self.n))
+        self.n = n
+
+    # The (next hop, cost) of destination index `v`
+    def lookup(self, v):
+        return self.next_hops[v], self.costs[v]
+
+    # The next hops of every destination index in `destinations`, in the same order
+    def lookup_many(self, destinations):
+        next_hops = self.next_hops
+        return [next_hops[v] for v in destinations]
+
+    # Set the next hop and cost of destination index `v`
+    def set(self, v, next_hop, cost):
+        if self.next_hops[v] != next_hop:
+            self.next_hops[v] = next_hop
+            self.changes += 1
+        self.costs[v] = cost
+
+    # Work out the next hop of each destination index in `destinations` from a table of costs, where
+    # `edges` maps the index of each of our neighbors to the cost of our edge to it. Every
+    # destination is worked out if `destinations` is None. `poisoned` maps the index of a
+    # neighbor to the destinations it reaches through us, which can't be reached through it
+    def update_from_neighbors(self, table, source, edges, destinations=None, poisoned=None):
+        infinity = self.infinity
+        poisoned = poisoned or {}
+        if destinations is None:
+            # Go a whole row at a time, keeping the cheapest neighbor for every destination so far
+            best = [infinity] * self.n
+            hops = [NO_ROUTE] * self.n
+            for neighbor, edge in edges.items():
+                row = table.row(neighbor)
+                for v in poisoned.get(neighbor, ()):
+                    row[v] = infinity
+                for v, cost in enumerate(row):
+                    cost += edge
+                    if cost < best[v]:
+                        best[v] = cost
+                        hops[v] = neighbor
+            destinations = range(self.n)
+        else:
+            best = {}
+            hops = {}
+            for v in destinations:
+                best[v], hops[v] = min(((edge + (infinity if v in poisoned.get(neighbor, ()) else table.get(neighbor, v)), neighbor)
+                                        for neighbor, edge in edges.items()), default=(infinity, NO_ROUTE))
+
+        for v in destinations:
+            if v == source:
+                self.set(v, source, 0)
+            elif best[v] >= infinity:
+                self.set(v, NO_ROUTE, infinity)
+            else:
+                self.set(v, hops[v], best[v])
+
+    # Work out every next hop from the (distance, predecessor) lists the routing engines return
+    def update_from_paths(self, source, distance, predecessor):
+        infinity = self.infinity
+
+        # Follow each path back towards the source until we reach a node whose next hop we
+        # already know, or the first node after the source, which is itself the next hop. Every
+        # node passed on the way has the same next hop
+        unknown = NO_ROUTE - 1
+        hops = [unknown] * self.n
+        hops[source] = source
+        for v in range(self.n):
+            path = []
+            u = v
+            while hops[u] == unknown:
+                p = predecessor[u]
+                if p is None or distance[u] >= infinity:
+                    hops[u] = NO_ROUTE
+                elif p == source:
+                    hops[u] = u
+                else:
+                    path.append(u)
+                    u = p
+            for w in path:
+                hops[w] = hops[u]
+
+        for v, hop in enumerate(hops):
+            if v == source:
+                self.set(v, source, 0)
+            elif hop == NO_ROUTE:
+                self.set(v, NO_ROUTE, infinity)
+            else:
+                self.set(v, hop, distance[v])
@@ -0,0 +1,202 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Reliable flooding. A broadcast is sent to every neighbor, and each router that gets it for the
+# first time passes it on to all of its own neighbors, until every router in the network has it.
+#
+# Every broadcast is named by the node it started at and a sequence number that node picks, so
+# telling whether we have seen a broadcast before never means comparing whole messages. The
+# broadcasts we have seen are kept in a cache that forgets them after a while, and that never
+# grows past a fixed size.
+#
+# Each neighbor has to acknowledge every broadcast it is sent. Until it does, the broadcast is
+# sent to it again, waiting twice as long each time. Any number of broadcasts can be waiting on
+# acknowledgements at once, and each neighbor of each broadcast has its own timer.
+
+import heapq
+from collections import OrderedDict
+
+# Remembers which broadcasts have been seen, by (origin, sequence number). Entries are forgotten
+# once they are `ttl` seconds old, or once there are more than `capacity` of them, oldest first
+class SeenCache:
+    def __init__(self, capacity, ttl):
+        self.capacity = capacity
+        self.ttl = ttl
+        # key -> when it should be forgotten. Every entry lives for the same `ttl`, so entries
+        # are always ordered by when they expire
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # Remember `key`, seen at time `now`. Returns False if it had already been seen
+    def add(self, key, now):
+        self.expire(now)
+        seen = key in self.entries
+        self.entries[key] = now + self.ttl
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return not seen
+
+    # Forget everything that is too old
+    def expire(self, now):
+        entries = self.entries
+        while entries:
+            key, deadline = next(iter(entries.items()))
+            if deadline > now:
+                break
+            del entries[key]
+
+# A broadcast that is still waiting on acknowledgements from some of our neighbors
+class Outstanding:
+    def __init__(self, payload):
+        self.payload = payload
+        # neighbor -> [when to send it again, how long to wait after that, times sent]
+        self.pending = {}
+
+# Does the flooding for one router. `send(neighbor, msg_type, data)` is how messages leave
+# the router, where `data` is (origin, seq, payload) for a broadcast and (origin, seq) for an
+# acknowledgement.
+class Flooder:
+    def __init__(self, id, send, retransmit=.5, max_backoff=8, max_attempts=10, capacity=1024, ttl=60):
+        self.id = id
+        self.send = send
+
+        # How long to wait for the first acknowledgement, the longest we will ever wait between
+        # tries, and how many times we try before giving up on a neighbor
+        self.retransmit = retransmit
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+
+        # The sequence number of the next broadcast that starts here
+        self.next_seq = 0
+
+        # Broadcasts we have already seen
+        self.seen = SeenCache(capacity, ttl)
+
+        # (origin, seq) -> Outstanding
+        self.outstanding = {}
+
+        # When each neighbor of each outstanding broadcast next needs it sent again, as
+        # (time, origin, seq, neighbor). Entries that have since been acknowledged or pushed back
+        # are left in place and skipped over when they come up
+        self.deadlines = []
+
+        # Broadcasts that have arrived for the first time, as (payload, neighbor it came from),
+        # waiting for the router to deal with them
+        self.delivered = []
+
+        # How many times a broadcast had to be sent again, and how many neighbors were given up on
+        self.retransmits = 0
+        self.gave_up = 0
+
+    # Start a new broadcast of `payload` to `neighbors`. Returns its (origin, seq)
+    def originate(self, payload, neighbors, now):
+        key = (self.id, self.next_seq)
+        self.next_seq = (self.next_seq + 1) & 0xffffffff
+        self.seen.add(key, now)
+        self.forward(key, payload, neighbors, now)
+        return key
+
+    # Send a broadcast to every one of `neighbors`, and wait for each of them to acknowledge it
+    def forward(self, key, payload, neighbors, now):
+        if not neighbors:
+            return
+        outstanding = self.outstanding.get(key)
+        if outstanding is None:
+            outstanding = self.outstanding[key] = Outstanding(payload)
+        for neighbor in neighbors:
+            self.send(neighbor, 'broadcast', (*key, payload))
+            outstanding.pending[neighbor] = [now + self.retransmit, self.retransmit * 2, 1]
+            heapq.heappush(self.deadlines, (now + self.retransmit, *key, neighbor))
+
+    # Handle a broadcast that `sender` sent us. Returns whether it was new. That is up to what we
+    # remember seeing, unless `new` is given, for broadcasts the router can judge better itself.
+    # A broadcast that isn't new is acknowledged but never passed on
+    def receive(self, origin, seq, payload, sender, neighbors, now, new=None):
+        key = (origin, seq)
+
+        # Always acknowledge it, even if we have seen it, because our first acknowledgement
+        # may have been lost
+        self.send(sender, 'ack', key)
+
+        # Someone who sends us a broadcast clearly already has it
+        self.acknowledge(origin, seq, sender)
+
+        first = self.seen.add(key, now)
+        if new is None:
+            new = first
+        if not new:
+            return False
+
+        self.delivered.append((payload, sender))
+        self.forward(key, payload, [n for n in neighbors if n != sender and n != origin], now)
+        return True
+
+    # `neighbor` has acknowledged the broadcast (origin, seq)
+    def acknowledge(self, origin, seq, neighbor):
+        key = (origin, seq)
+        outstanding = self.outstanding.get(key)
+        if outstanding is None:
+            return
+        outstanding.pending.pop(neighbor, None)
+        if not outstanding.pending:
+            del self.outstanding[key]
+
+    # The entry for `neighbor` in broadcast `key` that the deadline (time, origin, seq, neighbor)
+    # belongs to, or None if it is out of date
+    def entry(self, deadline):
+        outstanding = self.outstanding.get(deadline[1:3])
+        if outstanding is None:
+            return None
+        entry = outstanding.pending.get(deadline[3])
+        if entry is None or entry[0] != deadline[0]:
+            return None
+        return entry
+
+    # Send every broadcast that has gone unacknowledged for too long again
+    def poll(self, now):
+        deadlines = self.deadlines
+        while deadlines and deadlines[0][0] <= now:
+            deadline = heapq.heappop(deadlines)
+            entry = self.entry(deadline)
+            if entry is None:
+                continue
+
+            key, neighbor = deadline[1:3], deadline[3]
+            outstanding = self.outstanding[key]
+            if entry[2] >= self.max_attempts:
+                self.gave_up += 1
+                self.acknowledge(*key, neighbor)
+                continue
+
+            self.send(neighbor, 'broadcast', (*key, outstanding.payload))
+            self.retransmits += 1
+            entry[0] = now + entry[1]
+            entry[1] = min(entry[1] * 2, self.max_backoff)
+            entry[2] += 1
+            heapq.heappush(deadlines, (entry[0], *key, neighbor))
+        self.seen.expire(now)
+
+    # When `poll` next has something to do, or None if nothing is waiting
+    def next_deadline(self):
+        deadlines = self.deadlines
+        while deadlines and self.entry(deadlines[0]) is None:
+            heapq.heappop(deadlines)
+        return deadlines[0][0] if deadlines else None
+
+    # Whether every broadcast has been acknowledged by everyone
+    def idle(self):
+        return not self.outstanding
+
+    # Take the oldest delivered broadcast of kind `kind`, or None if there isn't one
+    def take(self, kind):
+        for i, (payload, sender) in enumerate(self.delivered):
+            if payload[0] == kind:
+                del self.delivered[i]
+                return payload, sender
+        return None
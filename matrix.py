@@ -0,0 +1,147 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+from array import array
+
+# A square table of costs between every pair of nodes. Instead of a dict for every node, the
+# costs are stored row by row in one flat array of unsigned ints, where the cost from node
+# index `u` to node index `v` lives at `u * n + v`.
+#
+# This can also be handed straight to the routing engines as a graph, where each cost that is
+# less than `infinity` is an edge.
+#
+# The matrix keeps count of how many pairs of nodes are unsettled, meaning the cost from one
+# to the other is infinity or is different from the cost back again. The count is kept up to
+# date on every change, so checking whether the matrix is symmetrical with no infinite costs
+# never needs to look at the whole matrix.
+#
+# Each row also has a version, which the node the row belongs to raises every time it changes
+# the row, so that an old copy of a row can be told apart from a newer one.
+#
+# Nodes that have been taken out of the network can be marked as absent. Pairs with an absent
+# node in them are never counted as unsettled, since nobody will ever have a path to it.
+class CostMatrix:
+    def __init__(self, n, infinity):
+        self.n = n
+        self.infinity = infinity
+        self.unsettled = 0
+        self.absent = set()
+        self.reset()
+
+    def __len__(self):
+        return self.n
+
+    # Set every cost to infinity, except for the cost from a node to itself, which is 0
+    def reset(self):
+        n = self.n
+        self.cells = array('I', [self.infinity]) * (n * n)
+        self.cells[::n + 1] = array('I', [0]) * n
+        self.versions = array('Q', [0]) * n
+        present = n - len(self.absent)
+        self.unsettled = present * (present - 1) // 2
+
+    # Make room for `n` nodes, keeping every cost that is already there. The new nodes start
+    # with every cost to and from them infinity, except to themselves
+    def resize(self, n):
+        m = self.n
+        old = self.cells
+        self.n = n
+        self.cells = array('I', [self.infinity]) * (n * n)
+        for u in range(m):
+            self.cells[u*n:u*n + m] = old[u*m:(u+1)*m]
+        self.cells[::n + 1] = array('I', [0]) * n
+        self.versions.extend(array('Q', [0]) * (n - m))
+
+        # Every pair with a new node in it is unsettled
+        present = m - len(self.absent)
+        self.unsettled += (n - m) * present + (n - m) * (n - m - 1) // 2
+
+    # Mark node `u` as absent, or as back again if `absent` is False
+    def set_absent(self, u, absent=True):
+        if absent == (u in self.absent):
+            return
+        if absent:
+            self.unsettled -= self.row_unsettled(u)
+            self.absent.add(u)
+        else:
+            self.absent.discard(u)
+            self.unsettled += self.row_unsettled(u)
+
+    # Whether the pair of nodes `u` and `v` is unsettled
+    def pair_unsettled(self, u, v):
+        if self.absent and (u in self.absent or v in self.absent):
+            return False
+        a = self.cells[u*self.n + v]
+        return a != self.cells[v*self.n + u] or a == self.infinity
+
+    # How many of the pairs including node `u` are unsettled. The row and column are compared in
+    # one pass, and the cost from `u` to itself, which is in both, is taken back out
+    def row_unsettled(self, u):
+        infinity = self.infinity
+        if self.absent:
+            if u in self.absent:
+                return 0
+            absent = self.absent
+            return sum(a != b or a == infinity for v, (a, b) in enumerate(zip(self.row(u), self.column(u)))
+                       if v != u and v not in absent)
+        unsettled = sum(a != b or a == infinity for a, b in zip(self.row(u), self.column(u)))
+        return unsettled - (self.cells[u*self.n + u] == infinity)
+
+    # Set every cost leaving node `u` to infinity, except for the cost to itself
+    def clear_row(self, u):
+        n = self.n
+        self.unsettled -= self.row_unsettled(u)
+        self.cells[u*n:(u+1)*n] = array('I', [self.infinity]) * n
+        self.cells[u*n + u] = 0
+        self.unsettled += self.row_unsettled(u)
+
+    def get(self, u, v):
+        return self.cells[u*self.n + v]
+
+    def set(self, u, v, cost):
+        if u == v:
+            self.cells[u*self.n + v] = cost
+            return
+        before = self.pair_unsettled(u, v)
+        self.cells[u*self.n + v] = cost
+        self.unsettled += self.pair_unsettled(u, v) - before
+
+    # A copy of all of the costs leaving node `u`
+    def row(self, u):
+        return self.cells[u*self.n:(u+1)*self.n]
+
+    # A copy of all of the costs entering node `v`
+    def column(self, v):
+        return self.cells[v::self.n]
+
+    # Replace all of the costs leaving node `u`
+    def set_row(self, u, costs):
+        self.unsettled -= self.row_unsettled(u)
+        self.cells[u*self.n:(u+1)*self.n] = array('I', costs)
+        self.unsettled += self.row_unsettled(u)
+
+    def set_version(self, u, version):
+        self.versions[u] = version
+
+    # Replace every cost and version at once, such as when starting again from a snapshot. The
+    # unsettled pairs are counted once at the end, rather than once for every row
+    def load(self, cells, versions):
+        self.cells[:] = array('I', cells)
+        self.versions[:] = array('Q', versions)
+        self.unsettled = sum(self.row_unsettled(u) for u in range(self.n)) // 2
+
+    # The cost of the edge from `u` to `v`, for the routing engines
+    def cost(self, u, v):
+        return self.cells[u*self.n + v]
+
+    def neighbors(self, u):
+        infinity = self.infinity
+        return [(v, w) for v, w in enumerate(self.row(u)) if w < infinity]
+
+    def incoming(self, v):
+        infinity = self.infinity
+        return [(u, w) for u, w in enumerate(self.column(v)) if w < infinity]
+
+    # Check that the matrix is symmetrical along the diagonal axis and that no cost is infinity
+    def symmetric_and_finite(self):
+        return self.unsettled == 0
@@ -0,0 +1,160 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Counters and histograms that describe what a router has been doing, such as how many
+# messages of each type it sent and recieved, how many bytes that took, and how long working
+# out its routes took. Every router has its own Metrics, and they can be written out together
+# as JSON or in the Prometheus text format, either to a file or from a small HTTP server:
+#
+#     GET /metrics         Prometheus text
+#     GET /metrics.json    JSON
+#
+# A counter, gauge or histogram can have a label, such as the message type, so that one name covers
+# several related values. Counting something is only a dict lookup and an add, so they are
+# cheap enough to keep on all of the time.
+
+import json, bisect
+from threading import Thread
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds of the buckets that histograms of times are sorted into, in seconds
+TIME_BUCKETS = (.00001, .00005, .0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 10, 60)
+
+# Every name is given this prefix in the Prometheus text format
+PREFIX = 'router_'
+
+# Counts of how many values were at most each of `buckets`, along with their count and total
+class Histogram:
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = buckets
+
+        # The last count is for values bigger than every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        return {'buckets': dict(zip(map(str, self.buckets), self.counts)), 'overflow': self.counts[-1],
+                'count': self.count, 'sum': self.sum}
+
+class Metrics:
+    def __init__(self):
+        # (name, label) -> value. The label is None for values that don't have one. Counters only
+        # ever go up, while gauges can go either way
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    # Add `amount` to the counter `name`
+    def count(self, name, label=None, amount=1):
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    # Set the counter `name` to `value`, for counts that are kept track of somewhere else
+    def set(self, name, value, label=None):
+        self.counters[(name, label)] = value
+
+    # Set the gauge `name` to `value`
+    def gauge(self, name, value, label=None):
+        self.gauges[(name, label)] = value
+
+    # Add `value` to the histogram `name`
+    def observe(self, name, value, label=None):
+        key = (name, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def get(self, name, label=None):
+        return self.counters.get((name, label), 0)
+
+    # Everything, as plain dicts and lists. Values with a label are grouped under their name
+    def to_dict(self):
+        result = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for kind, values in (('counters', self.counters), ('gauges', self.gauges), ('histograms', self.histograms)):
+            # Copied first, since the router may be adding to them while a server thread reads
+            for (name, label), value in list(values.items()):
+                if kind == 'histograms':
+                    value = value.to_dict()
+                if label is None:
+                    result[kind][name] = value
+                else:
+                    result[kind].setdefault(name, {})[label] = value
+        return result
+
+# Every router's metrics as JSON. `collect()` returns a list of (router id, Metrics)
+def to_json(collect):
+    return json.dumps({id: metrics.to_dict() for id, metrics in collect()}, indent=1)
+
+# Every router's metrics in the Prometheus text format, with the router id as a label
+def to_prometheus(collect):
+    counters = {}
+    gauges = {}
+    histograms = {}
+    for id, metrics in collect():
+        for (name, label), value in list(metrics.counters.items()):
+            counters.setdefault(f'{name}_total', []).append((labels(id, label), value))
+        for (name, label), value in list(metrics.gauges.items()):
+            gauges.setdefault(name, []).append((labels(id, label), value))
+        for (name, label), histogram in list(metrics.histograms.items()):
+            histograms.setdefault(name, []).append((id, label, histogram))
+
+    lines = []
+    for kind, values_by_name in (('counter', counters), ('gauge', gauges)):
+        for name, values in values_by_name.items():
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+            lines += [f'{PREFIX}{name}{{{text}}} {value}' for text, value in values]
+    for name, values in histograms.items():
+        lines.append(f'# TYPE {PREFIX}{name} histogram')
+        for id, label, histogram in values:
+            total = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                total += count
+                lines.append(f'{PREFIX}{name}_bucket{{{labels(id, label)},le="{bound}"}} {total}')
+            lines.append(f'{PREFIX}{name}_bucket{{{labels(id, label)},le="+Inf"}} {histogram.count}')
+            lines.append(f'{PREFIX}{name}_sum{{{labels(id, label)}}} {histogram.sum}')
+            lines.append(f'{PREFIX}{name}_count{{{labels(id, label)}}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+# The Prometheus labels of one router's value
+def labels(id, label):
+    return f'router="{id}"' if label is None else f'router="{id}",type="{label}"'
+
+# Write every router's metrics to `path`, as JSON if it ends in .json and Prometheus text if not
+def dump(path, collect):
+    text = to_json(collect) if path.endswith('.json') else to_prometheus(collect)
+    with open(path, 'w') as file:
+        file.write(text)
+
+# Serve every router's metrics over HTTP on `port` of the local machine, from a background
+# thread. Returns the server, so it can be shut down
+def serve(port, collect, host='127.0.0.1'):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, kind = to_prometheus(collect), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, kind = to_json(collect), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            body = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', kind)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Requests aren't printed, so they don't get mixed in with what the routers print
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,16 +1,20 @@
 # Steven Culwell  Sameer Dayani
 # 1001783662      1002015854
 
-import pickle, re, sys, socket
-from threading import Thread
-from time import sleep
+import os, sys, selectors
+from array import array
+from time import monotonic, time, perf_counter, process_time
 import datetime
+import wire, routing, topology, flooding, transport, fib, metrics, snapshot
+from matrix import CostMatrix
+from topology import NodeRegistry
 
-# The IP address that all routers will be using (localhost)
+# The IP address that all routers will be using (localhost), unless the config file
+# gives a router its own address
 IP = '127.0.0.1'
 
 # The port from which we start counting. This should be the port of the first
-# router, which is usually 'A'
+# router in the config file, which is usually 'A'
 BASE_PORT = 0
 
 # A value to represent an infinite cost to get from one node to another
@@ -19,374 +23,1929 @@ INFINITY = 999
 # The name of our config file
 CONFIG_FILE = 'topology.config'
 
-# The default timeout before we give up on recieving a message, and also
-# how long we wait until listening for another message. Measured in seconds
+# The default timeout before we give up on recieving a message. Measured in seconds
 TIMEOUT = .5
 
-# All valid nodes
-NODES = 'ABCDEF'
+# How often we send our table to our neighbors, even if nothing has changed. This is
+# independent of TIMEOUT, since messages are handled as soon as they arrive. Measured in seconds
+REFRESH_INTERVAL = 1
 
-# The table containing the cost from each node to each other node
-table = {}
+# After the table changes, how long to wait before telling our neighbors. Any other changes
+# made in that time go out in the same update. Measured in seconds
+HOLD_DOWN = .05
 
-# The list of nodes which share an edge with this node
-edges = {}
+# How many triggered updates each neighbor can be sent per second, and how many can be sent
+# in a burst before that limit kicks in. Periodic refreshes are not limited
+UPDATE_RATE = 20
+UPDATE_BURST = 5
 
-# Encode a message using pickle
+# How many refreshes in a row have to go by without any change to the table before a router
+# gives up on converging. This is what stops a router from waiting forever when the network
+# has been split in two, and some nodes can never be reached
+QUIET_REFRESHES = 3
+
+# The largest datagram that we will send or recieve, including the IP and UDP headers.
+# Messages bigger than this are split into fragments. Measured in bytes
+MTU = 1500
+
+# The size of the IP and UDP headers, which take up part of each datagram
+UDP_HEADER_SIZE = 28
+
+# How long we hold on to part of a fragmented message while nothing more of it arrives, and how
+# long the sender holds on to its fragments in case they are asked for again, in seconds
+REASSEMBLY_TIMEOUT = 2
+
+# How many fragments of a message are sent before the reciever asks for more, and how long the
+# reciever waits without anything arriving before it asks again for fragments that went missing,
+# in seconds. A table too big to send in one go would otherwise overflow the reciever's socket
+FRAGMENT_WINDOW = 128
+FRAGMENT_RESEND_DELAY = .05
+
+# How much room the operating system should give each socket for datagrams that have not
+# been read yet. A full table can be split into many fragments that all arrive at once
+SOCKET_BUFFER_SIZE = 1 << 20
+
+# How often routers that share their rows look for changes to the rows of the others, in
+# seconds. Nothing wakes them up when a row in shared memory changes
+SHARED_POLL_INTERVAL = .01
+
+# Whether routers print every change to their tables. Printing is slow enough to matter when
+# there are a lot of changes, so it can be turned off with --quiet
+VERBOSE = True
+
+# How many hops a data packet can take before it is dropped, in case it is caught in a loop
+DATA_TTL = 64
+
+# How often a router says hello to each of its neighbors, and how long a neighbor can go without
+# being heard from before the link to it is treated as down, in seconds
+HELLO_INTERVAL = .25
+DEAD_INTERVAL = 1
+
+# Whether a router tells each neighbor which destinations it reaches through that neighbor, so
+# that the neighbor never sends traffic for them back the way it came (poisoned reverse)
+POISON_REVERSE = True
+
+# How long to wait for a neighbor to acknowledge a broadcast before sending it again. Each time
+# it is sent again we wait twice as long, up to FLOOD_MAX_BACKOFF, and after FLOOD_ATTEMPTS tries
+# we give up on that neighbor. Measured in seconds
+FLOOD_RETRANSMIT = TIMEOUT
+FLOOD_MAX_BACKOFF = 8
+FLOOD_ATTEMPTS = 10
+
+# How many broadcasts each router remembers having seen, and for how long. Measured in seconds
+SEEN_CACHE_SIZE = 1024
+SEEN_TTL = 60
+
+# How often routers save a snapshot of their routing state, when they have been given somewhere
+# to save it, measured in seconds. Nothing is saved if nothing changed since the last one
+SNAPSHOT_INTERVAL = 5
+
+# How far a router that starts from a snapshot skips its sequence numbers ahead, since it may have
+# used some of the ones after the snapshot before it stopped
+SEQUENCE_GAP = 1 << 16
+
+# How routers send and recieve datagrams. One of the names in transport.TRANSPORTS
+TRANSPORT = 'udp'
+
+# The shortest path engine routers use to recompute their costs. One of the names in
+# routing.ENGINES
+ENGINE = 'incremental'
+
+# How routers work out their routes:
+#     dv   distance vector. Routers send their whole table to their neighbors, and each
+#          router works out its costs from the tables of its neighbors
+#     ls   link state. Each router floods only its own links to every other router, and
+#          every router works out its costs from the links of the whole network
+MODES = ('dv', 'ls')
+MODE = 'dv'
+
+# All valid nodes, numbered in the order they appear in the config file. A node's number
+# is also its row and column in a table. Filled in by `load_topology`
+NODES = NodeRegistry()
+
+# Everything defined by the config file, loaded by `load_topology`
+TOPOLOGY = topology.Topology()
+
+# The path the topology was loaded from, and the parsed config file it came from, so that
+# `reload_topology` can tell when the file has changed
+TOPOLOGY_PATH = None
+PARSED = None
+
+# The indices of nodes that have been taken out of the config file while the routers were
+# running. They keep their index, but nobody has a path to them
+REMOVED = set()
+
+# Read the config file, to find out which nodes exist and where they are
+def load_topology(path=None):
+    global NODES, TOPOLOGY, TOPOLOGY_PATH, PARSED, REMOVED
+    TOPOLOGY_PATH = path or CONFIG_FILE
+    TOPOLOGY = PARSED = topology.load(TOPOLOGY_PATH)
+    NODES = TOPOLOGY.nodes
+    REMOVED = set()
+    for line in TOPOLOGY.errors:
+        print(f'Line {line} is incorrectly formatted')
+
+# Read the config file again if it has changed since it was loaded. Nodes we already know about
+# keep their index, new nodes are numbered after them, and nodes whose lines are gone are
+# marked as removed. Returns whether anything changed
+def reload_topology():
+    global NODES, TOPOLOGY, PARSED, REMOVED
+    # A config file that is missing for a moment, while it is being replaced, is tried again later
+    try:
+        parsed = topology.load(TOPOLOGY_PATH or CONFIG_FILE)
+    except OSError:
+        return False
+    if parsed is PARSED:
+        return False
+    PARSED = parsed
+    before = TOPOLOGY
+    TOPOLOGY = topology.renumber(parsed, NODES)
+    NODES = TOPOLOGY.nodes
+    REMOVED = {u for u in range(len(NODES)) if u not in TOPOLOGY.links and (u in REMOVED or u in before.links)}
+    for line in TOPOLOGY.errors:
+        print(f'Line {line} is incorrectly formatted')
+    return True
+
+# Encode a message into our binary wire format
 def encode_message(msg_type, id, data):
-    return pickle.dumps((msg_type, id, data))
+    return wire.pack(msg_type, id, data, get_index)
 
-# Decode a byte encoded message using pickle
+# Decode a byte encoded message. Raises wire.WireError if the message is malformed
 def decode_message(raw_data):
-    return pickle.loads(raw_data)
-
-# Encode and send a message on socket `sock`, to `destination`, with messsage
-# type `msg_type`, containing `data`
-def send_message(sock, destination, msg_type, data):
-    encoded_data = encode_message(msg_type, ID, data)
-    sock.sendto(encoded_data, (IP, get_port(destination)))
+    return wire.unpack(raw_data, get_id)
 
-# Recieve some message on socket `sock` and decode it
-def recieve_message(sock):
-    raw_data, _addr = sock.recvfrom(1024)
-    
-    # Parse the message, which has been sent in an encoded byte format
-    return decode_message(raw_data)
+# Given an id, map it to the (host, port) that router listens on. Routers without an address
+# in the config file listen on IP, with ports counting up from BASE_PORT
+def get_address(id):
+    index = NODES.index[id]
+    return TOPOLOGY.addresses.get(index) or (IP, BASE_PORT + index)
 
 # Given an id, map it to the appropriate port
 def get_port(id):
-    return BASE_PORT + ord(id) - ord('A')
+    return get_address(id)[1]
 
-# Given an ID in the range A-F, map it to 0-5
+# Given an ID, map it to its position in the config file, starting at 0
 def get_index(id):
-    return ord(id) - ord('A')
+    return NODES.index[id]
 
-# Given an index from 0-5, map it to IDs A-F
+# Given a position in the config file, map it to the ID of that node
 def get_id(index):
-    return chr(index + ord('A'))
-
-# Load the config file from disk, but only pick the line defining the node with id 'id'
-def load_config(id):
-    # Initialize the table
-    for node in NODES:
-        table[node] = {}
-    
-    # Set all nodes to have an infinite cost to each neighbor node
-    for node in NODES:
-        for node2 in NODES:
-            table[node][node2] = INFINITY
-    
-    # Change the cost to 0 when going from one node to itself
-    for node in NODES:
-        table[node][node] = 0
-    
-    # Open the config file
-    with open(CONFIG_FILE) as config:
-        print('Loading config file topology.config:')
-        file = config.read()
-        print(file)
-        # Split the file into individual lines to be parsed
-        lines = file.splitlines()
-        
-        for i, line in enumerate(lines):
-            # Check if line is correctly formatted, while also getting the node this line is defining,
-            # as well as the data within the `{}` after it. Will fail if the line is improperly formatted.
-            if match := re.match(r'([A-Z])={([A-Z]:[0-9]+(,[A-Z]:[0-9]+)*)}', line):
-                # Get the node that this line is defining
-                curr = match.group(1)
-                
-                # Only consider the line defining this routers node
-                if curr != ID:
-                    continue
-                
-                # Get all the neighbors of this node, which are comma delimeted
-                neighbors = match.group(2).split(',')
-                for n in neighbors:
-                    # Check if the neighbors data is properly formatted, i.e. NEIGHBOR:COST
-                    if match := re.match(r'([A-Z]):([0-9]+)', n):
-                        # Get the neighbor in question
-                        adj = match.group(1)
-                        # Get that neighbors cost
-                        cost = int(match.group(2))
-                        # Update the value in the table
-                        table[curr][adj] = cost
-                        edges[adj] = True
-            else:
-                print(f'Line {i+1} is incorrectly formatted')
+    return NODES.ids[index]
 
 # Print out a formatted table
 def print_table(table):
-    for key, value in table.items():
-        print(f'{key} {value}')
-
-# Bellman ford algorithm for minimizing cost
-# Source: https://en.wikipedia.org/wiki/Bellman%E2%80%93Ford_algorithm
-def bellman_ford(table, source):
-    vertices = NODES
-    distance = [INFINITY] * len(vertices)
-    predecessor = [None] * len(vertices)
-    
-    distance[source] = 0
-    
-    for _ in range(len(vertices)-1):
-        for node, edges in table.items():
-            u = get_index(node)
-            for edge, w in edges.items():
-                v = get_index(edge)
-                if distance[u] + w < distance[v]:
-                    distance[v] = distance[u] + w
-                    predecessor[v] = u
-    
-    for node in vertices:
-        v = get_index(node)
-        u = predecessor[v]
-        if u != None and distance[u] + table[get_id(u)][node] < distance[v]:
-            print('There is a negative cycle')
-            return None
-    
-    return distance
-
-# Given some data sent from an `sender`, update the table with new values present in `new_table`
-def update_table(sender, new_table):
-    updated = False
-
-    # Go through each cost and replace it with the updated table's cost if it is lower
-    for node, edges in new_table.items():
-        for edge, cost in edges.items():
-            if cost < table[node][edge]:
-                print(f'Updated: Source={sender}, Current={edge}:{cost}, Previous={edge}:{table[node][edge]}')
-                updated = True
-                table[node][edge] = cost
-
-    # Perform the bellman ford algorithm to replace costs with the cost to reach by traversing one node ahead,
-    # but only if it is a lower cost
-    distance = bellman_ford(table, get_index(ID))
-    for i, cost in enumerate(distance):
-        v = NODES[i]
-        if cost < table[ID][v]:
-            print(f'Updated: Source={sender}, Current={v}:{cost}, Previous={v}:{table[ID][v]}')
-            table[ID][v] = cost
-            updated = True
-    
-    # Return whether or not any changes were made, so that we can decide whether or not to update our neighbors
-    return updated
-
-# Send an update each node that shares an edge with this node
-def update_neighbors(sock):
-    # Go through each of the nodes that share an edge with this node
-    for neighbor in edges:
-        # Send an updated table to this neighbor
-        send_message(sock, neighbor, 'update', table)
+    for u, node in enumerate(NODES):
+        print(f'{node} {dict(zip(NODES, table.row(u)))}')
+
+# What happened to the data packets that went through a router. Latencies are in seconds
+class DataStats:
+    def __init__(self):
+        # Packets that started here, were delivered here, and were sent on to a neighbor
+        self.sent = 0
+        self.delivered = 0
+        self.forwarded = 0
+
+        # Packets dropped because they ran out of hops, because there was no path, or because
+        # their header made no sense
+        self.expired = 0
+        self.no_route = 0
+        self.malformed = 0
+
+        # How long each packet that arrived here took to cross the last hop, and how long each
+        # packet delivered here took from its source
+        self.hop_latencies = array('d')
+        self.latencies = array('d')
+
+    def dropped(self):
+        return self.expired + self.no_route + self.malformed
+
+# Limits how often something can happen. Each time it happens a token is used up, and tokens
+# come back at `rate` per second, up to at most `burst` of them
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Use up a token if there is one, and return whether there was
+    def take(self, now):
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    # How long until there is a token to take
+    def time_until_token(self, now):
+        self.refill(now)
+        return max(0, (1 - self.tokens) / self.rate)
 
 # Check for convergence, meaning that the adjacency matrix is symmetrical along the diagonal axis
 # and there are no nodes marked as infinity
 def convergence(table):
-    for a in NODES:
-        for b in NODES:
-            if table[a][b] != table[b][a] or table[a][b] == INFINITY:
-                return False
-    return True
+    return table.symmetric_and_finite()
 
-# Perform a router simulation.
-def router_simulation(sock):
-    print('Press `Ctrl + C` to exit\nListening...')
-    
-    # Keep track of the total number of updates to the table
-    update_count = 0
-    
-    # Continue to run while we have not converged, or while we are waiting for a broadcast
-    while not convergence(table):
+# A single router. All of the state for one node in the topology lives here, so that
+# several routers can be hosted inside of the same process.
+class Router:
+    def __init__(self, id, port, engine=ENGINE, mode=MODE, transport=TRANSPORT):
+        self.id = id
+        self.port = port
+
+        # One of MODES
+        if mode not in MODES:
+            raise ValueError(f'Unknown mode {mode}, expected one of {", ".join(MODES)}')
+        self.mode = mode
+
+        # Finds the cheapest cost to every other node from the table
+        self.engine = routing.make_engine(engine, INFINITY)
+
+        # The table containing the cost from each node to each other node
+        self.table = CostMatrix(len(NODES), INFINITY)
+
+        # The nodes which share an edge with this node, and the cost of each edge
+        self.edges = {}
+
+        # Neighbors whose link is down because we haven't heard from them in too long, and when
+        # we last heard from each neighbor
+        self.down = set()
+        self.last_heard = {}
+
+        # How often we say hello to our neighbors, how long one can be quiet before its link is
+        # down, and when we next say hello
+        self.hello_interval = HELLO_INTERVAL
+        self.dead_interval = DEAD_INTERVAL
+        self.next_hello = 0
+
+        # The version of our own row in the table, raised whenever we change it. It starts from
+        # the time in milliseconds, so that a router that restarts is still newer than before
+        self.row_version = int(time() * 1000)
+
+        # The index of each neighbor -> the destinations it reaches through us, which we can't
+        # reach through it
+        self.poisoned = {}
+
+        # Which neighbor to send to for each destination, worked out from the table
+        self.fib = fib.ForwardingTable(len(NODES), INFINITY)
+
+        # Our own node index, and the address of every node by index, for forwarding data packets
+        self.index = get_index(id)
+        self.addresses = [get_address(node) for node in NODES]
+
+        # The topology our links and table were last set up from, so that we notice when the
+        # config file is loaded again
+        self.topology = TOPOLOGY
+
+        # What happened to the data packets that went through this router
+        self.data = DataStats()
+
+        # In link state mode, the links of every node in the network, where row u holds the
+        # links that node u last told us about, and the sequence number of those links
+        self.lsdb = CostMatrix(len(NODES), INFINITY) if mode == 'ls' else None
+        self.lsa_seqs = {}
+
+        # How many nodes that haven't been removed our own row has no path to, so that checking
+        # for convergence in link state mode doesn't mean looking through the whole row
+        self.unreachable_count = 0
+        self.count_unreachable()
+
+        # Node index -> the broadcast its links last came in, as (origin, seq, payload), so they
+        # can be passed on to a neighbor that we have only just been linked to
+        self.lsas = {}
+
+        # The sequence number of the last links we flooded. Like the row version, it starts from
+        # the time, in seconds to fit the message, so that a router that restarts without a
+        # snapshot is still newer than before
+        self.lsa_seq = int(time()) & 0xffffffff
+
+        # The transport this router sends and listens on, opened by `open`, and the name of
+        # the kind of transport to open
+        self.transport = None
+        self.transport_name = transport
+
+        # Datagrams waiting to be sent, as (data, address). They all go out together when
+        # `flush` is called
+        self.outbox = []
+
+        # Keep track of the total number of updates to the table
+        self.update_count = 0
+
+        # How many messages, and how many bytes, this router has sent
+        self.messages_sent = 0
+        self.bytes_sent = 0
+
+        # Counters and histograms of everything else this router does, and when it started
+        # working towards convergence, or None if it has already got there
+        self.metrics = metrics.Metrics()
+        self.converging_since = None
+
+        # Every change to the table is given a new version number. `changes` maps each row that
+        # has changed to the version it last changed at, oldest first, so that we can send our
+        # neighbors only the rows that have changed since they last heard from us
+        self.version = 0
+        self.changes = {}
+
+        # Neighbors that last acknowledged a version before this one need the full table,
+        # because the changes before it have been forgotten
+        self.full_before = 1
+
+        # The last version of our table each neighbor has acknowledged
+        self.acked = {}
+
+        # The last version of each neighbor's table that we have recieved
+        self.received = {}
+
+        # The rows in shared memory, when this router shares its own row with the routers on the
+        # same machine, and the sequence numbers of those rows when we last read them, or None
+        # to read all of them again
+        self.shared = None
+        self.shared_seen = None
+
+        # The id of the next message we send, so that fragments of it can be put back together
+        self.next_message_id = 0
+
+        # Messages we split into fragments, by message id, as [when to forget them, destination,
+        # fragments], so that the fragments can be sent again when the reciever asks for them
+        self.sent_fragments = {}
+
+        # Messages that have only been partly recieved so far
+        self.reassembler = wire.Reassembler(REASSEMBLY_TIMEOUT, FRAGMENT_WINDOW, FRAGMENT_RESEND_DELAY)
+
+        # Where the current time comes from
+        self.clock = monotonic
+
+        # Sends broadcasts to every router in the network, and makes sure our neighbors get them
+        self.flooder = flooding.Flooder(id, self.send_message, FLOOD_RETRANSMIT, FLOOD_MAX_BACKOFF,
+                                        FLOOD_ATTEMPTS, SEEN_CACHE_SIZE, SEEN_TTL)
+
+        # Our broadcasts are numbered from the time too, so that after a restart they are not
+        # taken for the ones we sent before, which our neighbors still remember seeing
+        self.flooder.next_seq = int(time()) & 0xffffffff
+
+        # When we should next send our table to our neighbors, even if nothing has changed
+        self.next_refresh = 0
+
+        # Neighbors that need to be told about changes to our table, and when we will next try
+        # to tell them. None if nobody needs to be told
+        self.pending_neighbors = set()
+        self.next_flush = None
+
+        # A limit on how often each neighbor is sent a triggered update
+        self.buckets = {}
+
+        # How many times the table changed while an update was already waiting to go out, and
+        # how many times an update to a neighbor had to wait because of the rate limit
+        self.coalesced_updates = 0
+        self.suppressed_sends = 0
+
+        # How many refreshes in a row have gone by without the table changing, and the version
+        # of the table at the last refresh
+        self.quiet_refreshes = 0
+        self.refreshed_version = 0
+
+        # Where this router saves snapshots of its routing state, or None if it doesn't, when it
+        # next checks whether to save one, and how far the table had got at the last one
+        self.snapshot_path = None
+        self.next_snapshot = 0
+        self.snapshot_state = None
+
+        # Whether we started from a snapshot, and the neighbors that haven't told us what they
+        # have since. Until they do, any changes they send us are to a table we may not have
+        self.restored = False
+        self.syncing = set()
+
+        # Text to put in front of everything this router prints. Used to tell routers
+        # apart when they all share the same terminal
+        self.prefix = ''
+
+        # Whether `log` prints anything
+        self.verbose = VERBOSE
+
+    # Print a message from this router, unless it was made quiet
+    def log(self, *args):
+        if self.verbose:
+            self.say(*args)
+
+    # Print a message from this router, even when it is quiet
+    def say(self, *args):
+        if self.prefix:
+            print(self.prefix, *args)
+        else:
+            print(*args)
+
+    # Open a transport on this router's IP and port. Routers opened on the same
+    # transport.LocalNetwork pass datagrams between each other in memory
+    def open(self, network=None):
+        address = (get_address(self.id)[0], self.port)
+        if self.transport_name == 'queue':
+            self.transport = transport.QueueTransport(address, SOCKET_BUFFER_SIZE, network)
+        elif network is None:
+            self.transport = transport.make_transport(self.transport_name, address, SOCKET_BUFFER_SIZE)
+        else:
+            self.transport = transport.LocalUDPTransport(address, SOCKET_BUFFER_SIZE, network)
+        self.transport.settimeout(TIMEOUT)
+
+    def close(self):
+        # Save one last snapshot, so that starting again picks up from exactly here
+        if self.snapshot_path is not None and self.version and self.snapshot_state != self.progress():
+            self.save_snapshot()
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    # Encode a message to `destination`, with messsage type `msg_type`, containing `data`. It is
+    # sent the next time `flush` is called
+    def send_message(self, destination, msg_type, data):
+        encoded_data = encode_message(msg_type, self.id, data)
+        address = get_address(destination)
+
+        # Split the message up if it is too big to fit in one datagram. Only the first window of
+        # fragments goes out now, and the rest when the reciever asks for them
+        datagrams = wire.fragment(encoded_data, get_index(self.id), self.next_message_id, MTU - UDP_HEADER_SIZE)
+        if len(datagrams) > 1:
+            self.sent_fragments[self.next_message_id & 0xffffffff] = [self.clock() + REASSEMBLY_TIMEOUT, destination, datagrams]
+        for datagram in datagrams[:FRAGMENT_WINDOW]:
+            self.outbox.append((datagram, address))
+        self.next_message_id += 1
+        self.messages_sent += 1
+        self.bytes_sent += len(encoded_data)
+        self.metrics.count('messages_sent', msg_type)
+        self.metrics.count('bytes_sent', msg_type, len(encoded_data))
+
+    # Send the fragments `indices` of message `msg_id` to `neighbor` again, because it asked for
+    # them. Fragments of messages we have forgotten, or that went somewhere else, aren't sent
+    def resend_fragments(self, neighbor, msg_id, indices):
+        sent = self.sent_fragments.get(msg_id)
+        if sent is None or sent[1] != neighbor:
+            return
+        sent[0] = self.clock() + REASSEMBLY_TIMEOUT
+        address = get_address(neighbor)
+        for i in indices:
+            if i < len(sent[2]):
+                self.outbox.append((sent[2][i], address))
+        self.metrics.count('fragments_resent', None, len(indices))
+
+    # Forget fragments of messages that nobody has asked for in a while
+    def expire_fragments(self, now):
+        for msg_id in [msg_id for msg_id, sent in self.sent_fragments.items() if sent[0] <= now]:
+            del self.sent_fragments[msg_id]
+
+    # Send every datagram that is waiting to go out, in as few system calls as the transport can
+    def flush(self):
+        if self.outbox:
+            outbox, self.outbox = self.outbox, []
+            self.transport.send_batch(outbox)
+
+    # Recieve some message on our socket and decode it
+    def recieve_message(self):
+        while True:
+            raw_data, addr = self.transport.recvfrom(MTU)
+
+            # Anything that isn't a valid message is dropped, and we keep waiting for one that is
+            msg = self.recieve_datagram(raw_data, addr)
+            if msg is not None:
+                return msg
+
+    # Decode a datagram that came from `addr`. Returns None if it isn't a valid message, or if
+    # it is only one fragment of a message and the rest of it hasn't arrived yet
+    def recieve_datagram(self, raw_data, addr):
+        # A router we have never heard of may have been added to the config file since we last
+        # read it, so it is read again before the datagram is looked at
+        if len(raw_data) >= wire.HEADER.size and wire.HEADER.unpack_from(raw_data)[2] >= len(NODES):
+            self.check_config()
+
+        # Data packets are forwarded without decoding the whole message
+        if len(raw_data) >= 2 and raw_data[1] == wire.DATA_CODE and raw_data[0] == wire.VERSION:
+            self.recieve_data(raw_data)
+            return None
+
+        # Parse the message, which has been sent in an encoded byte format
         try:
-            # Try to receive a message
-            msg_type, id, data = recieve_message(sock)
-            
-            # If we've recieved an update to the table, handle it
-            if msg_type == 'update':
-                # Try to update the table with new values
-                updated = update_table(id, data)
-                
-                # If the table was updated, send that updated table to our neighbors
-                if updated:
-                    update_count += 1
-                    update_neighbors(sock)
-            # If we still have broadcasts waiting on acknowledgements, timeout and resend them
-            sleep(TIMEOUT)
-        except TimeoutError:
-            # Periodically update our neigbors
-            update_neighbors(sock)
-    return update_count
-
-# Recieve a broadcast that matches broadcast_type
-def recv_broadcast(sock, broadcast_type):
-    while True:
+            raw_data = self.reassembler.add(raw_data, self.clock(), len(NODES))
+            if raw_data is None:
+                return None
+            msg = self.decode(raw_data)
+        except wire.WireError as e:
+            self.log(f'Dropped message from {addr}: {e}')
+            self.metrics.count('messages_dropped')
+            return None
+        self.metrics.count('messages_received', msg[0])
+        self.metrics.count('bytes_received', msg[0], len(raw_data))
+        return msg
+
+    # Decode a whole message. One that names nodes we have never heard of, such as the links of
+    # a node that has just been added, is tried again after reading the config file again
+    def decode(self, raw_data):
         try:
-            msg_type, id, data = recieve_message(sock)
-            # Keep waiting until we find a broadcast message that is the correct type
-            # of broadcast
-            if msg_type != 'broadcast' or data[0] != broadcast_type:
+            return decode_message(raw_data)
+        except wire.WireError:
+            n = len(NODES)
+            self.check_config()
+            if len(NODES) == n:
+                raise
+            return decode_message(raw_data)
+
+    # Send a data packet containing `payload` to `destination`, hop by hop along the forwarding
+    # tables of the routers on the way
+    def send_data(self, destination, payload=b'', packet_id=0):
+        now = self.clock()
+        self.data.sent += 1
+        if destination == self.id:
+            self.data.delivered += 1
+            self.data.latencies.append(0)
+            return
+        packet = encode_message('data', self.id, (self.id, destination, DATA_TTL, 0, packet_id, now, now, payload))
+        self.forward_data(packet, get_index(destination))
+
+    # Handle a data packet. If it is for us it has arrived, otherwise it is passed on to the
+    # next hop with one less hop left to live. Anyone can send us a datagram, so a packet that is
+    # too short, or whose header names nodes we don't have or has more hops taken and left than
+    # any packet starts with, is dropped
+    def recieve_data(self, raw_data):
+        now = self.clock()
+        data = self.data
+        if len(raw_data) < wire.DATA_SIZE:
+            data.malformed += 1
+            return
+        source, destination, ttl, hops, packet_id, sent, hop_sent = wire.DATA_HEADER.unpack_from(raw_data, wire.HEADER.size)
+        n = len(self.addresses)
+        if source >= n or destination >= n or ttl == 0 or ttl + hops > DATA_TTL:
+            data.malformed += 1
+            return
+        data.hop_latencies.append(now - hop_sent)
+        if destination == self.index:
+            data.delivered += 1
+            data.latencies.append(now - sent)
+            return
+        if ttl <= 1:
+            data.expired += 1
+            return
+
+        # Only the header changes from hop to hop, so it is written over a copy of the datagram
+        packet = bytearray(raw_data)
+        wire.HEADER.pack_into(packet, 0, wire.VERSION, wire.DATA_CODE, self.index)
+        wire.DATA_HEADER.pack_into(packet, wire.HEADER.size, source, destination, ttl - 1, hops + 1, packet_id, sent, now)
+        self.forward_data(packet, destination)
+
+    # Queue a data packet for the next hop towards destination index `destination`
+    def forward_data(self, packet, destination):
+        hop = self.fib.next_hops[destination]
+        if hop == fib.NO_ROUTE or hop == self.index:
+            self.data.no_route += 1
+            return
+        self.data.forwarded += 1
+        self.outbox.append((packet, self.addresses[hop]))
+
+    # Load the config file, but only pick the line defining this router's node. The config file
+    # is only read from disk again if it has changed
+    def load_config(self):
+        # The whole table is about to be replaced, so forget about past changes. Our neighbors
+        # will need the full table from us, and we will need the full table from them
+        self.version += 1
+        self.changes = {}
+        self.full_before = self.version + 1
+        self.received = {}
+        self.shared_seen = None
+        self.converging_since = self.clock()
+        self.engine.reset()
+
+        # Only our own row comes from the config file, so it is the only one put back. The rows
+        # other nodes sent us are as true as they were, and newer versions will replace them
+        self.reset_row()
+        self.poisoned = {}
+
+        # Every neighbor gets a fresh chance to say hello before its link is treated as down
+        self.reset_liveness()
+
+        # The links other nodes have told us about are still true, only our own may have changed.
+        # Our costs were just cleared, so they are all worked out again
+        if self.mode == 'ls':
+            self.install_links(get_index(self.id), self.live_edges().items())
+            self.find_routes(get_index(self.id), [])
+        else:
+            self.update_routes(self.id, force=True)
+
+    # Put this router's own row back to the costs in the config file. Only the cells for our
+    # neighbors are looked at one by one, the rest of the row is cleared in one go
+    def reset_row(self):
+        me = get_index(self.id)
+        self.table.clear_row(me)
+        self.count_unreachable()
+
+        # Only consider the line defining this routers node, as it was when the config file was
+        # last loaded
+        self.edges = {}
+        for adj, cost in TOPOLOGY.neighbors(self.id).items():
+            # Skip any neighbor that isn't in the config file, or has been taken out of it
+            if adj not in NODES or get_index(adj) in REMOVED:
+                self.log(f'Unknown neighbor {adj}')
                 continue
-            
-            # Return it and its sender
-            return data, id
-        except TimeoutError:
-            pass
-    pass
-
-# Send a broadcast to broadcast_msg. `sender` is the node we have recieved the broadcast
-# from. It can be None, which means we are the original source of the broadcast.
-def broadcast(sock, sender, broadcast_msg):
-    # Keep track of which neighbors we are waiting for acknowledgement from
-    pending_acks = [edge for edge in edges]
-    
-    # Send the broadcast to each neighbor
-    for neighbor in pending_acks:
-        send_message(sock, neighbor, 'broadcast', broadcast_msg)
-    
-    # Check if we originally recieved the broadcast from another node. In this case,
-    # we would not need acknowledgement from them, because we know they have seen
-    # the broadcast.
-    if sender != None:
-        pending_acks.remove(sender)
-    
-    # Keep going as long as we still need acknowledgement from neighbors
-    while pending_acks:
+            # Update the value in the table
+            self.set_cost(me, get_index(adj), cost)
+            self.edges[adj] = cost
+
+    # Change the cost in the table from node index `u` to node index `v`, and remember that it changed
+    def set_cost(self, u, v, cost):
+        if u == self.index and self.mode == 'ls' and v not in REMOVED:
+            self.unreachable_count += (cost >= INFINITY) - (self.table.get(u, v) >= INFINITY)
+        self.table.set(u, v, cost)
+        self.row_changed(u)
+
+    # Count the nodes our own row has no path to again from scratch, after the row or the nodes
+    # that were removed changed other than through `set_cost`
+    def count_unreachable(self):
+        row = self.table.row(self.index)
+        self.unreachable_count = sum(cost >= INFINITY for v, cost in enumerate(row) if v not in REMOVED)
+
+    # Remember that row `u` of the table changed
+    def row_changed(self, u):
+        self.version += 1
+
+        # Move the row to the end, so that `changes` stays ordered by version
+        self.changes.pop(u, None)
+        self.changes[u] = self.version
+
+    # Get every row of the table that has changed since version `base`, as a list of
+    # (row, columns, costs), like wire.pack_table expects. Rows are always sent whole, since a
+    # neighbor may have its copy of a row from someone else, and only a whole row can replace it
+    def table_changes(self, base):
+        # If the neighbor is missing changes we have already forgotten, send everything
+        if base < self.full_before:
+            rows = range(len(self.table))
+        else:
+            # Walk backwards from the newest change until we reach changes the neighbor already has
+            rows = []
+            for u, version in reversed(self.changes.items()):
+                if version <= base:
+                    break
+                rows.append(u)
+        return [(u, None, self.table.row(u)) for u in rows]
+
+    # Given some data sent from an `sender`, update the table with the rows in `rows`, a list of
+    # (row, columns, costs) where columns is None if the row is full, and `versions` is the version
+    # of each row. `destinations` are destination indices whose next hop may have changed for some
+    # other reason. Returns whether our table changed
+    def update_table(self, sender, rows, versions, destinations=()):
+        start = perf_counter()
+        table = self.table
+        me = self.index
+        neighbors = {get_index(n) for n in self.edges}
+        destinations = set(destinations)
+        changed = False
+
+        for (u, columns, costs), version in zip(rows, versions):
+            # Only the node a row belongs to ever changes it, so a row is replaced by a newer
+            # version of it even if the costs went up, and never by an older one. Our own row is
+            # only ever worked out here
+            if u == me or version <= table.versions[u]:
+                continue
+
+            current = table.row(u)
+            row = current.tolist()
+            for v, cost in zip(columns if columns is not None else range(len(costs)), costs):
+                row[v] = cost
+            for v, (cost, before) in enumerate(zip(row, current)):
+                if cost != before:
+                    if self.verbose:
+                        self.log(f'Updated: Source={sender}, Current={get_id(v)}:{cost}, Previous={get_id(v)}:{before}')
+                    # Only destinations that one of our neighbors has a new cost to can have a new
+                    # next hop
+                    if u in neighbors:
+                        destinations.add(v)
+            if row != current.tolist():
+                table.set_row(u, row)
+
+            # Even if the costs are the same, our neighbors need the newer version
+            table.set_version(u, version)
+            self.row_changed(u)
+            changed = True
+
+        if destinations and self.update_routes(sender, destinations):
+            changed = True
+        self.metrics.observe('update_table_seconds', perf_counter() - start)
+
+        # Return whether or not any changes were made, so that we can decide whether or not to update our neighbors
+        return changed
+
+    # Work out our own row of the table, and our next hop for each destination, from the rows of
+    # our neighbors whose links are up. Only `destinations` are worked out, or every destination
+    # if it is None. Unlike the other rows, costs here can go up as well as down. The new version
+    # of our row is always given out if `force` is set. Returns whether anything changed
+    def update_routes(self, source, destinations=None, force=False):
+        start = perf_counter()
+        me = self.index
+        edges = {get_index(n): cost for n, cost in self.live_edges().items()}
+        hop_changes = self.fib.changes
+        self.fib.update_from_neighbors(self.table, me, edges, destinations, self.poisoned)
+
+        # Nodes taken out of the config file can't be reached, whatever anyone's old rows say
+        if REMOVED:
+            if destinations is not None:
+                destinations = set(destinations) | REMOVED
+            for v in REMOVED:
+                if v != me:
+                    self.fib.set(v, fib.NO_ROUTE, INFINITY)
+
+        costs = self.fib.costs
+        current = self.table.row(me)
+        changed = False
+        for v in range(len(current)) if destinations is None else destinations:
+            if costs[v] != current[v]:
+                if self.verbose:
+                    self.log(f'Updated: Source={source}, Current={get_id(v)}:{costs[v]}, Previous={get_id(v)}:{current[v]}')
+                self.table.set(me, v, costs[v])
+                changed = True
+
+        # Our neighbors need to know when our next hops change too, since that changes which
+        # destinations we tell each of them we reach through them
+        changed = changed or self.fib.changes != hop_changes
+        if changed or force:
+            self.row_version += 1
+            self.table.set_version(me, self.row_version)
+            self.row_changed(me)
+        self.metrics.observe('routes_seconds', perf_counter() - start, self.mode)
+        return changed
+
+    # The destinations we reach through `neighbor`, which we tell it we can't reach at all so that
+    # it never sends them back to us
+    def poisoned_for(self, neighbor):
+        if not POISON_REVERSE:
+            return []
+        u = get_index(neighbor)
+        return [v for v, hop in enumerate(self.fib.next_hops) if hop == u and v != u]
+
+    # Send an update each node that shares an edge with this node
+    def update_neighbors(self):
+        # Go through each of the nodes that share an edge with this node
+        for neighbor in self.edges:
+            self.update_neighbor(neighbor)
+
+        # Everyone has just been told about every change
+        self.pending_neighbors.clear()
+        self.next_flush = None
+
+    # Send this neighbor everything that has changed since the last version they acknowledged
+    def update_neighbor(self, neighbor):
+        # A base of 0 tells them that this is the full table
+        base = self.acked.get(neighbor, 0)
+        if base < self.full_before:
+            base = 0
+        rows = self.table_changes(base)
+
+        # Neighbors on the same machine read the row of every router on the machine straight out
+        # of shared memory, so they only need to be sent the rows of everyone else
+        if self.shared is not None and self.shared.is_hosted(get_index(neighbor)):
+            rows = [row for row in rows if not self.shared.is_hosted(row[0])]
+            if not rows:
+                return
+        versions = [self.table.versions[u] for u, _, _ in rows]
+        self.send_message(neighbor, 'update', (self.version, base, rows, versions, self.poisoned_for(neighbor)))
+
+    # Our table has changed, so our neighbors need to be told. Rather than telling them straight
+    # away, wait HOLD_DOWN seconds so that any other changes in that time go out together
+    def trigger_update(self):
+        self.pending_neighbors.update(self.edges)
+        if self.next_flush is None:
+            self.next_flush = self.clock() + HOLD_DOWN
+        else:
+            self.coalesced_updates += 1
+
+    # Send the waiting update to each neighbor that needs one, as long as they haven't already
+    # been sent too many. Anyone over the limit is tried again once they have a token
+    def flush_updates(self, now):
+        retry = None
+        for neighbor in [n for n in self.edges if n in self.pending_neighbors]:
+            bucket = self.buckets.get(neighbor)
+            if bucket is None:
+                bucket = self.buckets[neighbor] = TokenBucket(UPDATE_RATE, UPDATE_BURST, now)
+
+            if bucket.take(now):
+                self.update_neighbor(neighbor)
+                self.pending_neighbors.discard(neighbor)
+            else:
+                self.suppressed_sends += 1
+                wait = bucket.time_until_token(now)
+                retry = wait if retry is None else min(retry, wait)
+
+        # Forget about anyone who is no longer a neighbor
+        self.pending_neighbors.intersection_update(self.edges)
+        self.next_flush = None if retry is None else now + retry
+
+    # Handle an update from `sender`, containing the changes to their table between version
+    # `base` and version `seq`
+    def recieve_update(self, sender, seq, base, changes, versions, poisoned):
+        # The sender will send us everything we are missing once it knows what we have
+        if sender in self.syncing and base != 0:
+            return False
+        known = self.received.get(sender, 0)
+
+        # We are missing some changes between the last version we have and the start of these
+        # changes, so ask for everything since the version we do have. The same goes for rows
+        # from a sender that has loaded a different number of nodes than we have, which are
+        # asked for again until we have both loaded the same config file
+        n = len(self.table)
+        if base > known or any(u >= n or len(costs) != n for u, _, costs in changes):
+            self.send_message(sender, 'update_ack', known)
+            return False
+
+        # Any destination the sender has started or stopped reaching through us may need a new
+        # next hop
+        poisoned = {v for v in poisoned if v < n}
+        before = self.poisoned.get(get_index(sender), set())
+        self.poisoned[get_index(sender)] = poisoned
+        updated = self.update_table(sender, changes, versions, poisoned ^ before)
+
+        # A full table replaces whatever we knew before, even if the sender has restarted
+        # and is counting versions from the start again
+        self.received[sender] = seq if base == 0 else max(known, seq)
+        self.send_message(sender, 'update_ack', self.received[sender])
+        return updated
+
+    # Keep our own row in `tables`, a sharedtable.SharedTables, so that routers on the same
+    # machine can read it without being sent updates, and read theirs the same way
+    def share(self, tables):
+        self.table = tables.table(get_index(self.id))
+        self.shared = tables
+
+        # Our next hops go in there too, so neighbors can see which routes go through them
+        self.table.next_hops[:] = self.fib.next_hops
+        self.fib.next_hops = self.table.next_hops
+
+    # Read the row of every router on the same machine that has changed since we last looked, in
+    # place of the updates our neighbors would otherwise send us. Returns whether our table changed
+    def read_shared(self):
+        if self.shared is None:
+            return False
+        rows, versions, self.shared_seen = self.shared.changed_rows(self.shared_seen)
+        neighbors = {get_index(n): n for n in self.edges}
+        updated = False
+        for row, version in zip(rows, versions):
+            u = row[0]
+            changes = set()
+            if u in neighbors:
+                # Reading a neighbor's row counts as hearing from it, without it having sent us
+                # an update
+                self.received.setdefault(neighbors[u], 0)
+
+                # Work out which destinations the neighbor reaches through us from its next
+                # hops, instead of being told
+                poisoned = set()
+                if POISON_REVERSE:
+                    poisoned = {v for v, hop in enumerate(self.shared.next_hops(u)) if hop == self.index and v != self.index}
+                changes = poisoned ^ self.poisoned.get(u, set())
+                self.poisoned[u] = poisoned
+            if self.update_table(get_id(u), [row], [version], changes):
+                updated = True
+        if updated:
+            self.update_count += 1
+            self.trigger_update()
+        return updated
+
+    # Our neighbors whose links are up, and the cost of each of those links
+    def live_edges(self):
+        return {n: cost for n, cost in self.edges.items() if n not in self.down}
+
+    # Start timing every neighbor from now, as if we had just heard from all of them
+    def reset_liveness(self):
+        now = self.clock()
+        self.down = set()
+        self.last_heard = {n: now for n in self.edges}
+        self.next_hello = now
+
+    # Note that we heard from `neighbor` at time `now`, and bring its link back up if it was down
+    def heard_from(self, neighbor, now):
+        self.last_heard[neighbor] = now
+        if neighbor in self.down:
+            self.link_up(neighbor)
+
+    # Say hello to every neighbor if it is time to, and take down the link to any neighbor that
+    # we haven't heard from in too long
+    def poll_liveness(self, now):
+        if now < self.next_hello:
+            return
+        self.next_hello = now + self.hello_interval
+        for neighbor in self.edges:
+            self.send_message(neighbor, 'hello', False)
+            if neighbor not in self.down and now - self.last_heard.get(neighbor, now) > self.dead_interval:
+                self.link_down(neighbor)
+
+    # Tell every neighbor that we are leaving
+    def say_goodbye(self):
+        for neighbor in self.edges:
+            self.send_message(neighbor, 'hello', True)
+        self.flush()
+
+    # Treat the link to `neighbor` as down, and stop counting on anything it told us
+    def link_down(self, neighbor):
+        self.log(f'Lost contact with {neighbor}')
+        self.metrics.count('links_lost')
+        self.down.add(neighbor)
+        self.syncing.discard(neighbor)
+        self.poisoned.pop(get_index(neighbor), None)
+        self.links_changed(neighbor)
+
+    # Bring the link to `neighbor` back up
+    def link_up(self, neighbor):
+        self.log(f'Regained contact with {neighbor}')
+        self.down.discard(neighbor)
+
+        # It may have restarted and forgotten everything, so it is sent our whole table, or
+        # everything we know about the links of the network
+        self.acked.pop(neighbor, None)
+        if self.mode == 'ls':
+            self.sync_links(neighbor)
+        self.links_changed(neighbor)
+
+    # The link to `neighbor` went down or came back up, so work out our routes again and let
+    # everyone know straight away
+    def links_changed(self, neighbor):
+        # In link state mode, everyone finds out from the links we flood rather than from our table
+        if self.mode == 'ls':
+            self.flood_links()
+        else:
+            self.update_routes(neighbor, force=True)
+            self.trigger_update()
+        self.update_count += 1
+        if self.converging_since is None:
+            self.converging_since = self.clock()
+
+    # Change the cost of our link to `neighbor` while running, adding the link if it is new, or
+    # taking it away if `cost` is None. The config file is left as it is
+    def set_link_cost(self, neighbor, cost):
+        links = dict(self.edges)
+        if cost is None:
+            links.pop(neighbor, None)
+        else:
+            links[neighbor] = cost
+        self.apply_links(links)
+
+    # Load the config file again if it has changed, and apply whatever changed in it. Only our own
+    # links are taken from it, the rest reaches us from our neighbors like any other change
+    def check_config(self):
+        reload_topology()
+        if self.topology is TOPOLOGY:
+            return
+        self.topology = TOPOLOGY
+        if len(NODES) > len(self.table):
+            self.resize(len(NODES))
+        self.forget_removed()
+
+        links = {}
+        if self.index not in REMOVED:
+            links = {n: cost for n, cost in TOPOLOGY.neighbors(self.id).items() if get_index(n) not in REMOVED}
+        self.apply_links(links)
+
+    # Make room for every node in NODES, after new nodes were added to the config file. Every
+    # cost we already have is kept, and only the new nodes start out unreachable
+    def resize(self, n):
+        self.log(f'Resizing table for {n - len(self.table)} new nodes')
+
+        # Shared memory can't grow, so from now on our neighbors are sent updates like anyone else
+        if self.shared is not None:
+            self.unshare()
+        self.table.resize(n)
+        self.count_unreachable()
+        self.fib.resize(n)
+        if self.lsdb is not None:
+            self.lsdb.resize(n)
+        self.engine.reset()
+        self.addresses = [get_address(node) for node in NODES]
+
+        # Rows are sent whole, and the rows our neighbors sent us so far are now too short, so
+        # whole tables are swapped in both directions, as after `load_config`
+        self.version += 1
+        self.changes = {}
+        self.full_before = self.version + 1
+        self.received = {}
+        if self.mode == 'ls':
+            self.find_routes(self.index, [])
+        else:
+            self.update_routes(self.id, force=True)
+            self.trigger_update()
+
+    # Take our row out of shared memory, and go back to a table of our own
+    def unshare(self):
+        shared = self.table
+        table = CostMatrix(len(shared), INFINITY)
+        table.cells[:] = shared.cells
+        table.versions[:] = shared.versions
+        table.unsettled = shared.unsettled
+        table.absent = set(shared.absent)
+        self.table = table
+        self.fib.next_hops = array('i', shared.next_hops)
+        self.shared.release(get_index(self.id))
+        self.shared = None
+        self.shared_seen = None
+
+    # Stop counting on nodes that have been taken out of the config file. Nobody needs a path to
+    # them, and in link state mode the links they last flooded are thrown away
+    def forget_removed(self):
+        for u in self.table.absent - REMOVED:
+            self.table.set_absent(u, False)
+        for u in REMOVED - self.table.absent:
+            self.table.set_absent(u)
+            if self.mode == 'ls' and u != self.index:
+                self.lsa_seqs.pop(u, None)
+                self.lsas.pop(u, None)
+                self.install_links(u, [])
+        self.count_unreachable()
+
+    # Replace our links with `links`, a dict of neighbor id -> cost, and work out again only the
+    # routes that the links that changed can affect
+    def apply_links(self, links):
+        changed = {n: (self.edges.get(n), links.get(n)) for n in self.edges.keys() | links.keys()
+                   if self.edges.get(n) != links.get(n)}
+        if not changed:
+            return
+        now = self.clock()
+        for neighbor, (before, cost) in changed.items():
+            self.log(f'Link to {neighbor} changed from {before} to {cost}')
+            if before is None:
+                self.last_heard[neighbor] = now
+                if self.mode == 'ls':
+                    self.sync_links(neighbor)
+            elif cost is None:
+                # A neighbor we are no longer linked to is forgotten, so that it is sent our
+                # whole table if it is ever linked to us again
+                for state in (self.last_heard, self.acked, self.received, self.buckets):
+                    state.pop(neighbor, None)
+                self.down.discard(neighbor)
+                self.poisoned.pop(get_index(neighbor), None)
+        destinations = self.affected_destinations(changed) if self.mode == 'dv' else None
+        self.edges = links
+
+        # In link state mode, everyone finds out from the links we flood rather than from our table
+        if self.mode == 'ls':
+            self.flood_links()
+        else:
+            self.update_routes(self.id, destinations, force=True)
+            self.trigger_update()
+        self.update_count += 1
+        if self.converging_since is None:
+            self.converging_since = self.clock()
+
+    # The destinations whose route can change when the links in `changed`, a dict of neighbor
+    # id -> (cost before, cost now), change cost. That is every destination we were sending
+    # through one of those neighbors, and every destination that is now cheaper through one
+    def affected_destinations(self, changed):
+        me = self.index
+        current = self.table.row(me)
+        next_hops = self.fib.next_hops
+        destinations = set()
+        for neighbor, (_before, cost) in changed.items():
+            u = get_index(neighbor)
+            destinations.update(v for v, hop in enumerate(next_hops) if hop == u)
+            if cost is not None and neighbor not in self.down:
+                poisoned = self.poisoned.get(u, ())
+                destinations.update(v for v, (through, best) in enumerate(zip(self.table.row(u), current))
+                                    if through + cost < best and v not in poisoned)
+        destinations.discard(me)
+        return destinations
+
+    # Tell our neighbors about ourselves for the first time. In distance vector mode they are
+    # sent our table, and in link state mode our links are flooded to everyone. If we started
+    # from a snapshot, each neighbor is only told what we have, and we swap whatever one of us is
+    # missing
+    def announce(self):
+        if self.restored:
+            self.syncing = {n for n in self.edges if self.shared is None or not self.shared.is_hosted(get_index(n))}
+            for neighbor in self.syncing:
+                self.send_message(neighbor, 'sync', (False, self.sync_vector()))
+        elif self.mode == 'ls':
+            self.flood_links()
+        else:
+            self.update_neighbors()
+        self.flush()
+
+    # Flood our own links to every router, with a new sequence number
+    def flood_links(self):
+        self.lsa_seq = (self.lsa_seq + 1) & 0xffffffff
+        self.lsa_seqs[get_index(self.id)] = self.lsa_seq
+        links = self.live_edges()
+        self.install_links(get_index(self.id), links.items())
+        payload = ('lsa', self.id, self.lsa_seq, tuple(links.items()))
+        key = self.flooder.originate(payload, list(links), self.clock())
+        self.lsas[get_index(self.id)] = (*key, payload)
+
+    # Whether `payload` is links newer than the ones we already have from the same router, or
+    # None if it isn't links. Links are judged by their own sequence number, not by what the
+    # flooder remembers seeing. Otherwise links that dropped out of that memory would go round the
+    # network forever, and the links of a router that restarted, and so used the same broadcast
+    # numbers again, would be taken for ones already seen. Our own links are never newer
+    def newer_links(self, payload):
+        if self.mode != 'ls' or payload[0] != 'lsa':
+            return None
+        u = get_index(payload[1])
+        return u != get_index(self.id) and u not in REMOVED and payload[2] > self.lsa_seqs.get(u, 0)
+
+    # Handle links flooded by another router, that came in `broadcast` from `sender`. Links older
+    # than the ones we have are ignored
+    def recieve_links(self, node, seq, links, broadcast=None, sender=None):
+        u = get_index(node)
+        ours = self.lsas.get(u)
+
+        # Our own links, from before we restarted, that are newer than the ones we have flooded
+        # since, or different ones under the same number. We carry on numbering from past them,
+        # or everyone would ignore our links
+        if u == get_index(self.id):
+            if self.mode == 'ls' and (seq > self.lsa_seq or seq == self.lsa_seq and ours is not None and
+                                      dict(links) != dict(ours[2][3])):
+                self.lsa_seq = seq
+                self.flood_links()
+            return False
+
+        if u in REMOVED:
+            return False
+        known = self.lsa_seqs.get(u, 0)
+        if seq <= known:
+            # The sender has older links than ours, or it is the router they belong to and they
+            # differ from ours under the same number, because it restarted without a snapshot and
+            # numbered them from too low. Either way it is sent ours, which gets them back to that
+            # router, so it can number its links past them. Nothing is sent while the sender has
+            # yet to acknowledge the ones we already sent it
+            if sender is not None and ours is not None and (seq < known or sender == node and dict(links) != dict(ours[2][3])):
+                outstanding = self.flooder.outstanding.get(ours[:2])
+                if outstanding is None or sender not in outstanding.pending:
+                    self.flooder.forward(ours[:2], ours[2], [sender], self.clock())
+            return False
+        self.lsa_seqs[u] = seq
+        if broadcast is not None:
+            self.lsas[u] = broadcast
+        return self.install_links(u, [(v, cost) for v, cost in links if v in NODES])
+
+    # Pass every node's links that we have on to `neighbor`, which has only just been linked to
+    # us, and so may have missed them being flooded. Anything it already has is just acknowledged.
+    # If `seqs` is given, it is the sequence number of the links the neighbor has from each node,
+    # and only newer links are sent
+    def sync_links(self, neighbor, seqs=None):
+        now = self.clock()
+        for origin, seq, payload in self.lsas.values():
+            if seqs is None or payload[2] > seqs[get_index(payload[1])]:
+                self.flooder.forward((origin, seq), payload, [neighbor], now)
+
+    # What we have, for a neighbor to compare with its own: the version of every row of our
+    # table, or in link state mode the sequence number of every node's links
+    def sync_vector(self):
+        if self.mode == 'ls':
+            return [self.lsa_seqs.get(u, 0) for u in range(len(self.lsdb))]
+        return list(self.table.versions)
+
+    # Handle a neighbor telling us what it has, from `sync_vector`, because one of us started
+    # from a snapshot. We send it only what it is missing, and tell it what we have in return if
+    # this isn't already the reply
+    def recieve_sync(self, neighbor, reply, vector):
+        if len(vector) != len(self.table):
+            return
+        if reply:
+            self.syncing.discard(neighbor)
+        else:
+            self.send_message(neighbor, 'sync', (True, self.sync_vector()))
+
+        if self.mode == 'ls':
+            self.sync_links(neighbor, vector)
+        else:
+            # The rows go out as a full table, so the neighbor starts counting our versions again
+            # from here, as it would after we restarted
+            versions = self.table.versions
+            rows = [(u, None, self.table.row(u)) for u in range(len(versions)) if versions[u] > vector[u]]
+            self.send_message(neighbor, 'update', (self.version, 0, rows, [versions[u] for u, _, _ in rows],
+                                                   self.poisoned_for(neighbor)))
+
+    # How far our routing state has got, to tell whether it changed since the last snapshot. The
+    # sequence numbers count too, since they must never go back to ones already used
+    def progress(self):
+        return self.version, self.update_count, self.lsa_seq, self.flooder.next_seq
+
+    # Save a snapshot of our routing state to `snapshot_path`
+    def save_snapshot(self):
+        start = perf_counter()
+        n = len(self.table)
+        ls = self.mode == 'ls'
+        state = snapshot.Snapshot(
+            self.mode, NODES.ids[:n], array('I', self.table.cells), array('Q', self.table.versions),
+            array('i', self.fib.next_hops), array('I', self.fib.costs), self.row_version, self.lsa_seq,
+            self.flooder.next_seq, array('I', self.lsdb.cells) if ls else None,
+            array('I', [self.lsa_seqs.get(u, 0) for u in range(n)]) if ls else None,
+            array('I', [self.lsas[u][1] if u in self.lsas else 0 for u in range(n)]) if ls else None)
+        try:
+            snapshot.save(self.snapshot_path, state)
+        except OSError as e:
+            self.log(f'Could not save snapshot to {self.snapshot_path}: {e}')
+            return
+        self.snapshot_state = self.progress()
+        self.metrics.count('snapshots_saved')
+        self.metrics.observe('snapshot_seconds', perf_counter() - start)
+
+    # Start from the snapshot at `snapshot_path` instead of from an empty table, if there is one
+    # that was taken with the same nodes and mode. Called after `load_config`, since our own links
+    # still come from the config file. Returns whether a snapshot was used
+    def restore_snapshot(self):
+        if self.snapshot_path is None:
+            return False
         try:
-            print(f'Waiting on {pending_acks}')
-            msg_type, id, msg = recieve_message(sock)
-            
-            # Check that we have recieved a broadcast and it is the same as ours
-            if msg_type == 'broadcast' and msg == broadcast_msg:
-                # If we were waiting for acknowledgement from this neighbor, mark them as acknowledged
-                if id in pending_acks:
-                    pending_acks.remove(id)
-                # Otherwise, send them back the broadcast as acknowledgement
-                else:
-                    send_message(sock, id, 'broadcast', broadcast_msg)
-        except TimeoutError:
-            # Periodically send out the broadcast, as long as we are still waiting for
-            # acknowledgement
-            for neighbor in pending_acks:
-                send_message(sock, neighbor, 'broadcast', broadcast_msg)
-
-def test1(sock, update_count):
-    print('\n-------------------------\nTest 1:')
-    sock.settimeout(TIMEOUT)
-    
-    # Broadcast from router A
-    if ID == 'A':
-        # Create the broadcast message
-        msg = [ 'message', f'{ID}, {IP}, {PORT}', ('1001783662', '1002015854'), datetime.datetime.now(), update_count, 1000 ]
-        msg[5] = sys.getsizeof(msg)
-        print(f'Sending broadcast:')
-        print(f'Broadcast info: {msg[1]}')
-        print(f'IDs: {msg[2]}')
-        print(f'UTC Time: {msg[3]}')
-        print(f'Updates: {msg[4]}')
-        print(f'Bytes: {msg[5]}\n')
-        
-        # Broadcast the message to our neighbors
-        broadcast(sock, None, msg)
-    else:
-        # Recieve a broadcast
-        msg, recv_from = recv_broadcast(sock, 'message')
-        _, info, ids, utc, updates, num_bytes = msg
-        
-        print(f'Recieved broadcast from {recv_from}')
-        print(f'Broadcast info: {info}')
-        print(f'IDs: {ids}')
-        print(f'UTC Time: {utc}')
-        print(f'Updates: {updates}')
-        print(f'Bytes: {num_bytes}\n')
-        
-        # Send that broadcast to our neighbors, except the sender
-        broadcast(sock, recv_from, msg)
-    print('\nSuccessfully broadcast message\n')
-    sleep(4)
-
-# Simulate a link being broken between nodes u and v
-def break_link(u, v):
-    # Reload the config
-    load_config(ID)
-    # Remove the edge they share
-    del edges[v]
-    # Set the cost from one to the other as INFINITY
-    table[u][v] = INFINITY
-    # Put in ascending order so that break_link(u, v) == break_link(v, u)
-    if u > v:
-        u, v = v, u
-    return ('link_broken', u, v)
-
-def test2(sock):
-    print('\n-------------------------\nTest 2:')
-    
-    sock.settimeout(TIMEOUT)
-    
-    # For nodes A and B, broadcast that a link has been broken between the two
-    if ID == 'A':
-        broadcast(sock, None, break_link('A', 'B'))
-    elif ID == 'B':
-        broadcast(sock, None, break_link('B', 'A'))
-    else:
-        # For all other nodes, recieve the broadcast that a link was broken, and
-        # clear the table. Rebroadcast to our neighbors.
-        broken_link_msg, recv_from = recv_broadcast(sock, 'link_broken')
-        
-        print(f'Recieved notice of broken link: {broken_link_msg}')
-        load_config(ID)
-        
-        broadcast(sock, recv_from, broken_link_msg)
-    
-    sleep(4)
-    print()
-    
-    # Afterwards, work back towards convergence now that the table has changed
-    router_simulation(sock)
-    
-    print('\nReached convergence:')
-    print_table(table)
+            state = snapshot.load(self.snapshot_path, NODES.ids)
+        except (OSError, snapshot.SnapshotError) as e:
+            self.log(f'Ignoring snapshot {self.snapshot_path}: {e}')
+            return False
+        if state is None or state.mode != self.mode or len(state.nodes) != len(self.table):
+            return False
+
+        n = len(self.table)
+        me = self.index
+        # Our own row stays as it is, and is worked out again below
+        state.table[me*n:(me+1)*n] = self.table.row(me)
+        state.versions[me] = self.table.versions[me]
+        self.table.load(state.table, state.versions)
+        self.fib.next_hops[:] = state.next_hops
+        self.fib.costs[:] = state.costs
+
+        # Sequence numbers and row versions we used after the snapshot was taken may already be
+        # out there, so we carry on from well past them, or from the time if that is later
+        self.flooder.next_seq = max(self.flooder.next_seq, (state.flood_seq + SEQUENCE_GAP) & 0xffffffff)
+        self.row_version = max(self.row_version, state.row_version + SEQUENCE_GAP)
+        if self.mode == 'ls':
+            self.lsa_seq = max(self.lsa_seq, (state.lsa_seq + SEQUENCE_GAP) & 0xffffffff)
+            self.lsa_seqs = {u: seq for u, seq in enumerate(state.lsa_seqs) if seq}
+            self.lsdb.load(state.lsdb, self.lsdb.versions)
+
+            # Put each node's links back together the way they were flooded, under the same
+            # broadcast, so that neighbors who sync with us can be sent them
+            for u, seq in self.lsa_seqs.items():
+                links = tuple((get_id(v), cost) for v, cost in enumerate(self.lsdb.row(u)) if v != u and cost < INFINITY)
+                self.lsas[u] = (get_id(u), state.lsa_floods[u], ('lsa', get_id(u), seq, links))
+            self.engine.reset()
+
+            # Everyone else already has our links, unless they have changed since
+            if self.install_links(me, self.live_edges().items()):
+                self.flood_links()
+            else:
+                self.find_routes(me, [])
+        else:
+            # Our own row gets a new version, worked out from our neighbors' rows as they were
+            self.update_routes(self.id, force=True)
+
+        # Save straight away, so that starting again before the next snapshot doesn't reuse the
+        # sequence numbers we just moved on to
+        self.restored = True
+        self.save_snapshot()
+        self.metrics.count('warm_starts')
+        self.log(f'Starting from the snapshot taken at {datetime.datetime.fromtimestamp(state.taken):%H:%M:%S}')
+        return True
+
+    # Replace the links of node index `u` in the link state database with `links`, a list of
+    # (neighbor id, cost), and work out our costs again if anything changed
+    def install_links(self, u, links):
+        lsdb = self.lsdb
+        old = lsdb.row(u)
+        row = [INFINITY] * len(lsdb)
+        row[u] = 0
+        for v, cost in links:
+            row[get_index(v)] = min(cost, INFINITY)
+        lsdb.set_row(u, row)
+        changed = [(u, v) for v, (new, before) in enumerate(zip(lsdb.row(u), old)) if new != before]
+        if not changed:
+            return False
+        self.find_routes(u, changed)
+        return True
+
+    # Find the cheapest cost to every node from the link state database, after the links of node
+    # index `source` changed. `changed` is a list of the (u, v) links that changed
+    def find_routes(self, source, changed):
+        start = perf_counter()
+        me = get_index(self.id)
+        distance, predecessor = self.engine.update(self.lsdb, me, changed)
+
+        # Nodes taken out of the config file can't be reached, even if a neighbor of theirs
+        # hasn't flooded its links without them yet. The engine keeps its own lists, so these
+        # are copies
+        if REMOVED:
+            distance = [INFINITY if v in REMOVED else cost for v, cost in enumerate(distance)]
+        self.fib.update_from_paths(me, distance, predecessor)
+        self.metrics.observe('routes_seconds', perf_counter() - start, self.mode)
+
+        # Costs can go up as well as down here, so every cost that differs is replaced
+        for v, (cost, before) in enumerate(zip(distance, self.table.row(me))):
+            cost = min(cost, INFINITY)
+            if cost != before:
+                if self.verbose:
+                    self.log(f'Updated: Source={get_id(source)}, Current={get_id(v)}:{cost}, Previous={get_id(v)}:{before}')
+                self.set_cost(me, v, cost)
+
+    # The neighbor to send to for destination `id`, and the cost from here. The neighbor is None if
+    # there is no path, and is this router itself if `id` is this router
+    def next_hop(self, id):
+        hop, cost = self.fib.lookup(get_index(id))
+        return (None if hop == fib.NO_ROUTE else get_id(hop)), cost
+
+    # The neighbor to send to for each destination in `ids`, in the same order
+    def next_hops(self, ids):
+        ids_by_index = NODES.ids
+        return [None if hop == fib.NO_ROUTE else ids_by_index[hop]
+                for hop in self.fib.lookup_many([get_index(id) for id in ids])]
+
+    # Check if every neighbor has told us about themselves at least once. Neighbors that said
+    # goodbye won't be telling us anything more
+    def heard_from_neighbors(self):
+        if self.mode == 'ls':
+            return all(get_index(n) in self.lsa_seqs for n in self.live_edges())
+        return all(n in self.received or n not in self.last_heard for n in self.live_edges())
+
+    # Check if this router's table has converged. In link state mode that means we have the links
+    # of every node, and can reach all of them
+    def converged(self):
+        # A router that has been taken out of the config file has no routes left to find
+        if self.index in REMOVED:
+            return True
+        if self.mode == 'ls':
+            return len(self.lsa_seqs) == len(NODES) - len(REMOVED) and self.unreachable_count == 0
+
+        # The rows kept from before the config was last loaded may be out of date, and look
+        # converged, until every neighbor has sent us its table again
+        return convergence(self.table) and self.heard_from_neighbors()
+
+    # Check if the table has stopped changing, even if it hasn't converged
+    def quiescent(self):
+        return self.quiet_refreshes >= QUIET_REFRESHES
+
+    # Check if there is nothing left for this router to do, because it has either converged or
+    # it has stopped changing
+    def finished(self):
+        # In link state mode, links we flooded that haven't been acknowledged yet can still change
+        # other routers' tables, so we aren't done until they have been. Neither are we while
+        # a neighbor still hasn't told us what it has after we started from a snapshot
+        converged = self.converged() and (self.mode == 'dv' or self.flooder.idle()) and not self.syncing
+
+        # Everything that runs routers checks this after handling messages, so it is where we
+        # notice how long it took to converge
+        if converged and self.converging_since is not None:
+            self.metrics.observe('convergence_seconds', self.clock() - self.converging_since)
+            self.converging_since = None
+        return converged or self.quiescent()
+
+    # Get the nodes that we have no path to
+    def unreachable(self):
+        return [get_id(v) for v, cost in enumerate(self.table.row(get_index(self.id))) if cost >= INFINITY and v not in REMOVED]
+
+    # Let the user know if we stopped without converging, and which nodes we can't reach. This is
+    # printed even with --quiet, which only leaves out the changes along the way
+    def report_partition(self):
+        if not self.converged():
+            self.say(f'Table stopped changing without converging. Unreachable nodes: {self.unreachable()}')
+
+    # Handle a single message that was sent to this router. This is the part of the
+    # simulation that is shared between running one router per process, and running
+    # all routers in one process
+    def handle_message(self, msg_type, id, data):
+        # Anything from a neighbor shows that its link is still up
+        if id in self.edges:
+            self.heard_from(id, self.clock())
+
+        # If we've recieved an update to the table, handle it
+        if msg_type == 'update':
+            # Try to update the table with new values
+            updated = self.recieve_update(id, *data)
+
+            # If the table was updated, send that updated table to our neighbors
+            if updated:
+                self.update_count += 1
+                self.trigger_update()
+        # A neighbor has recieved our table up to some version
+        elif msg_type == 'update_ack':
+            self.acked[id] = data
+        # A broadcast that is being flooded through the network. Pass it on if it is new
+        elif msg_type == 'broadcast':
+            new = self.flooder.receive(*data, id, self.live_edges(), self.clock(), self.newer_links(data[2]))
+
+            # Links are dealt with straight away, instead of waiting for someone to ask for them.
+            # Links that aren't new still are, in case they are older than ours
+            if data[2][0] == 'lsa':
+                if new:
+                    self.flooder.delivered.pop()
+                if self.mode == 'ls' and self.recieve_links(*data[2][1:], data, id):
+                    self.update_count += 1
+        # A neighbor has recieved one of the broadcasts we sent them
+        elif msg_type == 'ack':
+            self.flooder.acknowledge(*data, id)
+        # A neighbor that is leaving has finished, rather than failed, so stop expecting to hear
+        # from it, or to hear what it has
+        elif msg_type == 'hello':
+            if data:
+                self.last_heard.pop(id, None)
+                self.syncing.discard(id)
+        # A neighbor has told us what it has, after one of us started from a snapshot
+        elif msg_type == 'sync':
+            self.recieve_sync(id, *data)
+        # A neighbor is missing some fragments of a message we sent it
+        elif msg_type == 'resend':
+            self.resend_fragments(id, *data)
+
+    # Handle every message that is already waiting for us, without blocking, and then send
+    # everything that handling them gave us to send. The processor time this takes, and that
+    # `poll_timers` takes, is counted as this router's
+    def drain(self):
+        start = process_time()
+        while True:
+            datagrams = self.transport.recv_batch(MTU)
+            if not datagrams:
+                break
+            for raw_data, addr in datagrams:
+                msg = self.recieve_datagram(raw_data, addr)
+                if msg is not None:
+                    self.handle_message(*msg)
+        self.flush()
+        self.metrics.count('cpu_seconds', None, process_time() - start)
+
+    # How long until this router next needs `poll_timers` to be called
+    def time_until_timers(self, now):
+        next_timer = min(self.next_refresh, self.next_hello)
+        if self.next_flush is not None:
+            next_timer = min(next_timer, self.next_flush)
+        retransmit = self.flooder.next_deadline()
+        if retransmit is not None:
+            next_timer = min(next_timer, retransmit)
+        resend = self.reassembler.next_deadline()
+        if resend is not None:
+            next_timer = min(next_timer, resend)
+        return max(0, next_timer - now)
+
+    # Run any timers that have expired
+    def poll_timers(self, now):
+        start = process_time()
+        if self.next_flush is not None and now >= self.next_flush:
+            self.flush_updates(now)
+
+        # Send any broadcasts that our neighbors haven't acknowledged yet again, and ask for any
+        # fragments we are waiting on
+        self.flooder.poll(now)
+        for sender, msg_id, indices in self.reassembler.requests(now):
+            self.send_message(get_id(sender), 'resend', (msg_id, indices))
+        self.poll_liveness(now)
+
+        if now >= self.next_refresh:
+            # Periodically update our neigbors. In link state mode, flooding already makes sure
+            # that everyone gets our links
+            if self.mode == 'dv':
+                self.update_neighbors()
+            self.next_refresh = now + REFRESH_INTERVAL
+
+            # Pick up any changes to the config file
+            self.check_config()
+
+            # Ask again any neighbor that hasn't told us what it has yet, in case we were missed
+            for neighbor in self.syncing:
+                self.send_message(neighbor, 'sync', (False, self.sync_vector()))
+
+            # Save a snapshot now and then, if anything changed since the last one
+            if self.snapshot_path is not None and now >= self.next_snapshot:
+                self.next_snapshot = now + SNAPSHOT_INTERVAL
+                if self.snapshot_state != self.progress():
+                    self.save_snapshot()
+
+            # Keep track of how long it has been since the table last changed. Until every neighbor
+            # has sent us their table, nothing changing doesn't mean that nothing will
+            if self.version == self.refreshed_version and self.heard_from_neighbors():
+                self.quiet_refreshes += 1
+            else:
+                self.quiet_refreshes = 0
+                self.refreshed_version = self.version
+
+            # Forget about any messages that never had all of their fragments arrive
+            self.reassembler.expire(now)
+            self.expire_fragments(now)
+
+        self.flush()
+        self.metrics.count('cpu_seconds', None, process_time() - start)
+
+    # Perform a router simulation.
+    def router_simulation(self):
+        self.log('Press `Ctrl + C` to exit\nListening...')
+        self.next_refresh = self.clock() + REFRESH_INTERVAL
+        self.quiet_refreshes = 0
+        self.reset_liveness()
+
+        # Continue to run while we have not converged, or until the table stops changing
+        while not self.finished():
+            # Wait for a message, but never past the point that our timers need to run
+            self.transport.settimeout(min(TIMEOUT, self.time_until_timers(self.clock())))
+            try:
+                # Try to receive a message, then handle everything else that has queued up
+                # behind it straight away
+                self.handle_message(*self.recieve_message())
+                self.drain()
+            except (TimeoutError, BlockingIOError):
+                pass
+            self.poll_timers(self.clock())
+        self.transport.settimeout(TIMEOUT)
+
+        # We won't be around to send any update that is still waiting, so send it now, and tell
+        # our neighbors that we are leaving so they don't think our links went down
+        if self.pending_neighbors:
+            self.update_neighbors()
+        self.say_goodbye()
+
+        self.report_partition()
+        return self.update_count
+
+    # Handle broadcasts and their acknowledgements until `done()` is true. Anything else is
+    # dropped, since the table isn't being worked on while we broadcast, but still counts as
+    # hearing from whoever sent it. We keep saying hello the whole time, so that our neighbors
+    # don't think our link has gone down while they wait on us
+    def flood_until(self, done):
+        while not done():
+            # Wait for a message, but never past the point that a broadcast needs sending again,
+            # or that we need to say hello
+            deadline = self.next_hello
+            if self.flooder.next_deadline() is not None:
+                deadline = min(deadline, self.flooder.next_deadline())
+            self.transport.settimeout(min(TIMEOUT, max(0, deadline - self.clock())))
+            try:
+                msg_type, id, data = self.recieve_message()
+                if msg_type in ('broadcast', 'ack', 'hello'):
+                    self.handle_message(msg_type, id, data)
+                elif id in self.edges:
+                    self.heard_from(id, self.clock())
+            except (TimeoutError, BlockingIOError):
+                pass
+            now = self.clock()
+            self.flooder.poll(now)
+            self.poll_liveness(now)
+            self.flush()
+        self.transport.settimeout(TIMEOUT)
+
+    # Wait for `seconds`, still answering broadcasts and saying hello like `flood_until`
+    def pause(self, seconds):
+        end = self.clock() + seconds
+        self.flood_until(lambda: self.clock() >= end)
+
+    # Recieve a broadcast that matches broadcast_type. It is passed on to our neighbors as soon
+    # as it arrives. Returns the broadcast and the neighbor we got it from
+    def recv_broadcast(self, broadcast_type):
+        self.flood_until(lambda: any(msg[0] == broadcast_type for msg, _ in self.flooder.delivered))
+        return self.flooder.take(broadcast_type)
+
+    # Start a new broadcast of broadcast_msg, without waiting for anyone to acknowledge it
+    def start_broadcast(self, broadcast_msg):
+        self.flooder.originate(broadcast_msg, list(self.edges), self.clock())
+        self.flush()
+
+    # Start a new broadcast of broadcast_msg, and wait until every neighbor has acknowledged it
+    def broadcast(self, broadcast_msg):
+        self.start_broadcast(broadcast_msg)
+        self.flood_until(self.flooder.idle)
+
+    def test1(self, update_count):
+        self.log('\n-------------------------\nTest 1:')
+        self.transport.settimeout(TIMEOUT)
+
+        # Broadcast from the first router in the config file, usually A
+        if self.id == get_id(0):
+            # Create the broadcast message
+            msg = [ 'message', f'{self.id}, {IP}, {self.port}', ('1001783662', '1002015854'), datetime.datetime.now(), update_count, 1000 ]
+            msg[5] = sys.getsizeof(msg)
+            self.log(f'Sending broadcast:')
+            self.log(f'Broadcast info: {msg[1]}')
+            self.log(f'IDs: {msg[2]}')
+            self.log(f'UTC Time: {msg[3]}')
+            self.log(f'Updates: {msg[4]}')
+            self.log(f'Bytes: {msg[5]}\n')
+
+            # Broadcast the message to our neighbors
+            self.broadcast(msg)
+        else:
+            # Recieve a broadcast
+            msg, recv_from = self.recv_broadcast('message')
+            _, info, ids, utc, updates, num_bytes = msg
+
+            self.log(f'Recieved broadcast from {recv_from}')
+            self.log(f'Broadcast info: {info}')
+            self.log(f'IDs: {ids}')
+            self.log(f'UTC Time: {utc}')
+            self.log(f'Updates: {updates}')
+            self.log(f'Bytes: {num_bytes}\n')
+
+            # Wait until our neighbors, except the sender, have the broadcast too
+            self.flood_until(self.flooder.idle)
+        self.log('\nSuccessfully broadcast message\n')
+        self.pause(4)
+
+    # Simulate a link being broken between nodes u and v
+    def break_link(self, u, v):
+        # Reload the config
+        self.load_config()
+        # Remove the edge they share
+        del self.edges[v]
+        # Set the cost from one to the other as INFINITY
+        self.set_cost(get_index(u), get_index(v), INFINITY)
+        if self.mode == 'dv':
+            self.update_routes(u, force=True)
+        # Everyone else finds out from the links we flood, rather than from our table
+        if self.mode == 'ls':
+            self.flood_links()
+        # Put in ascending order so that break_link(u, v) == break_link(v, u)
+        if u > v:
+            u, v = v, u
+        return ('link_broken', u, v)
+
+    def test2(self):
+        self.log('\n-------------------------\nTest 2:')
+
+        self.transport.settimeout(TIMEOUT)
+
+        # Break the link between the first router in the config file and its first neighbor,
+        # which is usually A and B. Both of them broadcast that the link has been broken
+        first = get_id(0)
+        second = next(iter(TOPOLOGY.neighbors(first)))
+        if self.id == first:
+            self.broadcast(self.break_link(first, second))
+        elif self.id == second:
+            self.broadcast(self.break_link(second, first))
+        else:
+            # For all other nodes, recieve the broadcast that a link was broken, and
+            # clear the table. It has already been passed on to our neighbors, so wait until
+            # they have it
+            broken_link_msg, recv_from = self.recv_broadcast('link_broken')
+
+            self.log(f'Recieved notice of broken link: {broken_link_msg}')
+            self.load_config()
+
+            self.flood_until(self.flooder.idle)
+
+        self.pause(4)
+        self.log()
+
+        # Afterwards, work back towards convergence now that the table has changed
+        self.router_simulation()
+
+        self.log('\nReached convergence:')
+        self.print_tables()
+
+    # This router's metrics, with the counts that are kept track of elsewhere brought up to date
+    def collect_metrics(self):
+        m = self.metrics
+        m.set('updates', self.update_count)
+        m.set('coalesced_updates', self.coalesced_updates)
+        m.set('suppressed_sends', self.suppressed_sends)
+        m.set('retransmits', self.flooder.retransmits)
+        m.set('broadcasts_given_up', self.flooder.gave_up)
+        m.set('next_hop_changes', self.fib.changes)
+        m.gauge('links_down', len(self.down))
+        if self.transport is not None:
+            m.set('syscalls', self.transport.syscalls)
+        for name in ('sent', 'delivered', 'forwarded', 'expired', 'no_route', 'malformed'):
+            m.set('data_packets', getattr(self.data, name), name)
+        return m
+
+    # Print out what this router knows. In link state mode that is the links of every node, and
+    # the cost from this router to each of them
+    def print_tables(self):
+        if self.mode == 'ls':
+            print_table(self.lsdb)
+            print(f'Costs from {self.id}: {dict(zip(NODES, self.table.row(get_index(self.id))))}')
+        else:
+            print_table(self.table)
+
+# Runs every router in the topology inside of one process. Each router still gets its own
+# UDP transport, but instead of blocking on each one in turn, a single selector waits on all
+# of them at once and hands each datagram to the router it was meant for.
+#
+# When given a transport.LocalNetwork, datagrams between routers in this host never touch their
+# sockets, and only datagrams from other processes do.
+class RouterHost:
+    def __init__(self, routers, network=None, tables=None):
+        self.routers = routers
+        self.network = network
+
+        # A sharedtable.SharedTables that routers in distance vector mode keep their own rows in
+        self.tables = tables
+        self.selector = selectors.DefaultSelector()
+
+        # Which router each transport belongs to
+        self.by_transport = {}
+
+    # Open a transport for every router and register it with the selector. A queue transport has
+    # no socket to wait on, and is drained whenever its network says it has something waiting
+    def open(self):
+        for router in self.routers:
+            if self.tables is not None and router.mode == 'dv':
+                router.share(self.tables)
+            router.open(self.network)
+            router.transport.setblocking(False)
+            if isinstance(router.transport, transport.QueueTransport):
+                self.network = router.transport.network
+            else:
+                self.selector.register(router.transport, selectors.EVENT_READ, router)
+            self.by_transport[router.transport] = router
+
+    def close(self):
+        for router in self.routers:
+            if router.transport is not None and not isinstance(router.transport, transport.QueueTransport):
+                self.selector.unregister(router.transport)
+            router.close()
+        self.selector.close()
+
+    def converged(self):
+        return all(router.converged() for router in self.routers)
+
+    def finished(self):
+        return all(router.finished() for router in self.routers)
+
+    # Run all of the routers until every one of them has converged, or has stopped changing, or
+    # until `done()` is true if it is given
+    def run(self, done=None):
+        if done is None:
+            done = self.finished
+
+        # Load the config for each node, or pick up from its snapshot, and let the neighbors know
+        # about it
+        for router in self.routers:
+            router.load_config()
+            router.restore_snapshot()
+        now = monotonic()
+        for router in self.routers:
+            router.announce()
+            router.next_refresh = now + REFRESH_INTERVAL
+            router.quiet_refreshes = 0
+            router.reset_liveness()
+
+        ready = self.network.ready if self.network is not None else {}
+        shared = False
+        while not done():
+            # Wait until a message arrives, or until the first router needs its timers run. If
+            # routers in this host have already sent each other something, don't wait at all
+            now = monotonic()
+            timeout = 0 if ready or shared else min(router.time_until_timers(now) for router in self.routers)
+            if self.tables is not None:
+                timeout = min(timeout, SHARED_POLL_INTERVAL)
+            events = self.selector.select(timeout)
+
+            # Handle every message that is waiting for each router that has any
+            for key, _mask in events:
+                key.data.drain()
+
+            # Keep handing over messages between routers in this host until there are none left
+            while ready:
+                for waiting in list(ready):
+                    self.by_transport[waiting].drain()
+
+            # Pick up changes to the tables of neighbors on the same machine. If any table
+            # changed, go around again straight away, since someone else may now have a change
+            shared = any([router.read_shared() for router in self.routers])
+
+            now = monotonic()
+            for router in self.routers:
+                router.poll_timers(now)
+
+        for router in self.routers:
+            router.report_partition()
+        return sum(router.update_count for router in self.routers)
+
+# Take the option `name` out of `args`. For a flag, returns whether it was there, and otherwise
+# returns the value that followed it, or None if it wasn't there
+def take_option(args, name, flag=False):
+    if name not in args:
+        return False if flag else None
+    i = args.index(name)
+    if flag:
+        del args[i]
+        return True
+    value = args[i + 1] if i + 1 < len(args) else None
+    del args[i:i + 2]
+    return value
+
+# Serve and dump the metrics of `routers` as asked for on the command line. Returns a function
+# to call once the routers are done
+def start_metrics(routers, port, path):
+    def collect():
+        return [(router.id, router.collect_metrics()) for router in routers]
+
+    server = metrics.serve(int(port), collect) if port is not None else None
+    if server is not None:
+        print(f'Serving metrics on http://127.0.0.1:{port}/metrics')
+
+    def finish():
+        if path is not None:
+            metrics.dump(path, collect)
+        if server is not None:
+            server.shutdown()
+    return finish
+
+# Where the router `id` keeps its snapshots in `directory`, or None if there is no directory
+def snapshot_path(directory, id):
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{id}.snapshot')
 
 def main():
+    # Options can go anywhere, and are taken out before the arguments are read
+    global VERBOSE
+    args = sys.argv[1:]
+    VERBOSE = not take_option(args, '--quiet', True)
+    metrics_port = take_option(args, '--metrics-port')
+    metrics_file = take_option(args, '--metrics-file')
+    snapshots = take_option(args, '--snapshots')
+    sys.argv[1:] = args
+
     if len(sys.argv) <= 2:
-        print('Expected 2 arguments:\nrouter.py <PORT> <ID>')
+        print(f'Expected 2 arguments:\nrouter.py <PORT> <ID> [MODE] [OPTIONS]\nrouter.py <BASE PORT> --all [MODE] [OPTIONS]\n'
+              f'where MODE is one of {", ".join(MODES)}, and OPTIONS are any of\n'
+              f'    --quiet                don\'t print every change to the table\n'
+              f'    --metrics-port PORT    serve metrics over HTTP on PORT\n'
+              f'    --metrics-file FILE    write metrics to FILE at the end, as JSON if it ends in .json\n'
+              f'    --snapshots DIR        save snapshots of the routing state in DIR, and start from them')
         return
-    
+
+    # Find out which nodes exist before anything else
+    load_topology()
+    print(f'Loading config file {CONFIG_FILE}:')
+    print(TOPOLOGY.text)
+
     # Read in command line arguments
-    global BASE_PORT, PORT, ID
+    global BASE_PORT
     try:
-        PORT = int(sys.argv[1])
-        ID = sys.argv[2]
-        
-        # Get base port (the port that the routers begin at, which is router 1)
-        BASE_PORT = PORT - get_index(ID)
-    except:
+        port = int(sys.argv[1])
+        id = sys.argv[2]
+        mode = sys.argv[3] if len(sys.argv) > 3 else MODE
+        if mode not in MODES:
+            print(f'Unknown mode {mode}, expected one of {", ".join(MODES)}')
+            return
+
+        # Run every router in this one process, starting at the given port
+        if id == '--all':
+            BASE_PORT = port
+        else:
+            # Get base port (the port that the routers begin at, which is router 1)
+            BASE_PORT = port - get_index(id)
+    except ValueError:
         print('Expected an integer')
         return
-    
-    # Open a UDP socket on the given IP and port
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(TIMEOUT)
-    sock.bind((IP, PORT))
-    
-    # Load the config for this node
-    load_config(ID)
-    
-    # Update neighbors after loading config
-    update_neighbors(sock)
-    
+    except KeyError:
+        print(f'{id} is not in the config file')
+        return
+
+    if id == '--all':
+        host = RouterHost([Router(node, get_port(node), mode=mode) for node in NODES])
+        for router in host.routers:
+            router.prefix = f'{router.id}:'
+            router.snapshot_path = snapshot_path(snapshots, router.id)
+        host.open()
+        finish_metrics = start_metrics(host.routers, metrics_port, metrics_file)
+        try:
+            start = monotonic()
+            update_count = host.run()
+            elapsed = monotonic() - start
+            if host.converged():
+                print(f'\nReached convergence after {update_count} updates in {elapsed:.3f} seconds:')
+            else:
+                print(f'\nStopped after {update_count} updates in {elapsed:.3f} seconds without converging:')
+            print(f'Messages sent: {sum(router.messages_sent for router in host.routers)}, '
+                  f'bytes sent: {sum(router.bytes_sent for router in host.routers)}, '
+                  f'system calls: {sum(router.transport.syscalls for router in host.routers)}')
+            print(f'Updates coalesced: {sum(router.coalesced_updates for router in host.routers)}, '
+                  f'sends held back by the rate limit: {sum(router.suppressed_sends for router in host.routers)}')
+            for router in host.routers:
+                print(f'Router {router.id}')
+                router.print_tables()
+        except KeyboardInterrupt:
+            pass
+        finish_metrics()
+        host.close()
+        return
+
+    router = Router(id, port, mode=mode)
+    router.snapshot_path = snapshot_path(snapshots, id)
+
+    # Open a transport on the given IP and port
+    router.open()
+    finish_metrics = start_metrics([router], metrics_port, metrics_file)
+
+    # Load the config for this node, and pick up from where it was if it has a snapshot
+    router.load_config()
+    router.restore_snapshot()
+
+    # Let everyone know about us after loading config
+    router.announce()
+
     update_count = 0
     try:
-        print_table(table)
-        update_count = router_simulation(sock)
+        router.print_tables()
+        update_count = router.router_simulation()
         print('\nReached convergence:')
-        print_table(table)
-        
-        test1(sock, update_count)
+        router.print_tables()
 
-        test2(sock)
+        router.test1(update_count)
+
+        router.test2()
     except KeyboardInterrupt:
         pass
-    
-    sock.close()
+
+    finish_metrics()
+    router.close()
 
 if __name__ == "__main__":
     main()
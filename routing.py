@@ -0,0 +1,230 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Shortest path engines. Every engine finds the cost from one source node to every other
+# node in a graph, along with the node that comes just before each one on its shortest path.
+#
+# A graph here is anything with `len(graph)` nodes numbered from 0, where
+# `graph.neighbors(u)` gives (v, cost) for every edge leaving u, `graph.incoming(v)`
+# gives (u, cost) for every edge entering v, and `graph.cost(u, v)` gives the cost of one
+# edge. Edges that cost `infinity` or more are treated as if they were not there. A graph
+# that is stored as a full matrix can also have `graph.row(u)`, giving the cost from u to
+# every node, which lets Bellman-Ford relax a whole row at once.
+#
+# All engines share the same two calls:
+#     shortest_paths(graph, source)    recompute everything from scratch
+#     update(graph, source, changed)   recompute after the edges in `changed`, a list of
+#                                      (u, v) pairs, have changed cost
+# Both return (distance, predecessor) lists. Only the incremental engine does anything
+# smarter than a full recomputation in `update`.
+
+import heapq
+
+# A simple graph made up of lists of edges, mostly used for testing and benchmarks
+class AdjacencyGraph:
+    def __init__(self, n):
+        self.out_edges = [{} for _ in range(n)]
+        self.in_edges = [{} for _ in range(n)]
+
+    def __len__(self):
+        return len(self.out_edges)
+
+    def set_edge(self, u, v, cost):
+        self.out_edges[u][v] = cost
+        self.in_edges[v][u] = cost
+
+    def remove_edge(self, u, v):
+        self.out_edges[u].pop(v, None)
+        self.in_edges[v].pop(u, None)
+
+    def cost(self, u, v):
+        return self.out_edges[u].get(v, float('inf'))
+
+    def neighbors(self, u):
+        return self.out_edges[u].items()
+
+    def incoming(self, v):
+        return self.in_edges[v].items()
+
+# Bellman ford algorithm for minimizing cost
+# Source: https://en.wikipedia.org/wiki/Bellman%E2%80%93Ford_algorithm
+class BellmanFord:
+    # When `early_exit` is set, stop as soon as a pass over every edge changes nothing
+    def __init__(self, infinity, early_exit=False):
+        self.infinity = infinity
+        self.early_exit = early_exit
+
+    def reset(self):
+        pass
+
+    def shortest_paths(self, graph, source):
+        infinity = self.infinity
+        distance = [infinity] * len(graph)
+        predecessor = [None] * len(graph)
+
+        distance[source] = 0
+        dense = hasattr(graph, 'row')
+
+        for _ in range(len(graph)-1):
+            changed = False
+            for u in range(len(graph)):
+                du = distance[u]
+                if du >= infinity:
+                    continue
+
+                # Relax every edge leaving u in one go, and only look at single nodes if
+                # something actually got cheaper
+                if dense:
+                    relaxed = list(map(min, distance, [du + w for w in graph.row(u)]))
+                    if relaxed != distance:
+                        for v, (new, old) in enumerate(zip(relaxed, distance)):
+                            if new != old:
+                                predecessor[v] = u
+                        distance = relaxed
+                        changed = True
+                    continue
+
+                for v, w in graph.neighbors(u):
+                    if du + w < distance[v]:
+                        distance[v] = du + w
+                        predecessor[v] = u
+                        changed = True
+            if self.early_exit and not changed:
+                break
+
+        for v in range(len(graph)):
+            u = predecessor[v]
+            if u is not None and distance[u] + graph.cost(u, v) < distance[v]:
+                print('There is a negative cycle')
+                return None, None
+
+        return distance, predecessor
+
+    def update(self, graph, source, changed):
+        return self.shortest_paths(graph, source)
+
+# Dijkstra's algorithm using a binary heap. Only works when no edge has a negative cost,
+# which is always true for costs read from the config file
+class Dijkstra:
+    def __init__(self, infinity):
+        self.infinity = infinity
+
+    def reset(self):
+        pass
+
+    def shortest_paths(self, graph, source):
+        distance = [self.infinity] * len(graph)
+        predecessor = [None] * len(graph)
+        distance[source] = 0
+        relax(graph, distance, predecessor, [(0, source)])
+        return distance, predecessor
+
+    def update(self, graph, source, changed):
+        return self.shortest_paths(graph, source)
+
+# Keep popping the closest node off of `heap` and relaxing its edges, until the heap is empty.
+# Entries in the heap that are out of date are skipped when they come up
+def relax(graph, distance, predecessor, heap):
+    heapq.heapify(heap)
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > distance[u]:
+            continue
+        for v, w in graph.neighbors(u):
+            if d + w < distance[v]:
+                distance[v] = d + w
+                predecessor[v] = u
+                heapq.heappush(heap, (d + w, v))
+
+# Keeps the result of the last run, and when edges change only revisits the nodes whose
+# shortest paths could have been affected by them.
+#
+# When an edge gets cheaper, the nodes at the end of it are relaxed again from where they are.
+# When an edge on the current shortest path tree gets more expensive, every node below it in
+# the tree loses its path. Those nodes are given the best cost they can get from any node that
+# was not affected, and then relaxed again.
+class Incremental:
+    def __init__(self, infinity):
+        self.infinity = infinity
+        self.reset()
+
+    # Forget the last result, so that the next update starts from scratch
+    def reset(self):
+        self.source = None
+        self.distance = None
+        self.predecessor = None
+
+    def shortest_paths(self, graph, source):
+        self.distance, self.predecessor = Dijkstra(self.infinity).shortest_paths(graph, source)
+        self.source = source
+        return self.distance, self.predecessor
+
+    def update(self, graph, source, changed):
+        if self.source != source or len(self.distance) != len(graph):
+            return self.shortest_paths(graph, source)
+
+        infinity = self.infinity
+        distance = self.distance
+        predecessor = self.predecessor
+
+        # Find the current cost of each changed edge
+        costs = {}
+        for u, v in changed:
+            costs[(u, v)] = min(graph.cost(u, v), infinity)
+
+        # Any tree edge that no longer gives the same cost has cut off everything below it
+        cut = [v for (u, v), w in costs.items()
+               if predecessor[v] == u and distance[u] + w != distance[v]]
+
+        heap = []
+        if cut:
+            children = {}
+            for v, u in enumerate(predecessor):
+                if u is not None:
+                    children.setdefault(u, []).append(v)
+
+            # Every node below a cut edge loses its path
+            affected = set()
+            stack = cut
+            while stack:
+                v = stack.pop()
+                if v in affected:
+                    continue
+                affected.add(v)
+                stack.extend(children.get(v, ()))
+            for v in affected:
+                distance[v] = infinity
+                predecessor[v] = None
+
+            # Give each of them the best path through a node that still has one
+            for v in affected:
+                for u, w in graph.incoming(v):
+                    if u not in affected and distance[u] + w < distance[v]:
+                        distance[v] = distance[u] + w
+                        predecessor[v] = u
+                if distance[v] < infinity:
+                    heap.append((distance[v], v))
+
+        # Edges that got cheaper may give shorter paths to the node at the end of them
+        for (u, v), w in costs.items():
+            if distance[u] + w < distance[v]:
+                distance[v] = distance[u] + w
+                predecessor[v] = u
+                heap.append((distance[v], v))
+
+        relax(graph, distance, predecessor, heap)
+        return distance, predecessor
+
+# All of the engines, by name
+ENGINES = {
+    'bellman_ford': lambda infinity: BellmanFord(infinity),
+    'bellman_ford_early_exit': lambda infinity: BellmanFord(infinity, early_exit=True),
+    'dijkstra': Dijkstra,
+    'incremental': Incremental,
+}
+
+# Create the engine called `name`
+def make_engine(name, infinity):
+    if name not in ENGINES:
+        raise ValueError(f'Unknown routing engine {name}, expected one of {", ".join(ENGINES)}')
+    return ENGINES[name](infinity)
@@ -0,0 +1,205 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Runs the routers in a config file across several processes, so that working out routes is not
+# limited to one core. The routers are split into shards, and each shard is run by its own
+# process with a RouterHost. Messages between two routers in the same shard are handed over in
+# memory, and only messages between shards go through UDP sockets on the local machine.
+#
+# The shards are picked so that as few links as possible go between two shards, since those are
+# the links whose messages are the most expensive. With --shared, routers in distance vector
+# mode keep their tables in shared memory, and neighbors in any shard read them from there
+# instead of being sent updates.
+#
+# Run with:
+#     python3 shard.py <BASE PORT> [--shards N] [--mode dv|ls] [--config FILE] [--shared] [--tables]
+
+import argparse, multiprocessing, os, queue
+from collections import deque
+from time import monotonic
+import router, sharedtable, topology, transport
+
+# How many nodes a shard can have over an even share, as a fraction of that share, when moving
+# nodes between shards to cut fewer links
+IMBALANCE = .05
+
+# How many times to go over every node looking for a better shard for it
+REFINE_PASSES = 4
+
+# Every node's neighbors, treating each link as going both ways
+def undirected(topo):
+    adjacent = [set() for _ in range(len(topo.nodes))]
+    for u, links in topo.links.items():
+        for v in links:
+            if u != v:
+                adjacent[u].add(v)
+                adjacent[v].add(u)
+    return adjacent
+
+# The number of links with their two ends in different shards
+def cut_links(adjacent, shard_of):
+    return sum(shard_of[u] != shard_of[v] for u, vs in enumerate(adjacent) for v in vs) // 2
+
+# Split the nodes of `topo` into `count` shards of about the same size, with as few links between
+# shards as we can easily find. Returns the shard of each node index
+def partition(topo, count):
+    adjacent = undirected(topo)
+    n = len(adjacent)
+    count = max(1, min(count, n))
+
+    # Number the nodes in breadth first order, so that nodes that are close together in the graph
+    # are close together in the order, and cut the order into even pieces
+    order = []
+    seen = [False] * n
+    for start in range(n):
+        if seen[start]:
+            continue
+        seen[start] = True
+        queue = deque([start])
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in sorted(adjacent[u]):
+                if not seen[v]:
+                    seen[v] = True
+                    queue.append(v)
+
+    shard_of = [0] * n
+    for i, u in enumerate(order):
+        shard_of[u] = i * count // n
+
+    # Then move nodes to whichever shard most of their neighbors are in, as long as that cuts
+    # fewer links and doesn't make any shard too big or empty
+    sizes = [0] * count
+    for shard in shard_of:
+        sizes[shard] += 1
+    limit = -(-n // count) + int(n / count * IMBALANCE)
+    for _ in range(REFINE_PASSES):
+        moved = False
+        for u in order:
+            here = shard_of[u]
+            if sizes[here] <= 1:
+                continue
+            counts = {}
+            for v in adjacent[u]:
+                counts[shard_of[v]] = counts.get(shard_of[v], 0) + 1
+            best = max(counts, key=lambda shard: (counts[shard], shard == here), default=here)
+            if best != here and counts[best] > counts.get(here, 0) and sizes[best] < limit:
+                shard_of[u] = best
+                sizes[here] -= 1
+                sizes[best] += 1
+                moved = True
+        if not moved:
+            break
+    return shard_of
+
+# Run one shard. `finished` has a flag for every shard, set while all of that shard's routers
+# have finished, and `stop` is set once every flag is set at the same time
+def run_shard(shard, ids, config, base_port, mode, shared, finished, stop, start, results):
+    router.CONFIG_FILE = config
+    router.BASE_PORT = base_port
+    router.load_topology()
+    tables = sharedtable.SharedTables(len(router.NODES), router.INFINITY, shared) if shared else None
+
+    routers = [router.Router(id, router.get_port(id), mode=mode) for id in ids]
+    for r in routers:
+        r.prefix = f'{r.id}:'
+        r.verbose = False
+    host = router.RouterHost(routers, transport.LocalNetwork(), tables)
+    host.open()
+
+    # Don't start until every shard has its sockets open, so no message is sent to nobody
+    start.wait()
+
+    def done():
+        finished[shard] = host.finished()
+        if all(finished):
+            stop.set()
+        return stop.is_set()
+
+    begin = monotonic()
+    host.run(done)
+    elapsed = monotonic() - begin
+
+    # Send anything still waiting, for the sake of shards that are a little behind
+    for r in routers:
+        if r.pending_neighbors:
+            r.update_neighbors()
+            r.flush()
+
+    results.put((shard, elapsed, [
+        (r.id, r.converged(), r.update_count, r.messages_sent, r.bytes_sent,
+         r.table.row(router.get_index(r.id)).tolist())
+        for r in routers]))
+    host.close()
+    if tables is not None:
+        tables.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every router in a config file across several processes')
+    parser.add_argument('base_port', type=int)
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--mode', choices=router.MODES, default=router.MODE)
+    parser.add_argument('--config', default=router.CONFIG_FILE)
+    parser.add_argument('--shared', action='store_true', help='keep distance vector tables in shared memory')
+    parser.add_argument('--tables', action='store_true', help="print every router's costs at the end")
+    args = parser.parse_args()
+
+    router.CONFIG_FILE = args.config
+    router.load_topology()
+    topo = topology.load(args.config)
+    shard_of = partition(topo, args.shards)
+    count = max(shard_of) + 1
+    shards = [[] for _ in range(count)]
+    for index, shard in enumerate(shard_of):
+        shards[shard].append(router.get_id(index))
+    print(f'Split {len(shard_of)} routers into {count} shards of {[len(ids) for ids in shards]}, '
+          f'with {cut_links(undirected(topo), shard_of)} links between shards')
+
+    tables = sharedtable.SharedTables(len(router.NODES), router.INFINITY) if args.shared else None
+
+    finished = multiprocessing.Array('b', count, lock=False)
+    stop = multiprocessing.Event()
+    start = multiprocessing.Barrier(count)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_shard, args=(
+                     shard, ids, args.config, args.base_port, args.mode, tables and tables.name, finished, stop, start, results))
+                 for shard, ids in enumerate(shards)]
+
+    begin = monotonic()
+    for process in processes:
+        process.start()
+    done = []
+    while len(done) < len(processes):
+        try:
+            done.append(results.get(timeout=1))
+        except queue.Empty:
+            # If a shard died, the others would wait on it forever
+            if any(process.exitcode for process in processes):
+                print('A shard stopped with an error')
+                for process in processes:
+                    process.terminate()
+                if tables is not None:
+                    tables.close()
+                return
+    elapsed = monotonic() - begin
+    for process in processes:
+        process.join()
+    if tables is not None:
+        tables.close()
+
+    done.sort()
+    states = [state for _, _, states in done for state in states]
+    converged = all(state[1] for state in states)
+    print(f'{"Reached convergence" if converged else "Stopped without converging"} in {elapsed:.3f} seconds, '
+          f'slowest shard took {max(shard_elapsed for _, shard_elapsed, _ in done):.3f}')
+    print(f'Updates: {sum(state[2] for state in states)}, messages sent: {sum(state[3] for state in states)}, '
+          f'bytes sent: {sum(state[4] for state in states)}')
+    for id, is_converged, _, _, _, row in states:
+        if not is_converged:
+            print(f'{id} can not reach {[router.get_id(v) for v, cost in enumerate(row) if cost >= router.INFINITY]}')
+        if args.tables:
+            print(f'Costs from {id}: {dict(zip(router.NODES, row))}')
+
+if __name__ == '__main__':
+    main()
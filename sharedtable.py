@@ -0,0 +1,225 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Routing tables kept in shared memory, for routers that run on the same machine. Normally a
+# router tells each neighbor about changes to its table with an update message, which has to be
+# encoded, sent, recieved and decoded again. When both routers are on the same machine, even in
+# different processes, the neighbor can instead read the table straight out of shared memory.
+#
+# Only the row a router owns, its own costs to every other node, is ever worked out by that
+# router. Every other row of its table is a copy of some other router's own row. So each router
+# puts just its own row in the shared block, and is the only one that ever writes to it, and
+# every router reads the rows of all the others from there. This keeps the block at one row per
+# node, rather than a whole table per node. Each row has a sequence number, which is odd while
+# the row is being written and goes up by two for every write. A reader copies a row and checks
+# that the sequence number was even and the same before and after, and tries again if not, so it
+# never sees half of a write (a seqlock). A reader only keeps trying for READ_TIMEOUT, so a
+# router that died halfway through a write leaves its row unread rather than hanging everyone
+# else, and the row is tried again the next time round.
+#
+# The version of each row, and the next hop each router has picked for each destination, are
+# kept in the block too. A neighbor needs the next hops to know which routes go through itself.
+#
+# The writes are plain stores, with no memory barriers. That is only enough where other cores
+# see stores in the order they were made, and loads are never moved ahead of each other, which
+# is true of x86 but not of, say, ARM. So tables can only be shared on x86.
+
+import platform
+from array import array
+from time import sleep, monotonic
+from multiprocessing import shared_memory
+from matrix import CostMatrix
+
+# What platform.machine() calls x86
+X86 = {'x86_64', 'amd64', 'i386', 'i486', 'i586', 'i686', 'x86'}
+
+# How long a reader keeps trying to read a row that is being written, in seconds. A write is only
+# a handful of stores, so a row that stays busy this long belongs to a writer that has stopped
+READ_TIMEOUT = .1
+
+# The own row of every node in the network, in shared memory. Nodes that a router on this machine
+# has taken a table for are marked as hosted, and only their rows are read from shared memory
+class SharedTables:
+    def __init__(self, n, infinity, name=None):
+        if platform.machine().lower() not in X86:
+            raise ValueError(f'Tables can only be shared on x86, not {platform.machine()}')
+        self.n = n
+        self.infinity = infinity
+
+        # The block is laid out as: hosted flags, row sequence numbers and row versions, as 8
+        # byte ints, then next hops, as 4 byte signed ints, and then every node's own row, as 4
+        # byte ints
+        words = 3 * n
+        hops_end = words * 8 + n * n * 4
+        size = hops_end + n * n * 4
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.owner = name is None
+
+        buf = self.memory.buf
+        self.hosted = buf[:n * 8].cast('Q')
+        self.seq_bytes = buf[n * 8:2 * n * 8]
+        self.seqs = self.seq_bytes.cast('Q')
+        self.versions = buf[2 * n * 8:words * 8].cast('Q')
+        self.hops = buf[words * 8:hops_end].cast('i')
+        self.cells = buf[hops_end:size].cast('I')
+
+        # Every table handed out, so their views can be released before the block is closed
+        self.tables = {}
+
+    # The table of node index `u`, whose own row is shared, to be written by the router for that
+    # node
+    def table(self, u):
+        table = self.tables.get(u)
+        if table is None:
+            self.hosted[u] = 1
+            table = self.tables[u] = SharedCostMatrix(self, u)
+        return table
+
+    # Stop sharing node index `u`'s row, so everyone else goes back to sending it updates
+    def release(self, u):
+        self.hosted[u] = 0
+        table = self.tables.pop(u, None)
+        if table is not None:
+            table.release()
+
+    # Whether node index `u` has its row in shared memory
+    def is_hosted(self, u):
+        return self.hosted[u] != 0
+
+    # Copy node index `u`'s own row. Returns (sequence number, costs, version), or None if the
+    # row was still being written after `timeout` seconds, READ_TIMEOUT if not given
+    def read_row(self, u, timeout=None):
+        if timeout is None:
+            timeout = READ_TIMEOUT
+        n = self.n
+        seqs = self.seqs
+        deadline = None
+        while True:
+            seq = seqs[u]
+            if not seq & 1:
+                costs = self.cells[u * n:(u + 1) * n].tolist()
+                version = self.versions[u]
+                if seqs[u] == seq:
+                    return seq, costs, version
+
+            # The row is being written, maybe by a process waiting for this core
+            now = monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now >= deadline:
+                return None
+            sleep(0)
+
+    # Every hosted row that has been written since `seen`, which is what the last call returned,
+    # or None to read every hosted row. Returns a list of (row, None, costs) like
+    # Router.update_table expects, a list of the version of each of those rows, and what to pass
+    # as `seen` next time. Comparing every sequence number at once makes it cheap to find that
+    # nothing has changed. A row that couldn't be read is left out, and is still counted as
+    # changed next time
+    def changed_rows(self, seen):
+        current = self.seq_bytes.tobytes()
+        if current == seen:
+            return [], [], seen
+        before = array('Q', seen if seen is not None else bytes(len(current)))
+        after = array('Q', current)
+        rows = []
+        versions = []
+        for u, seq in enumerate(after):
+            if seq != before[u] and self.hosted[u]:
+                row = self.read_row(u)
+                if row is None:
+                    after[u] = before[u]
+                    continue
+                _, costs, version = row
+                rows.append((u, None, costs))
+                versions.append(version)
+        return rows, versions, after.tobytes()
+
+    # A copy of the next hop node index `u` has picked for every destination
+    def next_hops(self, u):
+        n = self.n
+        return self.hops[u * n:(u + 1) * n].tolist()
+
+    # Let go of the shared block. The process that created it also removes it
+    def close(self):
+        for table in self.tables.values():
+            table.release()
+        self.tables = {}
+        for view in (self.hosted, self.seqs, self.seq_bytes, self.versions, self.hops, self.cells):
+            view.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+# A CostMatrix that keeps a copy of its own row `u`, and that row's version, in shared memory.
+# Every write to that row goes through the row's seqlock
+class SharedCostMatrix(CostMatrix):
+    def __init__(self, tables, u):
+        n = tables.n
+        self.tables = tables
+        self.u = u
+        self.seqs = tables.seqs
+        self.shared_row = tables.cells[u * n:(u + 1) * n]
+
+        # Where the router keeps its next hops, for its forwarding table to use
+        self.next_hops = tables.hops[u * n:(u + 1) * n]
+        super().__init__(n, tables.infinity)
+
+    # Mark our row as being written
+    def begin(self):
+        self.seqs[self.u] += 1
+
+    # Mark our row as written, so readers will pick it up
+    def end(self):
+        self.seqs[self.u] += 1
+
+    # Copy the whole of our row and its version into shared memory
+    def publish(self):
+        self.begin()
+        self.shared_row[:] = self.row(self.u)
+        self.tables.versions[self.u] = self.versions[self.u]
+        self.end()
+
+    def release(self):
+        self.shared_row.release()
+        self.next_hops.release()
+
+    def reset(self):
+        super().reset()
+        self.publish()
+
+    def clear_row(self, u):
+        super().clear_row(u)
+        if u == self.u:
+            self.publish()
+
+    def set(self, u, v, cost):
+        super().set(u, v, cost)
+        if u == self.u:
+            self.begin()
+            self.shared_row[v] = cost
+            self.end()
+
+    def set_row(self, u, costs):
+        super().set_row(u, costs)
+        if u == self.u:
+            self.publish()
+
+    def set_version(self, u, version):
+        super().set_version(u, version)
+        if u == self.u:
+            self.begin()
+            self.tables.versions[u] = version
+            self.end()
+
+    def load(self, cells, versions):
+        super().load(cells, versions)
+        self.publish()
+
+    # The block can't grow, so a router has to stop sharing its row before it gets more nodes
+    def resize(self, n):
+        raise ValueError('A shared table can not be resized')
@@ -0,0 +1,314 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# A discrete event simulation of the whole network. The routers are the same Router objects
+# that run on real sockets, but their datagrams are handed to each other in memory and time
+# comes from a virtual clock. Nothing ever actually waits, so a run that would take minutes of
+# timeouts and sleeps finishes as fast as the routing itself can be worked out.
+#
+# Every link can be given a latency, and datagrams can be lost or held back so that they
+# arrive out of order. All of the randomness comes from one seed, so a run with the same
+# seed and the same config file always plays out the same way.
+#
+# Run with:
+#     python3 simulator.py [CONFIG FILE] [--mode dv|ls] [--seed SEED] [--latency SECONDS]
+#                          [--jitter SECONDS] [--loss CHANCE] [--reorder CHANCE] [--break U V]
+#                          [--cost U V COST] [--metrics-file FILE]
+
+import heapq, random, argparse, itertools
+from time import perf_counter
+import router, transport, metrics
+
+# How long a router ignores its table after hearing that a link broke, like the `sleep` in
+# Router.test2. Every other router hears about the break in that time, so nobody is sent old
+# costs by a router that hasn't cleared its table yet. Measured in virtual seconds
+SETTLE_TIME = 4
+
+# Stands in for a router's transport. Anything sent on it is passed to the simulator
+class SimTransport(transport.Transport):
+    def __init__(self, simulator, address):
+        super().__init__()
+        self.simulator = simulator
+        self.address = address
+
+    def sendto(self, data, address):
+        self.simulator.send(self.address, data, address)
+
+    def close(self):
+        pass
+
+class Simulator:
+    # `latency` is how long a datagram takes to cross a link, plus up to `jitter` more. Each
+    # datagram is lost with a chance of `loss`, and held back by up to `reorder_delay` more with
+    # a chance of `reorder`. All times are in virtual seconds
+    def __init__(self, routers, seed=0, latency=.01, jitter=0, loss=0, reorder=0, reorder_delay=.05):
+        self.routers = routers
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+
+        # The virtual time
+        self.now = 0
+
+        # Everything that is going to happen, as (time, order, action, args). `order` keeps
+        # events at the same time in the order they were scheduled
+        self.events = []
+        self.order = itertools.count()
+
+        # Routers by the address their transport would have
+        self.by_address = {}
+        for r in routers:
+            address = router.get_address(r.id)
+            self.by_address[address] = r
+            r.transport = SimTransport(self, address)
+            r.clock = self.clock
+
+        # Links with their own (latency, loss), by (id, id)
+        self.links = {}
+
+        # The time of the timer event that is waiting for each router
+        self.timers = {}
+
+        # Routers that have only just heard a link broke, and when they stop ignoring updates
+        self.settling = {}
+
+        # Routers that haven't finished yet
+        self.unfinished = set(routers)
+
+        # How many datagrams were delivered and lost, and how many events have run
+        self.delivered = 0
+        self.lost = 0
+        self.events_run = 0
+
+    def clock(self):
+        return self.now
+
+    # Give the link between `u` and `v`, by id, its own latency and chance of loss
+    def set_link(self, u, v, latency, loss):
+        self.links[(u, v)] = self.links[(v, u)] = (latency, loss)
+
+    # Have `action(*args)` run at virtual time `time`
+    def schedule(self, time, action, *args):
+        heapq.heappush(self.events, (time, next(self.order), action, args))
+
+    # A router sent a datagram from `source` to `address`
+    def send(self, source, data, address):
+        sender = self.by_address[source]
+        destination = self.by_address.get(address)
+        if destination is None:
+            self.lost += 1
+            return
+
+        latency, loss = self.links.get((sender.id, destination.id), (self.latency, self.loss))
+        if loss and self.random.random() < loss:
+            self.lost += 1
+            return
+
+        delay = latency
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        if self.reorder and self.random.random() < self.reorder:
+            delay += self.random.uniform(0, self.reorder_delay)
+        self.schedule(self.now + delay, self.deliver, destination, data, source)
+
+    # A datagram has arrived at router `r`
+    def deliver(self, r, data, source):
+        self.delivered += 1
+        msg = r.recieve_datagram(data, source)
+        if msg is not None:
+            # Like Router.flood_until, only broadcasts are paid attention to while settling, along
+            # with hellos so that nobody thinks its links went down
+            if r not in self.settling or msg[0] in ('broadcast', 'ack', 'hello'):
+                r.handle_message(*msg)
+
+            # Someone else's link broke, so start again from the config file. The routers at
+            # either end of it have already dealt with it
+            broken = r.flooder.take('link_broken')
+            if broken is not None and r.id not in broken[0][1:]:
+                self.reset(r)
+            r.flush()
+        self.wake(r)
+
+    # Make sure that router `r` has an event waiting for when its timers next need to run
+    def wake(self, r):
+        if r in self.settling:
+            deadline = r.flooder.next_deadline()
+            when = min(self.settling[r], r.next_hello)
+            if deadline is not None:
+                when = min(when, deadline)
+        else:
+            when = self.now + r.time_until_timers(self.now)
+        if r not in self.timers or when < self.timers[r]:
+            self.timers[r] = when
+            self.schedule(when, self.fire, r, when)
+
+        if r.finished() and r not in self.settling:
+            self.unfinished.discard(r)
+        else:
+            self.unfinished.add(r)
+
+    # Run the timers of router `r`, if this is still the event it is waiting for
+    def fire(self, r, when):
+        if self.timers.get(r) != when:
+            return
+        del self.timers[r]
+
+        if r in self.settling:
+            r.flooder.poll(self.now)
+            r.poll_liveness(self.now)
+            r.flush()
+            if self.now >= self.settling[r]:
+                del self.settling[r]
+                r.next_refresh = self.now
+                r.quiet_refreshes = 0
+        else:
+            r.poll_timers(self.now)
+        self.wake(r)
+
+    # Load the config of router `r` again, and ignore updates while everyone else does the same
+    def reset(self, r):
+        r.load_config()
+        r.quiet_refreshes = 0
+        self.settling[r] = self.now + SETTLE_TIME
+
+    # Break the link between the routers with ids `u` and `v`, and have both of them broadcast it
+    def break_link(self, u, v):
+        routers = {r.id: r for r in self.routers}
+        for a, b in ((u, v), (v, u)):
+            r = routers[a]
+            msg = r.break_link(a, b)
+            r.quiet_refreshes = 0
+            self.settling[r] = self.now + SETTLE_TIME
+            r.start_broadcast(msg)
+            self.wake(r)
+
+    # Change the cost of the link between the routers with ids `u` and `v` to `cost` at both ends,
+    # while they keep running. A cost of None takes the link away
+    def change_cost(self, u, v, cost):
+        routers = {r.id: r for r in self.routers}
+        for a, b in ((u, v), (v, u)):
+            r = routers[a]
+            r.set_link_cost(b, cost)
+            r.quiet_refreshes = 0
+            self.wake(r)
+
+    # Have the link between the routers with ids `u` and `v` stop working without telling either
+    # of them, so that they have to notice for themselves
+    def fail_link(self, u, v):
+        self.set_link(u, v, self.latency, 1)
+
+    # Load every router's config and have them tell each other about themselves
+    def start(self):
+        for r in self.routers:
+            r.load_config()
+        for r in self.routers:
+            r.announce()
+            r.next_refresh = self.now + router.REFRESH_INTERVAL
+            r.quiet_refreshes = 0
+        for r in self.routers:
+            self.wake(r)
+
+    # Run events until every router has finished, or until virtual time `until`. Returns
+    # whether every router finished. With `wait`, keep going until `until` even once they have
+    def run(self, until=float('inf'), wait=False):
+        while self.events and (self.unfinished or wait):
+            time, _order, action, args = self.events[0]
+            if time > until:
+                break
+            heapq.heappop(self.events)
+            self.now = time
+            action(*args)
+            self.events_run += 1
+
+        # Waiting means the whole time has passed, even if nothing happened at the end of it
+        if wait and until < float('inf'):
+            self.now = max(self.now, until)
+        return not self.unfinished
+
+    def converged(self):
+        return all(r.converged() for r in self.routers)
+
+    # Print how a run went
+    def report(self, label, start_time, real_start):
+        state = 'Reached convergence' if self.converged() else 'Stopped without converging'
+        print(f'{label}: {state} at {self.now - start_time:.3f} virtual seconds '
+              f'({perf_counter() - real_start:.3f} real seconds)')
+        print(f'    updates: {sum(r.update_count for r in self.routers)}, '
+              f'messages: {sum(r.messages_sent for r in self.routers)}, '
+              f'bytes: {sum(r.bytes_sent for r in self.routers)}, '
+              f'datagrams delivered: {self.delivered}, lost: {self.lost}, events: {self.events_run}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate every router in a config file with a virtual clock')
+    parser.add_argument('config', nargs='?', default=router.CONFIG_FILE)
+    parser.add_argument('--mode', choices=router.MODES, default=router.MODE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=.01, help='seconds for a datagram to cross a link')
+    parser.add_argument('--jitter', type=float, default=0, help='up to this many more seconds per datagram')
+    parser.add_argument('--loss', type=float, default=0, help='chance of losing each datagram')
+    parser.add_argument('--reorder', type=float, default=0, help='chance of holding a datagram back')
+    parser.add_argument('--break', dest='broken', nargs=2, metavar=('U', 'V'),
+                        help='break the link between U and V once the network has converged')
+    parser.add_argument('--cost', nargs=3, metavar=('U', 'V', 'COST'),
+                        help='change the cost of the link between U and V once the network has converged, '
+                             'adding it if there is none, or taking it away if COST is none')
+    parser.add_argument('--until', type=float, default=3600, help='give up after this many virtual seconds')
+    parser.add_argument('--verbose', action='store_true', help='print every change to every table')
+    parser.add_argument('--tables', action='store_true', help='print every table at the end')
+    parser.add_argument('--metrics-file', help="write every router's metrics to this file at the end, as JSON if it ends in .json")
+    args = parser.parse_args()
+
+    router.CONFIG_FILE = args.config
+    router.load_topology()
+    routers = [router.Router(node, router.get_port(node), mode=args.mode) for node in router.NODES]
+    for r in routers:
+        r.prefix = f'{r.id}:'
+        r.verbose = args.verbose
+    print(f'Simulating {len(routers)} routers from {args.config} in {args.mode} mode with seed {args.seed}')
+
+    simulator = Simulator(routers, args.seed, args.latency, args.jitter, args.loss, args.reorder)
+    real_start = perf_counter()
+    simulator.start()
+    simulator.run(args.until)
+    simulator.report('Start', 0, real_start)
+
+    if args.broken:
+        u, v = args.broken
+        if u not in router.NODES or v not in router.NODES:
+            print(f'{u} or {v} is not in the config file')
+            return
+        start_time = simulator.now
+        real_start = perf_counter()
+        simulator.break_link(u, v)
+        simulator.run(start_time + args.until)
+        simulator.report(f'Broke {u}-{v}', start_time, real_start)
+
+    if args.cost:
+        u, v, cost = args.cost
+        if u not in router.NODES or v not in router.NODES:
+            print(f'{u} or {v} is not in the config file')
+            return
+        if cost != 'none' and not cost.isdigit():
+            print(f'{cost} should be a whole number, or none')
+            return
+        start_time = simulator.now
+        real_start = perf_counter()
+        simulator.change_cost(u, v, None if cost == 'none' else int(cost))
+        simulator.run(start_time + args.until)
+        simulator.report(f'Changed {u}-{v} to {cost}', start_time, real_start)
+
+    for r in routers:
+        if not r.converged():
+            print(f'{r.id} can not reach {r.unreachable()}')
+    if args.tables:
+        for r in routers:
+            print(f'Router {r.id}')
+            r.print_tables()
+    if args.metrics_file:
+        metrics.dump(args.metrics_file, lambda: [(r.id, r.collect_metrics()) for r in routers])
+
+if __name__ == '__main__':
+    main()
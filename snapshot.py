@@ -0,0 +1,138 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Snapshots of a router's routing state, written to disk every so often, so that a router that
+# restarts can pick up from its last snapshot instead of from a table full of infinity. A
+# snapshot is a single binary file:
+#
+#   header    magic (4 bytes), format (uint16), mode (uint8), padding (uint8), node count n
+#             (uint32), crc32 of the node ids (uint32), version of the router's own row (uint64),
+#             sequence number of its links (uint32), sequence number of its next broadcast
+#             (uint32), when it was taken (float64 seconds since the epoch)
+#   table     n * n costs (uint32), then the version of each row (uint64)
+#   fib       the next hop (int32) and cost (uint32) of each destination
+#   lsdb      in link state mode only, n * n costs (uint32), then the sequence number of each
+#             node's links (uint32), 0 for nodes we have no links from, then the sequence number
+#             of the broadcast each node's links came in (uint32)
+#   check     crc32 of everything before it (uint32)
+#
+# Everything is little endian, and every part is a fixed size given n, so the arrays are read
+# straight into memory with no decoding. A snapshot is written to a temporary file first and
+# then renamed over the old one, so a router that dies part way through writing one still
+# leaves the last one whole.
+
+import os, struct, sys, zlib
+from array import array
+from time import time
+
+MAGIC = b'RTSN'
+
+# Bump this whenever the layout changes. Snapshots in any other format are ignored
+FORMAT = 1
+
+MODES = {'dv': 0, 'ls': 1}
+MODE_NAMES = {v: k for k, v in MODES.items()}
+
+HEADER = struct.Struct('<4sHBxIIQIId')
+CHECK = struct.Struct('<I')
+
+# Raised when a snapshot is damaged, or in a format we don't understand
+class SnapshotError(ValueError):
+    pass
+
+# Everything a router needs to start again from where it was
+class Snapshot:
+    def __init__(self, mode, nodes, table, versions, next_hops, costs, row_version=0,
+                 lsa_seq=0, flood_seq=0, lsdb=None, lsa_seqs=None, lsa_floods=None, taken=None):
+        self.mode = mode
+        # The ids of every node, in index order
+        self.nodes = list(nodes)
+        # Arrays, in the same layout as the CostMatrix and ForwardingTable they came from
+        self.table = table
+        self.versions = versions
+        self.next_hops = next_hops
+        self.costs = costs
+        self.row_version = row_version
+        self.lsa_seq = lsa_seq
+        self.flood_seq = flood_seq
+        self.lsdb = lsdb
+        self.lsa_seqs = lsa_seqs
+        self.lsa_floods = lsa_floods
+        self.taken = time() if taken is None else taken
+
+# A checksum of the node ids, so that a snapshot taken with a different config file isn't used
+def nodes_crc(nodes):
+    return zlib.crc32('\n'.join(nodes).encode())
+
+# The bytes of an array, in little endian order
+def array_bytes(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+# Read `count` values of type `typecode` from `raw` at `offset`. Returns the array and the
+# offset just past it
+def read_array(raw, offset, typecode, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(raw):
+        raise SnapshotError('Snapshot is cut short')
+    values.frombytes(raw[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+def save(path, snapshot):
+    n = len(snapshot.nodes)
+    parts = [HEADER.pack(MAGIC, FORMAT, MODES[snapshot.mode], n, nodes_crc(snapshot.nodes), snapshot.row_version,
+                         snapshot.lsa_seq, snapshot.flood_seq, snapshot.taken)]
+    parts += [array_bytes(snapshot.table), array_bytes(snapshot.versions),
+              array_bytes(snapshot.next_hops), array_bytes(snapshot.costs)]
+    if snapshot.mode == 'ls':
+        parts += [array_bytes(snapshot.lsdb), array_bytes(snapshot.lsa_seqs), array_bytes(snapshot.lsa_floods)]
+    data = b''.join(parts)
+
+    temp = f'{path}.tmp'
+    with open(temp, 'wb') as file:
+        file.write(data)
+        file.write(CHECK.pack(zlib.crc32(data)))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+# Read the snapshot at `path`, for a network made up of `nodes`. Returns None if there is no
+# snapshot, or it was taken with different nodes
+def load(path, nodes):
+    try:
+        with open(path, 'rb') as file:
+            raw = file.read()
+    except FileNotFoundError:
+        return None
+
+    if len(raw) < HEADER.size + CHECK.size:
+        raise SnapshotError('Snapshot is cut short')
+    (check,) = CHECK.unpack_from(raw, len(raw) - CHECK.size)
+    raw = memoryview(raw)[:len(raw) - CHECK.size]
+    if zlib.crc32(raw) != check:
+        raise SnapshotError('Snapshot is damaged')
+
+    magic, format, mode, n, crc, row_version, lsa_seq, flood_seq, taken = HEADER.unpack_from(raw)
+    if magic != MAGIC or format != FORMAT or mode not in MODE_NAMES:
+        raise SnapshotError(f'Unsupported snapshot format {format}')
+    if n != len(nodes) or crc != nodes_crc(nodes):
+        return None
+
+    mode = MODE_NAMES[mode]
+    offset = HEADER.size
+    table, offset = read_array(raw, offset, 'I', n * n)
+    versions, offset = read_array(raw, offset, 'Q', n)
+    next_hops, offset = read_array(raw, offset, 'i', n)
+    costs, offset = read_array(raw, offset, 'I', n)
+    lsdb = lsa_seqs = lsa_floods = None
+    if mode == 'ls':
+        lsdb, offset = read_array(raw, offset, 'I', n * n)
+        lsa_seqs, offset = read_array(raw, offset, 'I', n)
+        lsa_floods, offset = read_array(raw, offset, 'I', n)
+    return Snapshot(mode, nodes, table, versions, next_hops, costs, row_version, lsa_seq, flood_seq,
+                    lsdb, lsa_seqs, lsa_floods, taken)
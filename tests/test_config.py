@@ -0,0 +1,64 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Loading the config file puts a router's own row back to its links, and leaves the rows other
+# routers sent it alone.
+
+import router
+
+CONFIG = 'A={B:4,C:1}\nB={A:4,C:2}\nC={A:1,B:2}\n'
+
+def make_router(tmp_path, id, config=CONFIG, mode='dv'):
+    path = tmp_path / 'topology.config'
+    path.write_text(config)
+    router.CONFIG_FILE = str(path)
+    router.load_topology()
+    r = router.Router(id, router.get_port(id), mode=mode)
+    r.verbose = False
+    return r
+
+def test_own_row(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    assert r.edges == {'B': 4, 'C': 1}
+    assert r.table.row(0).tolist() == [0, 4, 1]
+
+def test_other_rows_kept(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    r.table.set_row(2, [1, 2, 0])
+    r.table.set_version(2, 5)
+    r.load_config()
+    assert r.table.row(2).tolist() == [1, 2, 0]
+    assert r.table.versions[2] == 5
+
+    # B is cheaper to reach through C
+    assert r.table.row(0).tolist() == [0, 3, 1]
+
+# Links that were changed while running are put back the way the config file has them
+def test_links_put_back(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    del r.edges['B']
+    r.set_cost(0, 1, router.INFINITY)
+    r.load_config()
+    assert r.edges == {'B': 4, 'C': 1}
+    assert r.table.get(0, 1) == 4
+
+# Neighbors taken out of the config file aren't linked to again
+def test_removed_neighbor(tmp_path):
+    r = make_router(tmp_path, 'A')
+    router.REMOVED = {2}
+    try:
+        r.load_config()
+    finally:
+        router.REMOVED = set()
+    assert r.edges == {'B': 4}
+
+# A router that stops without converging says so, even when it is quiet
+def test_partition_reported_when_quiet(tmp_path, capsys):
+    r = make_router(tmp_path, 'A', config='A={B:4}\nB={A:4}\nC={}\n')
+    r.load_config()
+    r.prefix = 'A:'
+    r.report_partition()
+    assert capsys.readouterr().out == "A: Table stopped changing without converging. Unreachable nodes: ['C']\n"
@@ -0,0 +1,51 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Data packets are forwarded from their header alone, so a header that makes no sense is dropped
+# and counted, rather than being trusted.
+
+import pytest
+import router
+import wire
+from test_config import make_router
+
+ADDRESS = ('127.0.0.1', 1)
+
+# A data packet from B, with the header given
+def packet(source=1, destination=2, ttl=router.DATA_TTL, hops=0):
+    return (wire.HEADER.pack(wire.VERSION, wire.DATA_CODE, 1) +
+            wire.DATA_HEADER.pack(source, destination, ttl, hops, 7, 0.0, 0.0) + b'payload')
+
+@pytest.fixture
+def r(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    r.outbox = []
+    return r
+
+def test_forwarded(r):
+    assert r.recieve_datagram(packet(), ADDRESS) is None
+    assert r.data.forwarded == 1
+    assert r.data.malformed == 0
+    assert len(r.outbox) == 1
+
+def test_delivered(r):
+    r.recieve_datagram(packet(destination=0), ADDRESS)
+    assert r.data.delivered == 1
+
+@pytest.mark.parametrize('raw', [
+    packet(destination=4000),
+    packet(source=4000),
+    packet(ttl=0),
+    packet(ttl=255),
+    packet(ttl=10, hops=255),
+    packet()[:wire.DATA_SIZE - 1],
+    packet()[:2],
+], ids=['destination', 'source', 'no hops left', 'too many hops left', 'too many hops taken', 'short', 'header only'])
+def test_malformed(r, raw):
+    assert r.recieve_datagram(raw, ADDRESS) is None
+    assert r.data.malformed == 1
+    assert r.data.dropped() == 1
+    assert r.data.forwarded == 0
+    assert r.outbox == []
+    assert r.collect_metrics().get('data_packets', 'malformed') == 1
@@ -0,0 +1,127 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Links flooded in link state mode are only passed on while they are newer than what a router
+# already has, however many of them it has since forgotten seeing, and a router that restarts
+# carries on numbering from past the links it flooded before.
+
+from time import time
+import flooding
+import router
+from test_config import make_router
+
+# A flooder that keeps what it sends, and remembers only `capacity` broadcasts
+def make_flooder(capacity=2):
+    sent = []
+    flooder = flooding.Flooder('A', lambda neighbor, msg_type, data: sent.append((neighbor, msg_type, data)), capacity=capacity)
+    return flooder, sent
+
+def forwarded(sent):
+    return [s for s in sent if s[1] == 'broadcast']
+
+def test_new_broadcast_forwarded():
+    flooder, sent = make_flooder()
+    assert flooder.receive('B', 1, 'hi', 'B', ['B', 'C'], 0)
+    assert sent == [('B', 'ack', ('B', 1)), ('C', 'broadcast', ('B', 1, 'hi'))]
+
+def test_old_broadcast_only_acknowledged():
+    flooder, sent = make_flooder()
+    assert not flooder.receive('B', 1, 'hi', 'B', ['B', 'C'], 0, new=False)
+    assert sent == [('B', 'ack', ('B', 1))]
+    assert not flooder.delivered
+
+# A router sent its links from B, which came round again once they had been forgotten
+def lsa_router(tmp_path, capacity):
+    r = make_router(tmp_path, 'A', mode='ls')
+    r.load_config()
+    r.reset_liveness()
+    r.flooder.seen = flooding.SeenCache(capacity, router.SEEN_TTL)
+    sent = []
+    r.flooder.send = lambda neighbor, msg_type, data: sent.append((neighbor, msg_type, data))
+    return r, sent
+
+def lsa(origin, flood_seq, seq):
+    return (origin, flood_seq, ('lsa', origin, seq, (('A', 4), ('C', 2))))
+
+def test_links_flooded_once(tmp_path):
+    r, sent = lsa_router(tmp_path, 4)
+
+    # More links than the flooder can remember
+    for seq in range(1, 11):
+        r.handle_message('broadcast', 'B', lsa('B', seq, seq))
+    assert len(forwarded(sent)) == 10
+    assert r.lsa_seqs[1] == 10
+    for neighbor, _, data in forwarded(sent):
+        r.handle_message('ack', neighbor, data[:2])
+
+    # They all come back round through C, and none of them are flooded again. C is only sent
+    # the newest links back, once
+    del sent[:]
+    for seq in range(1, 11):
+        r.handle_message('broadcast', 'C', lsa('B', seq, seq))
+    assert [s[1] for s in sent].count('ack') == 10
+    assert forwarded(sent) == [('C', 'broadcast', lsa('B', 10, 10))]
+
+    # Newer links still are
+    del sent[:]
+    r.handle_message('broadcast', 'B', lsa('B', 11, 11))
+    assert len(forwarded(sent)) == 1
+    assert r.lsa_seqs[1] == 11
+
+def test_numbered_from_time(tmp_path):
+    before = int(time())
+    r = make_router(tmp_path, 'A', mode='ls')
+    assert r.lsa_seq >= before
+    assert r.flooder.next_seq >= before
+
+# A router that restarted hears its own links from before, and floods its links past them
+def test_own_links_from_before_restart(tmp_path):
+    r, sent = lsa_router(tmp_path, 4)
+    r.flood_links()
+    old = r.lsa_seq + 100
+    del sent[:]
+    r.handle_message('broadcast', 'B', lsa('A', r.flooder.next_seq + 100, old))
+    assert r.lsa_seq == old + 1
+    links = [s[2][2] for s in forwarded(sent) if s[2][0] == 'A']
+    assert links and all(payload[2] == old + 1 for payload in links)
+
+# Routers whose broadcasts are handed straight to each other, through `queue`
+def connect(routers, queue):
+    for r in routers:
+        r.flooder.send = lambda neighbor, msg_type, data, r=r: queue.append((r.id, neighbor, msg_type, data))
+
+def deliver(routers, queue):
+    by_id = {r.id: r for r in routers}
+    while queue:
+        source, destination, msg_type, data = queue.pop(0)
+        by_id[destination].handle_message(msg_type, source, data)
+
+def start(tmp_path, id):
+    r = make_router(tmp_path, id, mode='ls')
+    r.load_config()
+    r.reset_liveness()
+    return r
+
+# A router that floods its links many times a second, and then restarts without a snapshot,
+# starts out numbering its links and broadcasts from behind the ones it used before. Its new
+# links still get everywhere
+def test_restart_without_snapshot(tmp_path):
+    routers = [start(tmp_path, id) for id in 'ABC']
+    queue = []
+    connect(routers, queue)
+    for _ in range(20):
+        routers[0].flood_links()
+    for r in routers[1:]:
+        r.flood_links()
+    deliver(routers, queue)
+    before = routers[0].lsa_seq
+
+    routers[0] = start(tmp_path, 'A')
+    connect(routers[:1], queue)
+    routers[0].flood_links()
+    routers[0].set_link_cost('C', 3)
+    deliver(routers, queue)
+    assert routers[0].lsa_seq > before
+    for r in routers[1:]:
+        assert r.lsdb.get(0, 2) == 3
+        assert r.lsa_seqs[0] == routers[0].lsa_seq
@@ -0,0 +1,121 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Messages split up by wire.fragment should be put back together by wire.Reassembler, whatever
+# order the fragments arrive in, with the reassembler asking for whatever it is missing.
+
+import random
+import pytest
+import wire
+from test_config import make_router
+
+MESSAGE = bytes(random.Random(0).randrange(256) for _ in range(10000))
+
+def fragments(size=200):
+    return wire.fragment(MESSAGE, 3, 77, size)
+
+def fragment_index(datagram):
+    return wire.FRAGMENT_HEADER.unpack_from(datagram)[4]
+
+def test_small_message_is_not_split():
+    assert wire.fragment(b'hello', 3, 77, 200) == [b'hello']
+    assert wire.Reassembler(2).add(b'hello', 0) == b'hello'
+
+def test_fragments_fit():
+    datagrams = fragments()
+    assert len(datagrams) > 1
+    assert all(len(datagram) <= 200 for datagram in datagrams)
+
+def test_out_of_order():
+    datagrams = fragments()
+    random.Random(1).shuffle(datagrams)
+    reassembler = wire.Reassembler(2)
+    results = [reassembler.add(datagram, 0) for datagram in datagrams]
+    assert results[-1] == MESSAGE
+    assert results[:-1] == [None] * (len(datagrams) - 1)
+    assert not reassembler.pending
+
+def test_too_small():
+    with pytest.raises(wire.WireError):
+        wire.fragment(MESSAGE, 3, 77, wire.FRAGMENT_HEADER.size)
+
+def test_malformed_fragment():
+    datagram = fragments()[0]
+    reassembler = wire.Reassembler(2)
+    with pytest.raises(wire.WireError):
+        reassembler.add(datagram[:wire.FRAGMENT_HEADER.size - 1], 0)
+    bad = bytearray(datagram)
+    wire.FRAGMENT_HEADER.pack_into(bad, 0, wire.VERSION, wire.FRAGMENT, 3, 77, 9, 9)
+    with pytest.raises(wire.WireError):
+        reassembler.add(bytes(bad), 0)
+
+# Once the first window is in, the next one is asked for straight away
+def test_next_window():
+    datagrams = fragments()
+    reassembler = wire.Reassembler(2, window=10, delay=.05)
+    for datagram in datagrams[:9]:
+        reassembler.add(datagram, 0)
+    assert reassembler.requests(0) == []
+    reassembler.add(datagrams[9], 0)
+    assert reassembler.next_deadline() == 0
+    assert reassembler.requests(0) == [(3, 77, list(range(10, 20)))]
+
+# Fragments that went missing are asked for again once nothing has arrived for a while, and
+# only those are asked for
+def test_missing_fragments():
+    datagrams = fragments()
+    reassembler = wire.Reassembler(2, window=10, delay=.05)
+    lost = {2, 5}
+    for i in range(10):
+        if i not in lost:
+            reassembler.add(datagrams[i], 0)
+    assert reassembler.requests(.01) == []
+    assert reassembler.requests(.05) == [(3, 77, [2, 5] + list(range(10, 18)))]
+
+    # Asking again waits just as long
+    assert reassembler.requests(.06) == []
+    assert reassembler.next_deadline() == pytest.approx(.1)
+
+# A sender answering every request gets the whole message through, even when a lot is lost
+def test_lossy_transfer():
+    datagrams = fragments()
+    rng = random.Random(2)
+    reassembler = wire.Reassembler(2, window=10, delay=.05)
+    now = 0
+    sending = list(range(10))
+    message = None
+    while message is None:
+        assert now < 2
+        for i in sending:
+            if rng.random() > .3:
+                message = reassembler.add(datagrams[i], now) or message
+        now += .01
+        sending = [i for _, _, indices in reassembler.requests(now) for i in indices]
+    assert message == MESSAGE
+
+def test_expire():
+    datagrams = fragments()
+    reassembler = wire.Reassembler(2)
+    reassembler.add(datagrams[0], 0)
+    reassembler.add(datagrams[1], 1.5)
+    reassembler.expire(3)
+    assert reassembler.pending
+    reassembler.expire(3.5)
+    assert not reassembler.pending
+    assert reassembler.next_deadline() is None
+
+def test_unknown_sender():
+    reassembler = wire.Reassembler(2)
+    with pytest.raises(wire.WireError):
+        reassembler.add(wire.fragment(MESSAGE, 500, 77, 200)[0], 0, 3)
+    assert not reassembler.pending
+
+# A router that is sent a fragment from a node it doesn't have drops it, rather than crashing later on
+# when it asks that node for the rest
+def test_router_drops_unknown_sender(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    assert r.recieve_datagram(wire.fragment(MESSAGE, 500, 77, 200)[0], ('127.0.0.1', 1)) is None
+    assert r.metrics.get('messages_dropped') == 1
+    assert not r.reassembler.pending
+    assert r.reassembler.requests(r.clock() + 1) == []
@@ -0,0 +1,92 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# The count of unsettled pairs that CostMatrix keeps up to date should always match counting
+# them from scratch, whatever is done to the matrix.
+
+import random
+from array import array
+import pytest
+from matrix import CostMatrix
+
+INFINITY = 999
+
+# Count the unsettled pairs the slow way
+def unsettled(matrix):
+    n = matrix.n
+    count = 0
+    for u in range(n):
+        for v in range(u + 1, n):
+            if u in matrix.absent or v in matrix.absent:
+                continue
+            a, b = matrix.get(u, v), matrix.get(v, u)
+            count += a != b or a == INFINITY
+    return count
+
+def random_row(rng, n, u):
+    row = [rng.choice([1, 2, 3, INFINITY]) for _ in range(n)]
+    row[u] = 0
+    return row
+
+def test_new_matrix():
+    matrix = CostMatrix(5, INFINITY)
+    assert matrix.unsettled == 10
+    assert not matrix.symmetric_and_finite()
+
+def test_symmetric_and_finite():
+    matrix = CostMatrix(3, INFINITY)
+    for u in range(3):
+        matrix.set_row(u, [0 if u == v else 5 for v in range(3)])
+    assert matrix.unsettled == 0
+    assert matrix.symmetric_and_finite()
+    matrix.set(0, 1, 6)
+    assert matrix.unsettled == 1
+    matrix.set(1, 0, 6)
+    assert matrix.symmetric_and_finite()
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_changes(seed):
+    rng = random.Random(seed)
+    n = 6
+    matrix = CostMatrix(n, INFINITY)
+    for _ in range(300):
+        action = rng.randrange(7)
+        u = rng.randrange(matrix.n)
+        if action == 0:
+            matrix.set(u, rng.randrange(matrix.n), rng.choice([1, 2, INFINITY]))
+        elif action == 1:
+            matrix.set_row(u, random_row(rng, matrix.n, u))
+        elif action == 2:
+            matrix.clear_row(u)
+        elif action == 3:
+            matrix.set_absent(u, rng.random() < .5)
+        elif action == 4 and matrix.n < 10:
+            matrix.resize(matrix.n + 1)
+        elif action == 5:
+            cells = array('I', [c for v in range(matrix.n) for c in random_row(rng, matrix.n, v)])
+            matrix.load(cells, array('Q', range(matrix.n)))
+        elif action == 6 and rng.random() < .1:
+            matrix.reset()
+        assert matrix.unsettled == unsettled(matrix)
+
+# Making room for more nodes keeps every cost, and the new nodes start out unreachable
+def test_resize():
+    matrix = CostMatrix(2, INFINITY)
+    matrix.set_row(0, [0, 4])
+    matrix.set_row(1, [4, 0])
+    matrix.resize(3)
+    assert matrix.row(0).tolist() == [0, 4, INFINITY]
+    assert matrix.row(2).tolist() == [INFINITY, INFINITY, 0]
+    assert matrix.unsettled == 2
+    assert list(matrix.versions) == [0, 0, 0]
+
+# Absent nodes don't keep the rest of the matrix from converging
+def test_absent():
+    matrix = CostMatrix(3, INFINITY)
+    matrix.set_row(0, [0, 1, INFINITY])
+    matrix.set_row(1, [1, 0, INFINITY])
+    assert matrix.unsettled == 2
+    matrix.set_absent(2)
+    assert matrix.symmetric_and_finite()
+    matrix.set_absent(2, False)
+    assert matrix.unsettled == 2
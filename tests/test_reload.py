@@ -0,0 +1,122 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# A config file that changes while the routers are running is read again. Nodes keep their
+# index, new nodes are numbered after them, and nodes whose lines are gone are marked as removed.
+# Links can also be changed from code.
+
+import os
+import router
+import topology
+import wire
+from topology import NodeRegistry
+from test_config import make_router
+
+# Replace the config file, making sure it looks changed even if it is written straight away
+def rewrite(tmp_path, config):
+    path = tmp_path / 'topology.config'
+    mtime = path.stat().st_mtime_ns
+    path.write_text(config)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+def test_renumber():
+    before = topology.parse('A={B:1}\nB={A:1,C:2}\nC={B:2}\n')
+    after = topology.renumber(topology.parse('D={C:5}\nC={D:5,A:7}\nA={C:7}\n'), before.nodes)
+    assert list(after.nodes) == ['A', 'B', 'C', 'D']
+    assert after.links == {3: {2: 5}, 2: {3: 5, 0: 7}, 0: {2: 7}}
+
+def test_unchanged(tmp_path):
+    make_router(tmp_path, 'A')
+    assert not router.reload_topology()
+
+def test_nodes_added_and_removed(tmp_path):
+    make_router(tmp_path, 'A')
+    rewrite(tmp_path, 'A={C:1,D:2}\nC={A:1,D:1}\nD={A:2,C:1}\n')
+    assert router.reload_topology()
+    assert list(router.NODES) == ['A', 'B', 'C', 'D']
+    assert router.get_index('D') == 3
+    assert router.REMOVED == {1}
+
+    # A node that comes back is no longer removed
+    rewrite(tmp_path, 'A={B:4}\nB={A:4}\nC={}\nD={}\n')
+    assert router.reload_topology()
+    assert router.REMOVED == set()
+
+def test_router_picks_up_changes(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    rewrite(tmp_path, 'A={C:1,D:2}\nC={A:1,D:1}\nD={A:2,C:1}\n')
+    r.check_config()
+    assert len(r.table) == 4
+    assert r.edges == {'C': 1, 'D': 2}
+    assert r.table.get(0, 1) == router.INFINITY
+    assert r.table.get(0, 3) == 2
+
+def test_set_link_cost(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    r.table.set_row(2, [1, 2, 0])
+    r.table.set_version(2, 1)
+    r.set_link_cost('B', 1)
+    assert r.edges == {'B': 1, 'C': 1}
+    assert r.table.get(0, 1) == 1
+
+    # Without the link, B is reached through C
+    r.set_link_cost('B', None)
+    assert r.edges == {'C': 1}
+    assert r.table.get(0, 1) == 3
+    assert r.fib.next_hops[1] == 2
+
+def test_set_link_cost_floods_links(tmp_path):
+    r = make_router(tmp_path, 'A', mode='ls')
+    r.load_config()
+    seq = r.lsa_seq
+    r.set_link_cost('B', 7)
+    assert r.lsa_seq == seq + 1
+    assert r.lsdb.get(0, 1) == 7
+
+# A message from a node that was added to the config file after we last read it is still handled,
+# as is one that only mentions such a node
+def test_message_from_new_node(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    rewrite(tmp_path, 'A={B:4,C:1,D:2}\nB={A:4,C:2}\nC={A:1,B:2}\nD={A:2}\n')
+    raw = wire.pack('hello', 'D', False, NodeRegistry('ABCD').get_index)
+    assert r.recieve_datagram(raw, ('127.0.0.1', 1)) == ('hello', 'D', False)
+    assert r.edges == {'B': 4, 'C': 1, 'D': 2}
+
+def test_links_of_new_node(tmp_path):
+    r = make_router(tmp_path, 'A', mode='ls')
+    r.load_config()
+    rewrite(tmp_path, 'A={B:4,C:1}\nB={A:4,C:2,D:3}\nC={A:1,B:2}\nD={B:3}\n')
+    links = ('D', 5, ('lsa', 'D', 7, (('B', 3),)))
+    raw = wire.pack('broadcast', 'B', links, NodeRegistry('ABCD').get_index)
+    msg = r.recieve_datagram(raw, ('127.0.0.1', 1))
+    assert msg[:2] == ('broadcast', 'B')
+    r.handle_message(*msg)
+    assert r.lsdb.get(3, 1) == 3
+
+# In link state mode the number of nodes a router can't reach is kept as its row changes, rather
+# than counted whenever it checks whether it has converged
+def test_unreachable_count(tmp_path):
+    r = make_router(tmp_path, 'A', mode='ls')
+    r.load_config()
+    def check():
+        assert r.unreachable_count == len(r.unreachable())
+    check()
+    assert r.unreachable_count == 0
+
+    r.set_link_cost('C', None)
+    check()
+    r.set_link_cost('B', None)
+    check()
+    assert r.unreachable_count == 2
+    r.break_link('A', 'C')
+    check()
+
+    # A node that was taken out of the config file isn't counted, even though it can't be reached
+    rewrite(tmp_path, 'A={C:1,D:2}\nC={A:1,D:1}\nD={A:2,C:1}\n')
+    r.check_config()
+    check()
+    assert r.table.get(0, 1) == router.INFINITY
+    assert r.unreachable_count == 0
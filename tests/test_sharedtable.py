@@ -0,0 +1,94 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Each router's own row is kept in shared memory, and every other router reads the rows that
+# have changed since it last looked.
+
+import platform
+import threading
+import pytest
+import sharedtable
+
+pytestmark = pytest.mark.skipif(platform.machine().lower() not in sharedtable.X86,
+                                reason='tables are only shared on x86')
+
+@pytest.fixture
+def tables():
+    tables = sharedtable.SharedTables(4, 999)
+    yield tables
+    tables.close()
+
+def test_only_own_row_shared(tables):
+    table = tables.table(1)
+    table.set(1, 2, 5)
+    table.set(3, 0, 7)
+    table.set_version(1, 9)
+    assert tables.is_hosted(1) and not tables.is_hosted(0)
+    _, costs, version = tables.read_row(1)
+    assert costs == [999, 0, 5, 999]
+    assert version == 9
+
+    # Every other row stays private to the router
+    assert table.get(3, 0) == 7
+    assert tables.read_row(3)[1] == [0] * 4
+
+def test_changed_rows(tables):
+    tables.table(0)
+    b = tables.table(2)
+    rows, versions, seen = tables.changed_rows(None)
+    assert [u for u, _, _ in rows] == [0, 2]
+
+    # Nothing has changed since
+    assert tables.changed_rows(seen)[0] == []
+
+    b.set_row(2, [4, 4, 0, 1])
+    b.set_version(2, 3)
+    rows, versions, seen = tables.changed_rows(seen)
+    assert rows == [(2, None, [4, 4, 0, 1])]
+    assert versions == [3]
+
+    # A row that isn't hosted any more isn't read
+    tables.release(0)
+    tables.seqs[0] += 2
+    assert tables.changed_rows(seen)[0] == []
+
+def test_row_being_written(tables):
+    table = tables.table(1)
+    before = tables.read_row(1)[0]
+    table.set(1, 0, 3)
+    seq, costs, _ = tables.read_row(1)
+    assert seq == before + 2 and seq % 2 == 0
+    assert costs[0] == 3
+
+# A reader that finds the row halfway through a write waits for the write to finish, and then
+# reads the whole of the new row
+def test_waits_for_write(tables):
+    table = tables.table(1)
+    table.begin()
+    table.shared_row[0] = 3
+    def finish():
+        table.shared_row[2] = 4
+        table.end()
+    writer = threading.Timer(0.02, finish)
+    writer.start()
+    seq, costs, _ = tables.read_row(1, timeout=5)
+    writer.join()
+    assert seq % 2 == 0
+    assert costs[0] == 3 and costs[2] == 4
+
+# A row left halfway through a write, by a writer that stopped, isn't read, and doesn't hold up
+# the rows that can be. It is read once the write is finished
+def test_write_never_finished(tables, monkeypatch):
+    monkeypatch.setattr(sharedtable, 'READ_TIMEOUT', 0.01)
+    a = tables.table(0)
+    b = tables.table(1)
+    _, _, seen = tables.changed_rows(None)
+    a.set(0, 1, 5)
+    b.begin()
+    assert tables.read_row(1, timeout=0.01) is None
+    rows, _, seen = tables.changed_rows(seen)
+    assert [u for u, _, _ in rows] == [0]
+
+    b.end()
+    rows, _, seen = tables.changed_rows(seen)
+    assert [u for u, _, _ in rows] == [1]
@@ -0,0 +1,112 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Snapshots come back exactly as they were saved, and one that is damaged, cut short, or taken
+# with different nodes is never used.
+
+from array import array
+import pytest
+import router
+import snapshot
+from test_config import make_router
+
+NODES = ['A', 'B', 'C']
+
+def make_snapshot(mode='dv'):
+    ls = mode == 'ls'
+    return snapshot.Snapshot(
+        mode, NODES, array('I', [0, 4, 1, 4, 0, 2, 1, 2, 0]), array('Q', [7, 2**40, 3]),
+        array('i', [-1, 2, 2]), array('I', [0, 3, 1]), 7, 12, 345,
+        array('I', [0, 4, 1, 4, 0, 2, 1, 2, 0]) if ls else None,
+        array('I', [12, 5, 0]) if ls else None, array('I', [340, 9, 0]) if ls else None, 1234.5)
+
+def saved(tmp_path, state=None):
+    path = tmp_path / 'A.snapshot'
+    snapshot.save(str(path), state or make_snapshot())
+    return path
+
+@pytest.mark.parametrize('mode', ['dv', 'ls'])
+def test_round_trip(tmp_path, mode):
+    state = make_snapshot(mode)
+    loaded = snapshot.load(str(saved(tmp_path, state)), NODES)
+    for name in ('mode', 'nodes', 'table', 'versions', 'next_hops', 'costs', 'row_version', 'lsa_seq',
+                 'flood_seq', 'lsdb', 'lsa_seqs', 'lsa_floods', 'taken'):
+        assert getattr(loaded, name) == getattr(state, name), name
+
+def test_missing(tmp_path):
+    assert snapshot.load(str(tmp_path / 'missing.snapshot'), NODES) is None
+
+def test_different_nodes(tmp_path):
+    path = str(saved(tmp_path))
+    assert snapshot.load(path, ['A', 'B', 'D']) is None
+    assert snapshot.load(path, NODES + ['D']) is None
+
+@pytest.mark.parametrize('offset', [0, 10, 60, -5, -1])
+def test_damaged(tmp_path, offset):
+    path = saved(tmp_path)
+    raw = bytearray(path.read_bytes())
+    raw[offset] ^= 0x01
+    path.write_bytes(raw)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load(str(path), NODES)
+
+@pytest.mark.parametrize('size', [0, 10, snapshot.HEADER.size + snapshot.CHECK.size, 100])
+def test_cut_short(tmp_path, size):
+    path = saved(tmp_path)
+    path.write_bytes(path.read_bytes()[:size])
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load(str(path), NODES)
+
+# A snapshot in another format is refused, even though its checksum is right
+def test_other_format(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'FORMAT', snapshot.FORMAT + 1)
+    path = str(saved(tmp_path))
+    monkeypatch.undo()
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.load(path, NODES)
+
+# A router with a damaged snapshot starts from its config file instead
+def test_router_ignores_damaged(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    path = tmp_path / 'A.snapshot'
+    r.snapshot_path = str(path)
+    r.save_snapshot()
+    raw = bytearray(path.read_bytes())
+    raw[snapshot.HEADER.size] ^= 0xff
+    path.write_bytes(raw)
+    assert not r.restore_snapshot()
+    assert r.table.row(0).tolist() == [0, 4, 1]
+
+def test_router_restores(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    r.table.set_row(2, [1, 2, 0])
+    r.table.set_version(2, 5)
+    r.snapshot_path = str(tmp_path / 'A.snapshot')
+    r.save_snapshot()
+
+    r = make_router(tmp_path, 'A')
+    r.snapshot_path = str(tmp_path / 'A.snapshot')
+    r.load_config()
+    assert r.restore_snapshot()
+    assert r.table.row(2).tolist() == [1, 2, 0]
+    assert r.table.versions[2] == 5
+
+# The version of our own row carries on from well past the one in the snapshot, even if the clock
+# has gone back since it was taken
+def test_router_restores_row_version(tmp_path):
+    r = make_router(tmp_path, 'A')
+    r.load_config()
+    r.row_version += 10**9
+    saved_version = r.row_version
+    r.snapshot_path = str(tmp_path / 'A.snapshot')
+    r.save_snapshot()
+
+    r = make_router(tmp_path, 'A')
+    r.snapshot_path = str(tmp_path / 'A.snapshot')
+    r.load_config()
+    assert r.row_version < saved_version
+    assert r.restore_snapshot()
+    assert r.row_version >= saved_version + router.SEQUENCE_GAP
+    assert r.table.versions[0] == r.row_version
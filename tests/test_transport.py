@@ -0,0 +1,54 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# The queue transport passes datagrams between routers in the same process without any sockets,
+# and a RouterHost can run routers on it.
+
+import pytest
+import router
+import transport
+from test_config import make_router
+
+def test_made_by_name():
+    a = transport.make_transport('queue', ('127.0.0.1', 1), 0)
+    b = transport.make_transport('queue', ('127.0.0.1', 2), 0)
+    try:
+        assert a.network is b.network is transport.NETWORK
+        a.sendto(b'hi', ('127.0.0.1', 2))
+        a.sendto(b'lost', ('127.0.0.1', 3))
+        assert b in transport.NETWORK.ready
+        assert b.recv_batch(100) == [(b'hi', ('127.0.0.1', 1))]
+        assert b not in transport.NETWORK.ready
+        assert a.recv_batch(100) == []
+        assert a.syscalls == b.syscalls == 0
+    finally:
+        a.close()
+        b.close()
+
+def test_empty():
+    a = transport.QueueTransport(('127.0.0.1', 1), 0, transport.LocalNetwork())
+    a.setblocking(False)
+    with pytest.raises(BlockingIOError):
+        a.recvfrom(100)
+    a.settimeout(0.01)
+    with pytest.raises(TimeoutError):
+        a.recvfrom(100)
+    a.close()
+
+@pytest.mark.parametrize('mode', ['dv', 'ls'])
+def test_host_converges(tmp_path, mode):
+    make_router(tmp_path, 'A')
+    routers = [router.Router(id, router.get_port(id), mode=mode, transport='queue') for id in router.NODES]
+    for r in routers:
+        r.verbose = False
+    network = transport.LocalNetwork()
+    host = router.RouterHost(routers, network)
+    host.open()
+    try:
+        assert not host.selector.get_map()
+        host.run()
+        assert host.converged()
+        assert routers[1].table.get(1, 0) == 3
+    finally:
+        host.close()
+    assert network.transports == {}
@@ -0,0 +1,82 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Every kind of message should come out of wire.unpack the same as it went into wire.pack.
+
+import datetime
+import pytest
+import wire
+from topology import NodeRegistry
+
+NODES = NodeRegistry('ABCDEF')
+
+def round_trip(msg_type, id, data):
+    return wire.unpack(wire.pack(msg_type, id, data, NODES.get_index), NODES.get_id)
+
+# Decoded updates hold tuples where lists were sent, so they are turned back into lists
+def as_lists(data):
+    seq, base, rows, versions, poisoned = data
+    return (seq, base, [(u, None if columns is None else list(columns), list(costs)) for u, columns, costs in rows],
+            list(versions), list(poisoned))
+
+@pytest.mark.parametrize('rows', [
+    # A full table, where every row has a cost for every column
+    [(0, None, [0, 4, 999, 999, 2, 6]), (1, None, [4, 0, 999, 3, 999, 1])],
+    # Costs too big for 16 bits
+    [(2, None, [70000, 1, 0, 5, 5, 5])],
+    # Rows with only some of their columns
+    [(0, [1, 4], [4, 2]), (3, [2], [1])],
+    # Nothing changed
+    [],
+])
+def test_update(rows):
+    data = (7, 3, rows, [11 + u for u, _, _ in rows], [2, 5])
+    msg_type, id, decoded = round_trip('update', 'B', data)
+    assert (msg_type, id) == ('update', 'B')
+    assert as_lists(decoded) == data
+
+@pytest.mark.parametrize('payload', [
+    ['message', 'A, 127.0.0.1, 12000', ('1001783662', '1002015854'), datetime.datetime(2024, 3, 1, 12, 30, 5, 123456), 12, 120],
+    ('link_broken', 'A', 'B'),
+    ('lsa', 'C', 9, (('D', 1), ('F', 1))),
+    ('lsa', 'E', 1, ()),
+])
+def test_broadcast(payload):
+    assert round_trip('broadcast', 'A', ('F', 42, payload)) == ('broadcast', 'A', ('F', 42, payload))
+
+@pytest.mark.parametrize('msg_type, data', [
+    ('ack', ('C', 42)),
+    ('link_broken', ('A', 'B')),
+    ('update_ack', 123456),
+    ('hello', False),
+    ('hello', True),
+    ('sync', (True, (0, 5, 1 << 40))),
+    ('resend', (77, (0, 3, 129))),
+    ('data', ('A', 'F', 64, 2, 99, 1.5, 2.25, b'payload')),
+])
+def test_other_messages(msg_type, data):
+    assert round_trip(msg_type, 'D', data) == (msg_type, 'D', data)
+
+def test_wrong_version():
+    raw = bytearray(wire.pack('hello', 'A', False, NODES.get_index))
+    raw[0] = wire.VERSION + 1
+    with pytest.raises(wire.WireError):
+        wire.unpack(bytes(raw), NODES.get_id)
+
+def test_unknown_type():
+    with pytest.raises(wire.WireError):
+        wire.unpack(wire.HEADER.pack(wire.VERSION, 200, 0), NODES.get_id)
+    with pytest.raises(wire.WireError):
+        wire.pack('nonsense', 'A', None, NODES.get_index)
+
+# Every message cut short anywhere is rejected with a WireError, never anything else
+def test_truncated():
+    raw = wire.pack('update', 'A', (1, 0, [(0, None, [0, 4, 999, 999, 2, 6])], [3], [1]), NODES.get_index)
+    for end in range(len(raw)):
+        with pytest.raises(wire.WireError):
+            wire.unpack(raw[:end], NODES.get_id)
+
+def test_unknown_node():
+    raw = wire.HEADER.pack(wire.VERSION, wire.MSG_TYPES['hello'], 40) + wire.HELLO.pack(False)
+    with pytest.raises(wire.WireError):
+        wire.unpack(raw, NODES.get_id)
@@ -0,0 +1,191 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Makes up networks of different shapes and writes them out as config files, for benchmarks and
+# for trying the routers on something bigger than topology.config. Every network is connected,
+# every link has a random cost from 1 to MAX_COST, and the same seed always gives the same
+# network. The shapes are:
+#
+#     ring         every node is linked to the next, and the last back to the first
+#     grid         a square grid, each node linked to the nodes above, below and beside it
+#     random       a random spanning tree with more random links added, so each node has
+#                  about `degree` links
+#     er           Erdős–Rényi, where every pair of nodes is linked with the same chance,
+#                  picked so each node has about `degree` links. Any pieces that end up cut off
+#                  from the rest are joined on with one more link each
+#     scale-free   Barabási–Albert, where each new node links to `degree` / 2 existing nodes,
+#                  picked with a chance that goes up with how many links they already have.
+#                  A few nodes end up with a lot of links
+#     fat-tree     the switches of a k-ary fat tree, as used in data centers: k pods of k/2
+#                  edge and k/2 aggregation switches, and (k/2)^2 core switches. The size is k,
+#                  which must be even
+#
+# A network is a list of nodes and a dict of links, where links[u][v] is the cost from u to v.
+#
+# To write one out:
+#     python3 topogen.py <SHAPE> <SIZE> [--degree N] [--seed SEED] [--out FILE]
+
+import argparse, random, sys
+from math import isqrt
+
+# The most a single link can cost
+MAX_COST = 9
+
+class Network:
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self.links = {u: {} for u in self.nodes}
+
+    # Link `u` and `v` both ways, with the same random cost each way
+    def link(self, u, v, rng):
+        if u != v and v not in self.links[u]:
+            cost = rng.randint(1, MAX_COST)
+            self.links[u][v] = self.links[v][u] = cost
+
+    def link_count(self):
+        return sum(len(links) for links in self.links.values()) // 2
+
+    # Every piece of the network that is cut off from the rest, as a list of nodes each
+    def components(self):
+        seen = set()
+        components = []
+        for start in self.nodes:
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            stack = [start]
+            while stack:
+                for v in self.links[stack.pop()]:
+                    if v not in seen:
+                        seen.add(v)
+                        component.append(v)
+                        stack.append(v)
+            components.append(component)
+        return components
+
+    # The network in the config file format
+    def config(self):
+        return ''.join(f'{u}={{{",".join(f"{v}:{cost}" for v, cost in self.links[u].items())}}}\n' for u in self.nodes)
+
+    def write(self, path):
+        with open(path, 'w') as config:
+            config.write(self.config())
+
+def names(n):
+    return [f'n{i}' for i in range(n)]
+
+def ring(n, degree, rng):
+    network = Network(names(n))
+    for i in range(n):
+        network.link(f'n{i}', f'n{(i + 1) % n}', rng)
+    return network
+
+# A grid of the biggest square that has at most `n` nodes
+def grid(n, degree, rng):
+    side = max(1, isqrt(n))
+    network = Network(names(side * side))
+    for row in range(side):
+        for col in range(side):
+            u = row * side + col
+            if col + 1 < side:
+                network.link(f'n{u}', f'n{u + 1}', rng)
+            if row + 1 < side:
+                network.link(f'n{u}', f'n{u + side}', rng)
+    return network
+
+def random_network(n, degree, rng):
+    network = Network(names(n))
+
+    # Start with a random spanning tree, so that every node can reach every other
+    order = list(range(n))
+    rng.shuffle(order)
+    for i in range(1, n):
+        network.link(f'n{order[i]}', f'n{order[rng.randrange(i)]}', rng)
+    for _ in range(n * (degree - 2) // 2):
+        network.link(f'n{rng.randrange(n)}', f'n{rng.randrange(n)}', rng)
+    return network
+
+def erdos_renyi(n, degree, rng):
+    network = Network(names(n))
+    chance = min(1, degree / max(1, n - 1))
+    for u in range(n):
+        for v in range(u + 1, n):
+            if rng.random() < chance:
+                network.link(f'n{u}', f'n{v}', rng)
+
+    # Join every piece that got cut off onto the first one
+    components = network.components()
+    for component in components[1:]:
+        network.link(rng.choice(component), rng.choice(components[0]), rng)
+    return network
+
+def scale_free(n, degree, rng):
+    network = Network(names(n))
+    m = max(1, degree // 2)
+
+    # Every node appears here once for each link it has, so picking from it favours nodes
+    # with more links. The first m + 1 nodes start out linked to each other
+    ends = []
+    for u in range(min(n, m + 1)):
+        for v in range(u):
+            network.link(f'n{u}', f'n{v}', rng)
+            ends += [u, v]
+    for u in range(m + 1, n):
+        targets = set()
+        while len(targets) < m:
+            targets.add(rng.choice(ends))
+        for v in targets:
+            network.link(f'n{u}', f'n{v}', rng)
+            ends += [u, v]
+    return network
+
+# The switches of a k-ary fat tree. Only even k make sense, so odd ones are rounded up
+def fat_tree(k, degree, rng):
+    k += k % 2
+    half = k // 2
+    core = [f'core{i}' for i in range(half * half)]
+    aggregation = [[f'p{pod}a{i}' for i in range(half)] for pod in range(k)]
+    edge = [[f'p{pod}e{i}' for i in range(half)] for pod in range(k)]
+    network = Network(core + [s for pod in aggregation for s in pod] + [s for pod in edge for s in pod])
+    for pod in range(k):
+        for i, a in enumerate(aggregation[pod]):
+            # Aggregation switch i of every pod links to the i-th group of core switches
+            for j in range(half):
+                network.link(a, core[i * half + j], rng)
+            for e in edge[pod]:
+                network.link(a, e, rng)
+    return network
+
+# Shape names -> the function that makes that shape, given (size, degree, rng)
+SHAPES = {
+    'ring': ring,
+    'grid': grid,
+    'random': random_network,
+    'er': erdos_renyi,
+    'scale-free': scale_free,
+    'fat-tree': fat_tree,
+}
+
+# Make a network of shape `shape`. For a fat tree `size` is k, and otherwise it is the number of nodes
+def generate(shape, size, degree=4, seed=0):
+    return SHAPES[shape](size, degree, random.Random(seed))
+
+def main():
+    parser = argparse.ArgumentParser(description='Write out a config file for a made up network')
+    parser.add_argument('shape', choices=SHAPES)
+    parser.add_argument('size', type=int, help='number of nodes, or k for a fat tree')
+    parser.add_argument('--degree', type=int, default=4, help='about how many links each node has, where the shape allows')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='file to write to, instead of printing it')
+    args = parser.parse_args()
+
+    network = generate(args.shape, args.size, args.degree, args.seed)
+    if args.out:
+        network.write(args.out)
+        print(f'Wrote {len(network.nodes)} nodes and {network.link_count()} links to {args.out}')
+    else:
+        sys.stdout.write(network.config())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# Reading the config file. Each line of the config file defines one node and the cost to
+# each of its neighbors:
+#
+#     A={B:4,E:2,F:6}
+#
+# Node names can be any mix of letters, numbers, `_`, `-` and `.`. A node can also be given
+# the address it listens on, in which case its port does not need to follow on from the
+# other nodes:
+#
+#     core-1@127.0.0.1:13000={edge-7:4,edge-9:2}
+#
+# Blank lines, and lines starting with `#`, are skipped.
+#
+# The config file is only read once. Every router that asks for it gets the same parsed
+# copy, until the file is changed on disk.
+
+import os, re
+
+# A node name
+NAME = r'[A-Za-z0-9_.-]+'
+
+# A line defining a node, its optional address, and its neighbors
+LINE = re.compile(rf'({NAME})(?:@([^=:@]+):([0-9]+))?=\{{((?:{NAME}:[0-9]+(?:,{NAME}:[0-9]+)*)?)\}}')
+
+# One neighbor and its cost, i.e. NEIGHBOR:COST
+NEIGHBOR = re.compile(rf'({NAME}):([0-9]+)')
+
+# Gives every node a fixed index, in the order they are added, so that any node can be
+# looked up by its id or by its index in constant time
+class NodeRegistry:
+    def __init__(self, ids=()):
+        self.ids = []
+        self.index = {}
+        for id in ids:
+            self.intern(id)
+
+    # Get the index of `id`, adding it if it hasn't been seen before
+    def intern(self, id):
+        index = self.index.get(id)
+        if index is None:
+            index = self.index[id] = len(self.ids)
+            self.ids.append(id)
+        return index
+
+    def get_index(self, id):
+        return self.index[id]
+
+    def get_id(self, index):
+        return self.ids[index]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, id):
+        return id in self.index
+
+# Everything that the config file defines
+class Topology:
+    def __init__(self):
+        # Every node, whether it has its own line or only shows up as a neighbor. Nodes with
+        # their own line come first, in the order of their lines
+        self.nodes = NodeRegistry()
+
+        # Node index -> {neighbor index: cost}, for each node that has its own line
+        self.links = {}
+
+        # Node index -> (host, port), for each node that was given an address
+        self.addresses = {}
+
+        # The line numbers of lines that were incorrectly formatted
+        self.errors = []
+
+        # The text that was parsed
+        self.text = ''
+
+    # Get the neighbors of node `id` and the cost to each of them, by id
+    def neighbors(self, id):
+        nodes = self.nodes
+        links = self.links.get(nodes.index.get(id), {})
+        return {nodes.get_id(v): cost for v, cost in links.items()}
+
+# Parse the text of a config file
+def parse(text):
+    topology = Topology()
+    topology.text = text
+    nodes = topology.nodes
+
+    matches = []
+    for i, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        # Check if line is correctly formatted, while also getting the node this line is defining,
+        # as well as the data within the `{}` after it
+        match = LINE.fullmatch(line)
+        if not match:
+            topology.errors.append(i + 1)
+            continue
+        matches.append(match)
+
+        # Number the nodes in the order of their lines, before any neighbors are seen
+        nodes.intern(match.group(1))
+
+    for match in matches:
+        curr = nodes.get_index(match.group(1))
+        if match.group(2):
+            topology.addresses[curr] = (match.group(2), int(match.group(3)))
+
+        # Get all the neighbors of this node, which are comma delimeted
+        links = topology.links.setdefault(curr, {})
+        for adj, cost in NEIGHBOR.findall(match.group(4)):
+            links[nodes.intern(adj)] = int(cost)
+
+    return topology
+
+# The same topology as `topology`, but numbered to follow on from `nodes`, a NodeRegistry from an
+# earlier load. Every node in `nodes` keeps its index, even if it is no longer in the config
+# file, so that tables built with the old numbering still line up. New nodes come after them
+def renumber(topology, nodes):
+    result = Topology()
+    result.text = topology.text
+    result.errors = topology.errors
+    result.nodes = NodeRegistry(nodes.ids)
+    for id in topology.nodes:
+        result.nodes.intern(id)
+
+    index = [result.nodes.get_index(id) for id in topology.nodes]
+    result.links = {index[u]: {index[v]: cost for v, cost in links.items()} for u, links in topology.links.items()}
+    result.addresses = {index[u]: address for u, address in topology.addresses.items()}
+    return result
+
+# Parsed config files, by path, along with the time they were last changed
+cache = {}
+
+# Get the parsed config file at `path`. The file is only read again if it has changed since
+# the last time it was loaded
+def load(path):
+    mtime = os.stat(path).st_mtime_ns
+    cached = cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path) as config:
+        topology = parse(config.read())
+    cache[path] = (mtime, topology)
+    return topology
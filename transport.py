@@ -0,0 +1,389 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# The ways routers can send datagrams to each other. Every transport looks like a small part of
+# a UDP socket, so the router doesn't need to know which one it has:
+#
+#     sendto(data, address)       send one datagram
+#     send_batch(datagrams)       send a list of (data, address) all at once
+#     recvfrom(size)              wait for one datagram, like socket.recvfrom, raising
+#                                 TimeoutError or BlockingIOError if none arrives
+#     recv_batch(size)            every datagram that is already waiting, as (data, address),
+#                                 without ever blocking
+#     settimeout, gettimeout, setblocking, fileno, close
+#
+# The transports are:
+#     udp       one system call for every datagram sent or recieved
+#     batched   UDP, but a whole batch of datagrams is sent with one sendmmsg call, and read
+#               with one recvmmsg call. Falls back to one call per datagram wherever those
+#               aren't available
+#     queue     no socket at all. Datagrams are only passed between routers in the same process,
+#               through a LocalNetwork, and anything sent anywhere else is lost
+
+import socket, selectors, struct, ctypes, ctypes.util, errno
+from collections import deque
+from time import sleep
+
+# How many datagrams the batched transport sends or recieves in one system call
+BATCH_SIZE = 64
+
+# The parts shared by every transport. Batches are sent and recieved one datagram at a time,
+# unless a transport can do better
+class Transport:
+    def __init__(self):
+        # How many system calls have been made to send and recieve datagrams
+        self.syscalls = 0
+
+    def send_batch(self, datagrams):
+        for data, address in datagrams:
+            self.sendto(data, address)
+
+    def recv_batch(self, size):
+        timeout = self.gettimeout()
+        self.setblocking(False)
+        datagrams = []
+        try:
+            while True:
+                datagrams.append(self.recvfrom(size))
+        except (BlockingIOError, TimeoutError):
+            pass
+        finally:
+            self.settimeout(timeout)
+        return datagrams
+
+# A plain UDP socket bound to `address`. The socket itself never blocks. Waiting for a datagram
+# is done with a selector instead, so that reading whatever is already there never has to wait
+# or switch the socket between blocking and non-blocking
+class UDPTransport(Transport):
+    def __init__(self, address, buffer_size):
+        super().__init__()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        self.timeout = None
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+
+    def sendto(self, data, address):
+        self.syscalls += 1
+        self.sock.sendto(data, address)
+
+    def recvfrom(self, size):
+        if self.timeout != 0 and not self.selector.select(self.timeout):
+            raise TimeoutError
+        self.syscalls += 1
+        return self.sock.recvfrom(size)
+
+    def recv_batch(self, size):
+        datagrams = []
+        while True:
+            self.syscalls += 1
+            try:
+                datagrams.append(self.sock.recvfrom(size))
+            except BlockingIOError:
+                return datagrams
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def gettimeout(self):
+        return self.timeout
+
+    def setblocking(self, blocking):
+        self.timeout = None if blocking else 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.selector.close()
+        self.sock.close()
+
+# Several routers in the same process that each also have a UDP socket for everyone else.
+# Datagrams between two routers on the same LocalNetwork skip the socket and are put straight
+# into a queue. `ready` holds each transport that has datagrams waiting in its queue
+class LocalNetwork:
+    def __init__(self):
+        self.transports = {}
+        self.ready = {}
+
+# A UDP socket that delivers to other routers on the same LocalNetwork in memory
+class LocalUDPTransport(UDPTransport):
+    def __init__(self, address, buffer_size, network):
+        super().__init__(address, buffer_size)
+        self.network = network
+        self.address = address
+        self.local = deque()
+        network.transports[address] = self
+
+    def sendto(self, data, address):
+        destination = self.network.transports.get(address)
+        if destination is None:
+            return super().sendto(data, address)
+        destination.local.append((data, self.address))
+        self.network.ready[destination] = None
+
+    def recvfrom(self, size):
+        if self.local:
+            return self.local.popleft()
+        return super().recvfrom(size)
+
+    def recv_batch(self, size):
+        datagrams = list(self.local)
+        self.local.clear()
+        self.network.ready.pop(self, None)
+        datagrams += super().recv_batch(size)
+        return datagrams
+
+    def close(self):
+        self.network.transports.pop(self.address, None)
+        self.network.ready.pop(self, None)
+        super().close()
+
+# A transport with no socket, that only reaches other routers on the same LocalNetwork. There is
+# nothing for a selector to wait on, so whoever drives it finds out which transports have
+# datagrams waiting from the network's `ready` instead. Those made by name all share NETWORK
+class QueueTransport(Transport):
+    def __init__(self, address, buffer_size, network=None):
+        super().__init__()
+        self.network = network if network is not None else NETWORK
+        self.address = address
+        self.local = deque()
+        self.timeout = None
+        self.network.transports[address] = self
+
+    def sendto(self, data, address):
+        destination = self.network.transports.get(address)
+        if destination is not None:
+            destination.local.append((data, self.address))
+            self.network.ready[destination] = None
+
+    # Nothing else in this thread can send while we wait, so when the queue is empty, wait out
+    # the timeout and give up
+    def recvfrom(self, size):
+        if self.local:
+            if len(self.local) == 1:
+                self.network.ready.pop(self, None)
+            return self.local.popleft()
+        if self.timeout == 0:
+            raise BlockingIOError
+        if self.timeout is not None:
+            sleep(self.timeout)
+        raise TimeoutError
+
+    def recv_batch(self, size):
+        datagrams = list(self.local)
+        self.local.clear()
+        self.network.ready.pop(self, None)
+        return datagrams
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def gettimeout(self):
+        return self.timeout
+
+    def setblocking(self, blocking):
+        self.timeout = None if blocking else 0
+
+    def close(self):
+        if self.network.transports.get(self.address) is self:
+            del self.network.transports[self.address]
+        self.network.ready.pop(self, None)
+
+NETWORK = LocalNetwork()
+
+# The C structures that sendmmsg and recvmmsg work with
+class iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort), ('sin_port', ctypes.c_uint16),
+                ('sin_addr', ctypes.c_uint8 * 4), ('sin_zero', ctypes.c_uint8 * 8)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.c_void_p), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', msghdr), ('msg_len', ctypes.c_uint)]
+
+# Find sendmmsg and recvmmsg in the C library, or None for both if they aren't there
+def load_mmsg():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        sendmmsg, recvmmsg = libc.sendmmsg, libc.recvmmsg
+    except (OSError, AttributeError, TypeError):
+        return None, None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    return sendmmsg, recvmmsg
+
+SENDMMSG, RECVMMSG = load_mmsg()
+
+# Where each field that changes from one datagram to the next lives in the C structures. They
+# are filled in with struct, which is much quicker than setting ctypes fields one at a time
+MMSGHDR_SIZE = ctypes.sizeof(mmsghdr)
+IOVEC_SIZE = ctypes.sizeof(iovec)
+SOCKADDR_SIZE = ctypes.sizeof(sockaddr_in)
+NAME_OFFSET = msghdr.msg_name.offset
+NAMELEN_OFFSET = msghdr.msg_namelen.offset
+LEN_OFFSET = mmsghdr.msg_len.offset
+POINTER = struct.Struct('P')
+UINT = struct.Struct('I')
+IOV = struct.Struct('PN')
+
+# A batch of BATCH_SIZE message headers, each pointing at its own iovec. Only the parts that
+# change from one datagram to the next have to be filled in for each batch
+class MessageBatch:
+    def __init__(self):
+        self.msgs = (mmsghdr * BATCH_SIZE)()
+        self.iovs = (iovec * BATCH_SIZE)()
+        self.base = ctypes.addressof(self.msgs)
+        for i in range(BATCH_SIZE):
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.addressof(self.iovs[i])
+            hdr.msg_iovlen = 1
+        self.msgs_view = memoryview(self.msgs).cast('B')
+        self.iovs_view = memoryview(self.iovs).cast('B')
+
+    # Point message `i` at the address `name`, which is `namelen` bytes long
+    def set_name(self, i, name, namelen):
+        POINTER.pack_into(self.msgs_view, i*MMSGHDR_SIZE + NAME_OFFSET, name)
+        UINT.pack_into(self.msgs_view, i*MMSGHDR_SIZE + NAMELEN_OFFSET, namelen)
+
+    # Point message `i` at `length` bytes starting at the address `base`
+    def set_data(self, i, base, length):
+        IOV.pack_into(self.iovs_view, i*IOVEC_SIZE, base, length)
+
+    # How many bytes the kernel put in message `i`
+    def length(self, i):
+        return UINT.unpack_from(self.msgs_view, i*MMSGHDR_SIZE + LEN_OFFSET)[0]
+
+    # The address of message `i`, for handing part of the batch to the kernel
+    def address(self, i):
+        return self.base + i * MMSGHDR_SIZE
+
+# UDP, sending and recieving up to BATCH_SIZE datagrams in each system call
+class BatchedUDPTransport(UDPTransport):
+    def __init__(self, address, buffer_size):
+        super().__init__(address, buffer_size)
+        self.batched = SENDMMSG is not None
+
+        # The C version of each address we have sent to, and its location in memory, so it is
+        # only worked out once
+        self.addresses = {}
+        # The other way around, for the addresses we have recieved from
+        self.sources = {}
+
+        self.send_headers = MessageBatch()
+
+        # Room to recieve a whole batch of datagrams, set up once and used for every batch
+        self.recv_size = 0
+        self.recv_headers = None
+        self.recv_storage = None
+        self.recv_names = None
+        self.recv_buffers = None
+        self.recv_used = 0
+
+    # Get the location of the sockaddr_in for `address`
+    def sockaddr(self, address):
+        addr = self.addresses.get(address)
+        if addr is None:
+            host, port = address
+            name = sockaddr_in(socket.AF_INET, socket.htons(port),
+                               (ctypes.c_uint8 * 4)(*socket.inet_aton(socket.gethostbyname(host))))
+            addr = self.addresses[address] = (name, ctypes.addressof(name))
+        return addr[1]
+
+    def send_batch(self, datagrams):
+        if not self.batched or len(datagrams) <= 1:
+            return super().send_batch(datagrams)
+
+        batch = self.send_headers
+        for start in range(0, len(datagrams), BATCH_SIZE):
+            chunk = datagrams[start:start + BATCH_SIZE]
+            count = len(chunk)
+
+            # Copy every datagram into one buffer, and point each message at its part of it
+            buffer = ctypes.create_string_buffer(b''.join([data for data, _ in chunk]))
+            offset = ctypes.addressof(buffer)
+            for i, (data, address) in enumerate(chunk):
+                batch.set_data(i, offset, len(data))
+                batch.set_name(i, self.sockaddr(address), SOCKADDR_SIZE)
+                offset += len(data)
+
+            # The kernel can send fewer than we asked for, so keep going with the rest
+            sent = 0
+            while sent < count:
+                self.syscalls += 1
+                result = SENDMMSG(self.fileno(), batch.address(sent), count - sent, 0)
+                if result < 0:
+                    code = ctypes.get_errno()
+                    raise OSError(code, f'sendmmsg: {errno.errorcode.get(code, code)}')
+                sent += result
+
+    def recv_batch(self, size):
+        if not self.batched:
+            return super().recv_batch(size)
+
+        if self.recv_size != size:
+            self.setup_recv(size)
+        batch = self.recv_headers
+
+        # The kernel changes the length of the name of each message it fills in
+        for i in range(self.recv_used):
+            UINT.pack_into(batch.msgs_view, i*MMSGHDR_SIZE + NAMELEN_OFFSET, SOCKADDR_SIZE)
+
+        self.syscalls += 1
+        count = RECVMMSG(self.fileno(), batch.base, BATCH_SIZE, 0, None)
+        if count < 0:
+            self.recv_used = 0
+            code = ctypes.get_errno()
+            if code in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(code, f'recvmmsg: {errno.errorcode.get(code, code)}')
+        self.recv_used = count
+
+        datagrams = []
+        names = self.recv_names
+        buffers = self.recv_buffers
+        for i in range(count):
+            name = names[i*SOCKADDR_SIZE:(i+1)*SOCKADDR_SIZE].tobytes()
+            source = self.sources.get(name)
+            if source is None:
+                addr = sockaddr_in.from_buffer_copy(name)
+                source = self.sources[name] = (socket.inet_ntoa(bytes(addr.sin_addr)), socket.ntohs(addr.sin_port))
+            datagrams.append((buffers[i*size:i*size + batch.length(i)].tobytes(), source))
+        return datagrams
+
+    # Set up BATCH_SIZE buffers of `size` bytes, with somewhere to put who sent each of them
+    def setup_recv(self, size):
+        batch = MessageBatch()
+        names = (sockaddr_in * BATCH_SIZE)()
+        buffers = ctypes.create_string_buffer(size * BATCH_SIZE)
+        for i in range(BATCH_SIZE):
+            batch.set_data(i, ctypes.addressof(buffers) + i*size, size)
+            batch.set_name(i, ctypes.addressof(names) + i*SOCKADDR_SIZE, SOCKADDR_SIZE)
+        self.recv_size = size
+        self.recv_headers = batch
+        # Keep the ctypes objects alive for as long as the kernel might write to them
+        self.recv_storage = (names, buffers)
+        self.recv_names = memoryview(names).cast('B')
+        self.recv_buffers = memoryview(buffers).cast('B')
+
+# The transports that can be made from just an address, by name
+TRANSPORTS = {
+    'udp': UDPTransport,
+    'batched': BatchedUDPTransport,
+    'queue': QueueTransport,
+}
+
+# Create the transport called `name`, bound to `address`
+def make_transport(name, address, buffer_size):
+    if name not in TRANSPORTS:
+        raise ValueError(f'Unknown transport {name}, expected one of {", ".join(TRANSPORTS)}')
+    return TRANSPORTS[name](address, buffer_size)
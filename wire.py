@@ -0,0 +1,426 @@
+# Steven Culwell  Sameer Dayani
+# 1001783662      1002015854
+
+# The binary format that routers use to talk to each other. Every message starts with a
+# small fixed header, followed by a body whose layout depends on the type of message:
+#
+#   header      version (uint8), message type (uint8), sender index (uint16)
+#   update      sequence number (uint32), base sequence number (uint32), flags (uint8), then either
+#                   dense     column count (uint16), row count (uint16), then for each row:
+#                             row index (uint16), one cost for each column, in order
+#                   sparse    row count (uint16), then for each row: row index (uint16),
+#                             entry count (uint16), column indices (uint16 each), costs
+#               costs are uint16, or uint32 if the wide flag is set. After the rows comes the
+#               version of each row (uint64 each, in the same order), then a count (uint16)
+#               and the indices (uint16 each) of destinations the sender reaches through the
+#               recipient, which the recipient must treat as unreachable through the sender
+#   broadcast   origin index (uint16), sequence number (uint32), broadcast kind (uint8), then
+#               the body for that kind:
+#                   message       info (str), ids (uint8 count of str), time (int64 microseconds),
+#                                 updates (uint32), bytes (uint32)
+#                   link_broken   u (uint16), v (uint16)
+#                   lsa           node (uint16), sequence number (uint32), neighbor count (uint16),
+#                                 neighbor indices (uint16 each), costs (uint32 each)
+#   ack         origin index (uint16), sequence number (uint32), naming the broadcast being
+#               acknowledged
+#   link_broken u (uint16), v (uint16)
+#   update_ack  sequence number (uint32)
+#   data        source index (uint16), destination index (uint16), hops left to live (uint8),
+#               hops taken (uint8), packet id (uint32), time sent by the source (float64),
+#               time sent by the last hop (float64), then the payload, up to the end of the
+#               datagram. Data packets are never fragmented
+#   hello       whether the sender is leaving (uint8). A router that is leaving has finished, and
+#               won't be saying hello any more
+#   sync        whether this is a reply (uint8), count (uint16), then that many uint64s: the
+#               version of each row of the sender's table in distance vector mode, or the
+#               sequence number of each node's links in link state mode
+#   resend      message id (uint32), count (uint16), then that many fragment indices (uint16
+#               each), asking the sender of a fragmented message for those fragments
+#
+# Any message that is too big to fit in one datagram is split into fragments. Each fragment
+# has the usual header, with a message type of FRAGMENT, followed by:
+#
+#   fragment    message id (uint32), fragment index (uint16), fragment count (uint16), then
+#               the next piece of the full message
+#
+# Only the first window of fragments is sent straight away, so that a big message doesn't
+# overflow the socket of the router it is sent to. The reciever asks for the next window with a
+# resend message once it has the first, and asks again for any that went missing if nothing
+# arrives for a while. Once every fragment of a message has arrived, the pieces are joined back
+# together and decoded like any other message.
+#
+# Strings are utf-8, prefixed by their length as a uint16. Nodes are always sent as their
+# index rather than their id, so both ends must agree on the same config file.
+
+import struct, datetime
+
+# Bump this whenever the layout of any message changes
+VERSION = 10
+
+# Numbers for each type of message, as they are sent on the wire
+MSG_TYPES = {'update': 1, 'broadcast': 2, 'ack': 3, 'link_broken': 4, 'update_ack': 5, 'data': 6, 'hello': 7, 'sync': 8, 'resend': 9}
+MSG_NAMES = {v: k for k, v in MSG_TYPES.items()}
+
+# The message type of a data packet, which routers look for before decoding anything else
+DATA_CODE = MSG_TYPES['data']
+
+# The message type used for a fragment of a bigger message
+FRAGMENT = 255
+
+# Numbers for each kind of broadcast
+BROADCAST_KINDS = {'message': 1, 'link_broken': 2, 'lsa': 3}
+BROADCAST_NAMES = {v: k for k, v in BROADCAST_KINDS.items()}
+
+HEADER = struct.Struct('!BBH')
+ROW = struct.Struct('!HH')
+LINK = struct.Struct('!HH')
+LSA = struct.Struct('!HIH')
+SEQUENCE = struct.Struct('!II')
+ACK = struct.Struct('!I')
+FLOOD = struct.Struct('!HI')
+COUNT = struct.Struct('!H')
+BYTE = struct.Struct('!B')
+MESSAGE_TAIL = struct.Struct('!qII')
+FRAGMENT_HEADER = struct.Struct('!BBHIHH')
+DATA_HEADER = struct.Struct('!HHBBIdd')
+HELLO = struct.Struct('!?')
+SYNC = struct.Struct('!?H')
+RESEND = struct.Struct('!IH')
+
+# How long a data packet is before its payload
+DATA_SIZE = HEADER.size + DATA_HEADER.size
+
+# Flags for the layout of a table in an update
+FLAG_WIDE = 1
+FLAG_SPARSE = 2
+
+# All times are sent as microseconds from this point
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Raised when a datagram can not be decoded
+class WireError(ValueError):
+    pass
+
+def pack_str(parts, s):
+    data = s.encode()
+    parts.append(COUNT.pack(len(data)))
+    parts.append(data)
+
+def unpack_str(raw, offset):
+    (length,) = COUNT.unpack_from(raw, offset)
+    offset += COUNT.size
+    return raw[offset:offset+length].decode(), offset + length
+
+# Pack a list of numbers as network order uint16s, or uint32s if `wide`
+def pack_array(parts, values, wide):
+    parts.append(struct.pack(f'!{len(values)}{"I" if wide else "H"}', *values))
+
+def unpack_array(raw, offset, count, wide):
+    fmt = f'!{count}{"I" if wide else "H"}'
+    return struct.unpack_from(fmt, raw, offset), offset + struct.calcsize(fmt)
+
+# Tables are sent as a list of rows, each (row index, column indices, costs). When the column
+# indices are None, the row has a cost for every column, in order.
+def pack_table(parts, rows):
+    # Try to send narrow costs first, since almost every cost will fit
+    start = len(parts)
+    try:
+        pack_rows(parts, rows, False)
+    except struct.error:
+        del parts[start:]
+        pack_rows(parts, rows, True)
+
+def pack_rows(parts, rows, wide):
+    # When every row is full, which is the case for a full table, the number of columns is
+    # only sent once. Otherwise each row carries its own columns
+    dense = all(columns is None for _, columns, _ in rows) and len({len(costs) for _, _, costs in rows}) <= 1
+
+    parts.append(BYTE.pack((FLAG_WIDE if wide else 0) | (0 if dense else FLAG_SPARSE)))
+    if dense:
+        parts.append(COUNT.pack(len(rows[0][2]) if rows else 0))
+
+    parts.append(COUNT.pack(len(rows)))
+    for node, columns, costs in rows:
+        if dense:
+            parts.append(COUNT.pack(node))
+        else:
+            if columns is None:
+                columns = range(len(costs))
+            parts.append(ROW.pack(node, len(costs)))
+            pack_array(parts, columns, False)
+        pack_array(parts, costs, wide)
+
+def unpack_table(raw, offset):
+    (flags,) = BYTE.unpack_from(raw, offset)
+    offset += BYTE.size
+    wide = bool(flags & FLAG_WIDE)
+    dense = not flags & FLAG_SPARSE
+
+    if dense:
+        (count,) = COUNT.unpack_from(raw, offset)
+        offset += COUNT.size
+
+    rows = []
+    (num_rows,) = COUNT.unpack_from(raw, offset)
+    offset += COUNT.size
+    for _ in range(num_rows):
+        if dense:
+            (node,) = COUNT.unpack_from(raw, offset)
+            columns = None
+            offset += COUNT.size
+        else:
+            node, count = ROW.unpack_from(raw, offset)
+            columns, offset = unpack_array(raw, offset + ROW.size, count, False)
+        costs, offset = unpack_array(raw, offset, count, wide)
+        rows.append((node, columns, costs))
+    return rows, offset
+
+# A broadcast is (origin, sequence number, payload), where the payload starts with its kind
+def pack_broadcast(parts, data, index_of):
+    origin, seq, data = data
+    parts.append(FLOOD.pack(index_of(origin), seq))
+    kind = data[0]
+    if kind not in BROADCAST_KINDS:
+        raise WireError(f'Unknown broadcast kind {kind}')
+    parts.append(BYTE.pack(BROADCAST_KINDS[kind]))
+
+    if kind == 'message':
+        _, info, ids, utc, updates, num_bytes = data
+        pack_str(parts, info)
+        parts.append(BYTE.pack(len(ids)))
+        for i in ids:
+            pack_str(parts, i)
+        micros = (utc - EPOCH) // datetime.timedelta(microseconds=1)
+        parts.append(MESSAGE_TAIL.pack(micros, updates, num_bytes))
+    elif kind == 'lsa':
+        # The links are ((neighbor, cost), ...)
+        _, node, seq, links = data
+        parts.append(LSA.pack(index_of(node), seq, len(links)))
+        pack_array(parts, [index_of(v) for v, _ in links], False)
+        pack_array(parts, [cost for _, cost in links], True)
+    else:
+        _, u, v = data
+        parts.append(LINK.pack(index_of(u), index_of(v)))
+
+def unpack_broadcast(raw, offset, id_of):
+    origin, seq = FLOOD.unpack_from(raw, offset)
+    data, offset = unpack_payload(raw, offset + FLOOD.size, id_of)
+    return (id_of(origin), seq, data), offset
+
+def unpack_payload(raw, offset, id_of):
+    (kind,) = BYTE.unpack_from(raw, offset)
+    offset += BYTE.size
+    kind = BROADCAST_NAMES.get(kind)
+
+    if kind == 'message':
+        info, offset = unpack_str(raw, offset)
+        (count,) = BYTE.unpack_from(raw, offset)
+        offset += BYTE.size
+        ids = []
+        for _ in range(count):
+            i, offset = unpack_str(raw, offset)
+            ids.append(i)
+        micros, updates, num_bytes = MESSAGE_TAIL.unpack_from(raw, offset)
+        offset += MESSAGE_TAIL.size
+        utc = EPOCH + datetime.timedelta(microseconds=micros)
+        return ['message', info, tuple(ids), utc, updates, num_bytes], offset
+    elif kind == 'link_broken':
+        u, v = LINK.unpack_from(raw, offset)
+        return ('link_broken', id_of(u), id_of(v)), offset + LINK.size
+    elif kind == 'lsa':
+        node, seq, count = LSA.unpack_from(raw, offset)
+        neighbors, offset = unpack_array(raw, offset + LSA.size, count, False)
+        costs, offset = unpack_array(raw, offset, count, True)
+        return ('lsa', id_of(node), seq, tuple(zip(map(id_of, neighbors), costs))), offset
+
+    raise WireError('Unknown broadcast kind')
+
+# Encode a message of type `msg_type` from `id`. `index_of` maps a node id to its index
+def pack(msg_type, id, data, index_of):
+    if msg_type not in MSG_TYPES:
+        raise WireError(f'Unknown message type {msg_type}')
+    parts = [HEADER.pack(VERSION, MSG_TYPES[msg_type], index_of(id))]
+
+    if msg_type == 'update':
+        seq, base, table, versions, poisoned = data
+        parts.append(SEQUENCE.pack(seq, base))
+        pack_table(parts, table)
+        parts.append(struct.pack(f'!{len(versions)}Q', *versions))
+        parts.append(COUNT.pack(len(poisoned)))
+        pack_array(parts, poisoned, False)
+    elif msg_type == 'update_ack':
+        parts.append(ACK.pack(data))
+    elif msg_type == 'link_broken':
+        u, v = data
+        parts.append(LINK.pack(index_of(u), index_of(v)))
+    elif msg_type == 'ack':
+        origin, seq = data
+        parts.append(FLOOD.pack(index_of(origin), seq))
+    elif msg_type == 'hello':
+        parts.append(HELLO.pack(data))
+    elif msg_type == 'sync':
+        reply, vector = data
+        parts.append(SYNC.pack(reply, len(vector)))
+        parts.append(struct.pack(f'!{len(vector)}Q', *vector))
+    elif msg_type == 'resend':
+        msg_id, indices = data
+        parts.append(RESEND.pack(msg_id, len(indices)))
+        pack_array(parts, indices, False)
+    elif msg_type == 'data':
+        source, destination, ttl, hops, packet_id, sent, hop_sent, payload = data
+        parts.append(DATA_HEADER.pack(index_of(source), index_of(destination), ttl, hops, packet_id, sent, hop_sent))
+        parts.append(payload)
+    else:
+        pack_broadcast(parts, data, index_of)
+
+    return b''.join(parts)
+
+# Decode a message into (msg_type, id, data). `id_of` maps a node index back to its id
+def unpack(raw, id_of):
+    try:
+        version, code, sender = HEADER.unpack_from(raw)
+        if version != VERSION:
+            raise WireError(f'Unsupported version {version}')
+        msg_type = MSG_NAMES.get(code)
+        offset = HEADER.size
+
+        if msg_type == 'update':
+            seq, base = SEQUENCE.unpack_from(raw, offset)
+            table, offset = unpack_table(raw, offset + SEQUENCE.size)
+            versions = struct.unpack_from(f'!{len(table)}Q', raw, offset)
+            offset += len(table) * 8
+            (count,) = COUNT.unpack_from(raw, offset)
+            poisoned, offset = unpack_array(raw, offset + COUNT.size, count, False)
+            data = (seq, base, table, versions, poisoned)
+        elif msg_type == 'update_ack':
+            (data,) = ACK.unpack_from(raw, offset)
+        elif msg_type == 'link_broken':
+            u, v = LINK.unpack_from(raw, offset)
+            data = (id_of(u), id_of(v))
+        elif msg_type == 'ack':
+            origin, seq = FLOOD.unpack_from(raw, offset)
+            data = (id_of(origin), seq)
+        elif msg_type == 'hello':
+            (data,) = HELLO.unpack_from(raw, offset)
+        elif msg_type == 'sync':
+            reply, count = SYNC.unpack_from(raw, offset)
+            data = (reply, struct.unpack_from(f'!{count}Q', raw, offset + SYNC.size))
+        elif msg_type == 'resend':
+            msg_id, count = RESEND.unpack_from(raw, offset)
+            indices, offset = unpack_array(raw, offset + RESEND.size, count, False)
+            data = (msg_id, indices)
+        elif msg_type == 'data':
+            source, destination, *fields = DATA_HEADER.unpack_from(raw, offset)
+            data = (id_of(source), id_of(destination), *fields, bytes(raw[offset + DATA_HEADER.size:]))
+        elif msg_type is not None:
+            data, offset = unpack_broadcast(raw, offset, id_of)
+        else:
+            raise WireError(f'Unknown message type {code}')
+
+        return msg_type, id_of(sender), data
+    except (struct.error, UnicodeDecodeError, IndexError) as e:
+        raise WireError(f'Malformed message: {e}')
+
+# Split an encoded message into datagrams of at most `size` bytes. `sender` is the index of
+# the node sending it, and `msg_id` should be different for every message that node sends
+def fragment(raw, sender, msg_id, size):
+    if len(raw) <= size:
+        return [raw]
+
+    chunk = size - FRAGMENT_HEADER.size
+    if chunk <= 0:
+        raise WireError(f'Datagram size {size} is too small to fit a fragment')
+    count = (len(raw) + chunk - 1) // chunk
+    if count > 0xffff:
+        raise WireError(f'Message of {len(raw)} bytes needs too many fragments')
+
+    msg_id &= 0xffffffff
+    raw = memoryview(raw)
+    return [FRAGMENT_HEADER.pack(VERSION, FRAGMENT, sender, msg_id, i, count) + raw[i*chunk:(i+1)*chunk]
+            for i in range(count)]
+
+# A message that has only been partly recieved so far
+class Partial:
+    def __init__(self, count, deadline, expected):
+        self.count = count
+        # Fragment index -> piece of the message
+        self.pieces = {}
+        # When to give up on the message, and when to next ask for fragments that are missing
+        self.deadline = deadline
+        self.next_ask = deadline
+        # The fragments that were sent without asking, or that we have asked for since, and
+        # haven't arrived yet
+        self.expected = expected
+
+# Collects fragments as they arrive and puts messages back together once all of their
+# fragments are present. Only `window` fragments of a message are expected at a time, and once
+# they are all in the next window is asked for straight away. Fragments that are still missing
+# after `delay` seconds without anything arriving are asked for again. Messages that have had
+# nothing arrive for `timeout` seconds are thrown away.
+class Reassembler:
+    def __init__(self, timeout, window=0xffff, delay=None):
+        self.timeout = timeout
+        self.window = window
+        self.delay = timeout if delay is None else delay
+        # (sender, message id) -> Partial
+        self.pending = {}
+
+    # Add a datagram that was recieved at time `now`. Returns the full message once it is
+    # complete, or None if we are still waiting on more of it. Datagrams that are not
+    # fragments are returned as they are. If `nodes` is given, a fragment that claims to be
+    # from a node index of `nodes` or more is rejected, since we could never ask it for the rest
+    def add(self, raw, now, nodes=None):
+        if len(raw) < 2 or raw[1] != FRAGMENT:
+            return raw
+        try:
+            version, _code, sender, msg_id, index, count = FRAGMENT_HEADER.unpack_from(raw)
+        except struct.error as e:
+            raise WireError(f'Malformed fragment: {e}')
+        if version != VERSION:
+            raise WireError(f'Unsupported version {version}')
+        if index >= count:
+            raise WireError(f'Fragment {index} out of {count}')
+        if nodes is not None and sender >= nodes:
+            raise WireError(f'Fragment from unknown node {sender}')
+
+        key = (sender, msg_id)
+        entry = self.pending.get(key)
+        if entry is None or entry.count != count:
+            entry = self.pending[key] = Partial(count, now + self.timeout, set(range(min(count, self.window))))
+        entry.pieces[index] = raw[FRAGMENT_HEADER.size:]
+        entry.expected.discard(index)
+
+        if len(entry.pieces) < count:
+            entry.deadline = now + self.timeout
+            entry.next_ask = now if not entry.expected else now + self.delay
+            return None
+        del self.pending[key]
+        pieces = entry.pieces
+        return b''.join(pieces[i] for i in range(count))
+
+    # The fragments to ask for again at time `now`, as a list of (sender, message id, fragment
+    # indices). Each message asks for at most a window of the fragments it is missing
+    def requests(self, now):
+        requests = []
+        for (sender, msg_id), entry in self.pending.items():
+            if entry.next_ask > now:
+                continue
+            missing = []
+            for i in range(entry.count):
+                if i not in entry.pieces:
+                    missing.append(i)
+                    if len(missing) == self.window:
+                        break
+            entry.expected = set(missing)
+            entry.next_ask = now + self.delay
+            requests.append((sender, msg_id, missing))
+        return requests
+
+    # When `requests` next has something to ask for, or None if we aren't waiting on anything
+    def next_deadline(self):
+        return min((entry.next_ask for entry in self.pending.values()), default=None)
+
+    # Throw away any messages that have been waiting too long for the rest of their fragments
+    def expire(self, now):
+        for key in [key for key, entry in self.pending.items() if entry.deadline <= now]:
+            del self.pending[key]